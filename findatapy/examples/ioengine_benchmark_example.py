@@ -0,0 +1,55 @@
+__author__ = 'saeedamen' # Saeed Amen
+
+#
+# Copyright 2016 Cuemacro
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#
+# See the License for the specific language governing permissions and limitations under the License.
+#
+
+import numpy
+import pandas
+
+from findatapy.market import IOEngine
+
+# compares the speed and size on disk of the engines/compression settings which IOEngine can use to cache time series
+# (pick the best for each dataset and set it in DataConstants.market_data_cache_compression)
+
+def random_walk(index, columns, start = 1.0, vol = 0.0001):
+    returns = numpy.random.normal(0, vol, (len(index), len(columns)))
+
+    return pandas.DataFrame(start * numpy.exp(numpy.cumsum(returns, axis=0)), index=index, columns=columns)
+
+if __name__ == '__main__':
+    tickers = ['EURUSD', 'GBPUSD', 'USDJPY', 'AUDUSD', 'USDCAD', 'NZDUSD', 'USDCHF', 'EURGBP']
+
+    # daily close for 30 years
+    df_daily = random_walk(pandas.bdate_range('1990-01-01', '2019-12-31'), [x + '.close' for x in tickers], vol=0.005)
+
+    # minute close for a year
+    df_intraday = random_walk(pandas.date_range('2019-01-01', '2019-12-31 23:59', freq='min'),
+                              [x + '.close' for x in tickers])
+
+    # bid/ask ticks (at irregular times, with prices on a tick grid) for a month
+    tick_times = pandas.Timestamp('2019-01-01') + \
+                 pandas.to_timedelta(numpy.sort(numpy.random.randint(0, 31 * 24 * 3600 * 1000, 5000000)), unit='ms')
+
+    df_tick = random_walk(pandas.DatetimeIndex(tick_times), ['EURUSD.bid']).round(5)
+    df_tick['EURUSD.ask'] = df_tick['EURUSD.bid'] + 0.00002
+    df_tick['EURUSD.bidv'] = numpy.random.randint(1, 10, len(df_tick)).astype('float32')
+    df_tick['EURUSD.askv'] = numpy.random.randint(1, 10, len(df_tick)).astype('float32')
+
+    data_frame_dict = {'fx_daily' : df_daily, 'fx_intraday' : df_intraday, 'fx_tick' : df_tick}
+
+    # default settings include HDF5 (blosc, blosc:lz4, blosc:zstd, uncompressed), Parquet (snappy, zstd, uncompressed)
+    # and Arrow (uncompressed, lz4)
+    results = IOEngine().benchmark_compression(data_frame_dict, repeat = 3)
+
+    pandas.set_option('display.width', 200)
+
+    print(results.round(2).to_string(index=False))
@@ -2,7 +2,12 @@ __author__ = 'saeedamen'
 
 from findatapy.market.datavendor import DataVendor
 from findatapy.market.datavendorbbg import DataVendorBBG
+from findatapy.market.datavendorretry import DataVendorRetry
+from findatapy.market.datavendorthrottle import DataVendorThrottle, TokenBucket, AIMDController
 from findatapy.market.ioengine import IOEngine
 from findatapy.market.market import Market, FXVolFactory, FXCrossFactory, FXConv
+from findatapy.market.marketdatacache import MarketDataCache
+from findatapy.market.marketdatacoalescer import MarketDataCoalescer
 from findatapy.market.marketdatagenerator import MarketDataGenerator
+from findatapy.market.cachedmarketdatagenerator import CachedMarketDataGenerator
 from findatapy.market.marketdatarequest import MarketDataRequest
@@ -0,0 +1,631 @@
+__author__ = 'saeedamen' # Saeed Amen
+
+#
+# Copyright 2016 Cuemacro
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#
+# See the License for the specific language governing permissions and limitations under the License.
+#
+
+import copy
+import json
+import os
+import threading
+
+import pandas
+
+from findatapy.market.marketdatagenerator import MarketDataGenerator
+from findatapy.util import DataConstants
+
+class CachedMarketDataGenerator(MarketDataGenerator):
+    """Returns market data time series, using a disk cache (written by IOEngine) on top of the memory cache of
+    MarketDataGenerator, so that restarted processes don't need to redownload everything.
+
+    The cache_algo of the MarketDataRequest determines where the data comes from
+        cache_algo_return - memory, then disk (in folder_time_series_data), then data provider (only downloading what
+        is missing from the cache), with any newly downloaded data written back to disk
+        cache_algo - same as cache_algo_return, but doesn't return the time series
+        internet_load_return - always download from the data provider and write to memory/disk
+        internet_load - same as internet_load_return, but doesn't return the time series
+
+    Alongside each cache file, we keep the date ranges which have been downloaded for it (see
+    get_date_ranges_file_name), so we know exactly what the disk cache covers, even if it has gaps.
+
+    """
+
+    # date range files are read, updated and written back, so don't let two threads do that at once
+    _date_ranges_lock = threading.Lock()
+
+    # key in the date ranges file for all the columns (used for intraday files, which each have a single ticker)
+    _all_columns = '*'
+
+    def __init__(self, engine = None, db_server = None):
+        super(CachedMarketDataGenerator, self).__init__()
+
+        if engine is None: engine = DataConstants().market_data_cache_engine
+        if db_server is None: db_server = DataConstants().market_data_cache_db_server
+
+        self.engine = engine
+        self.db_server = db_server
+
+    def download_daily(self, market_data_request):
+        """Loads daily time series from memory, disk or the data provider (depending on the cache_algo)
+
+        Parameters
+        ----------
+        market_data_request : MarketDataRequest
+            contains various properties describing time series to fetched, including ticker, start & finish date etc.
+
+        Returns
+        -------
+        pandas.DataFrame
+        """
+
+        key = self.create_category_key(market_data_request)
+        fname = self.create_cache_file_name(key)
+
+        environment = market_data_request.environment
+
+        date_ranges = {}
+
+        if 'cache_algo' in market_data_request.cache_algo:
+            self.load_daily_from_disk(market_data_request, fname)
+
+            # will only download tickers/date ranges which are missing from the memory cache
+            data_frame_agg, data_frame_downloaded = self.download_daily_column_cached(market_data_request, fname)
+
+            # the memory cache knows which dates each ticker/field now covers (including what came from disk)
+            for ticker in market_data_request.tickers:
+                for field in market_data_request.fields:
+                    entry = self._time_series_cache.get_entry(self.create_column_cache_key(fname, ticker, field),
+                                                              environment = environment)
+
+                    if entry is not None:
+                        date_ranges[ticker + '.' + field] = [(entry['start_date'], entry['finish_date'])]
+        else:
+            data_frame_agg = super(CachedMarketDataGenerator, self).download_daily(market_data_request)
+            data_frame_downloaded = [data_frame_agg]
+
+            if data_frame_agg is not None:
+                for col in data_frame_agg.columns:
+                    date_ranges[col] = [(market_data_request.start_date, market_data_request.finish_date)]
+
+        # only write to disk if we have new data from the data provider
+        data_frame_downloaded = [x for x in data_frame_downloaded if x is not None]
+
+        if data_frame_downloaded != []:
+            self.update_daily_on_disk(fname, data_frame_downloaded, date_ranges)
+
+        return data_frame_agg
+
+    def load_daily_from_disk(self, market_data_request, fname):
+        """Loads daily time series from disk into the memory cache (if they aren't already in memory)
+
+        Parameters
+        ----------
+        market_data_request : MarketDataRequest
+            contains various properties describing time series to fetched, including ticker, start & finish date etc.
+        fname : str
+            cache file name
+        """
+
+        environment = market_data_request.environment
+
+        # check whether every ticker/field is already in memory, in which case no need to touch the disk
+        in_memory = True
+
+        for ticker in market_data_request.tickers:
+            for field in market_data_request.fields:
+                if not(self._time_series_cache.contains(self.create_column_cache_key(fname, ticker, field),
+                                                        environment = environment)):
+                    in_memory = False
+
+        if in_memory: return
+
+        data_frame = self.read_time_series_from_disk(fname)
+
+        if data_frame is None or data_frame.empty: return
+
+        self.logger.debug("Loaded from disk cache " + fname)
+
+        date_ranges = self.read_date_ranges_from_disk(fname)
+
+        start_date = pandas.Timestamp(market_data_request.start_date)
+
+        # columns are of the form ticker.field, only add those which aren't already in memory (which could be newer)
+        for col in data_frame.columns:
+            if '.' not in col: continue
+
+            ticker, field = col.rsplit('.', 1)
+
+            if self._time_series_cache.contains(self.create_column_cache_key(fname, ticker, field),
+                                                environment = environment):
+                continue
+
+            if col in date_ranges:
+                col_date_ranges = date_ranges[col]
+            else:
+                col_date_ranges = self.get_date_ranges_from_data(data_frame[col].dropna())
+
+            # the memory cache holds a single date range for each column, so take the one which overlaps most with
+            # the request (anything else will be downloaded again if needed)
+            col_date_range = self.get_most_overlapping_date_range(col_date_ranges, market_data_request.start_date,
+                                                                  market_data_request.finish_date)
+
+            if col_date_range is None: continue
+
+            col_start_date = self._localize_date(col_date_range[0], start_date)
+            col_finish_date = self._localize_date(col_date_range[1], start_date)
+
+            index = data_frame.index
+
+            data_frame_col = data_frame.loc[(index >= self._localize_date(col_start_date, index[0])) &
+                                            (index <= self._localize_date(col_finish_date, index[0])), [col]]
+
+            self.cache_daily_columns(fname, data_frame_col, environment, [ticker], [field], col_start_date,
+                                     col_finish_date)
+
+    def update_daily_on_disk(self, fname, data_frame_downloaded, date_ranges):
+        """Splices newly downloaded daily time series into those already on disk and writes them back
+
+        Parameters
+        ----------
+        fname : str
+            cache file name
+        data_frame_downloaded : list(pandas.DataFrame)
+            newly downloaded time series
+        date_ranges : dict(str, list(tuple))
+            date ranges covered by each column (ticker.field)
+        """
+
+        data_frame = self.read_time_series_from_disk(fname)
+
+        # if there's nothing on disk, any date ranges left over (eg. if the cache file was deleted) are wrong
+        if data_frame is None:
+            self.remove_date_ranges_on_disk(fname)
+
+        for data_frame_new in data_frame_downloaded:
+            data_frame = self.splice_time_series(data_frame, data_frame_new)
+
+        if self.write_time_series_to_disk(fname, data_frame):
+            self.add_date_ranges_to_disk(fname, date_ranges)
+
+    def download_intraday_tick(self, market_data_request):
+        """Loads intraday time series from disk or the data provider (depending on the cache_algo). Each ticker is
+        cached in its own file.
+
+        Parameters
+        ----------
+        market_data_request : MarketDataRequest
+            contains various properties describing time series to fetched, including ticker, start & finish date etc.
+
+        Returns
+        -------
+        pandas.DataFrame
+        """
+
+        data_frame_group = []
+        market_data_request_list = []
+
+        ticker_cycle = 0
+
+        for ticker in market_data_request.tickers:
+            market_data_request_single = copy.copy(market_data_request)
+            market_data_request_single.tickers = ticker
+
+            if market_data_request.vendor_tickers is not None:
+                market_data_request_single.vendor_tickers = [market_data_request.vendor_tickers[ticker_cycle]]
+                ticker_cycle = ticker_cycle + 1
+
+            market_data_request_list.append((ticker, market_data_request_single))
+
+        # read the cache file for every ticker at the same time
+        data_frame_disk = {}
+
+        if 'cache_algo' in market_data_request.cache_algo:
+            data_frame_disk = self.read_time_series_from_disk_bulk(
+                [self.create_time_series_hash_key(md_request, ticker) for ticker, md_request in market_data_request_list],
+                start_date = market_data_request.start_date, finish_date = market_data_request.finish_date)
+
+        # only download the date ranges which are missing from the disk cache for each ticker
+        market_data_request_missing = []
+        fname_missing = []
+        data_frame_cached = {}
+
+        for ticker, market_data_request_single in market_data_request_list:
+            fname = self.create_time_series_hash_key(market_data_request_single, ticker)
+            data_frame_single = data_frame_disk.get(fname)
+
+            if data_frame_single is None or data_frame_single.empty:
+                missing_date_ranges = [(market_data_request.start_date, market_data_request.finish_date)]
+            else:
+                self.logger.debug("Loaded from disk cache " + fname)
+
+                data_frame_cached[fname] = data_frame_single
+
+                # each intraday file has a single ticker, so the date ranges are for the whole file
+                date_ranges = self.read_date_ranges_from_disk(fname).get(self._all_columns)
+
+                if date_ranges is None:
+                    date_ranges = self.get_date_ranges_from_data(data_frame_single)
+
+                missing_date_ranges = self.get_missing_date_ranges_on_disk(date_ranges,
+                                                                           market_data_request.start_date,
+                                                                           market_data_request.finish_date)
+
+            for missing_start_date, missing_finish_date in missing_date_ranges:
+                md_request = copy.copy(market_data_request_single)
+                md_request.start_date = missing_start_date
+                md_request.finish_date = missing_finish_date
+
+                market_data_request_missing.append(md_request)
+                fname_missing.append(fname)
+
+        data_frame_downloaded = {}
+
+        if market_data_request_missing != []:
+            for fname, md_request, data_frame_single in zip(fname_missing, market_data_request_missing,
+                                                self.fetch_time_series_list(market_data_request_missing)):
+                if data_frame_single is not None and not(data_frame_single.empty):
+                    data_frame_single.index.name = 'Date'
+
+                    if fname not in data_frame_downloaded:
+                        data_frame_downloaded[fname] = []
+
+                    data_frame_downloaded[fname].append((data_frame_single, md_request.start_date,
+                                                         md_request.finish_date))
+
+        for ticker, market_data_request_single in market_data_request_list:
+            fname = self.create_time_series_hash_key(market_data_request_single, ticker)
+            data_frame_single = data_frame_cached.get(fname)
+
+            if fname in data_frame_downloaded:
+                for data_frame_new, start_date, finish_date in data_frame_downloaded[fname]:
+                    # add to what is already on disk (which might cover other dates), rather than replacing it
+                    if self.write_time_series_to_disk(fname, data_frame_new, append_data = True):
+                        self.add_date_ranges_to_disk(fname, {self._all_columns : [(start_date, finish_date)]})
+
+                    data_frame_single = self.splice_time_series(data_frame_single, data_frame_new)
+
+            if data_frame_single is not None:
+                data_frame_group.append(self.filter.filter_time_series_by_date(
+                    market_data_request.start_date, market_data_request.finish_date, data_frame_single))
+
+        return self.calculations.pandas_outer_join(data_frame_group)
+
+    def get_missing_date_ranges_on_disk(self, date_ranges, start_date, finish_date):
+        """Finds the date ranges of a request which aren't covered by the date ranges in the disk cache (comparing the
+        full timestamps). Anything from the start of today onwards is always missing (it might have changed since it
+        was downloaded).
+
+        Parameters
+        ----------
+        date_ranges : list(tuple)
+            start/finish dates covered by the disk cache
+        start_date : DateTime
+            start date of the request
+        finish_date : DateTime
+            finish date of the request
+
+        Returns
+        -------
+        list(tuple)
+            start/finish dates of the missing date ranges
+        """
+
+        start_date = self._to_naive_utc(start_date)
+        finish_date = self._to_naive_utc(finish_date)
+
+        today = pandas.Timestamp.now(tz='UTC').tz_localize(None).normalize()
+
+        # today might not be final, so the disk cache only covers up to the start of today
+        date_ranges = [(self._to_naive_utc(x), min(self._to_naive_utc(y), today)) for x, y in date_ranges]
+        date_ranges = self.merge_date_ranges([x for x in date_ranges if x[0] <= x[1]])
+
+        missing_date_ranges = []
+        current_date = start_date
+
+        for x, y in date_ranges:
+            if y < current_date: continue
+            if x > finish_date: break
+
+            if x > current_date:
+                missing_date_ranges.append((current_date, x))
+
+            current_date = max(current_date, y)
+
+        if current_date < finish_date:
+            missing_date_ranges.append((current_date, finish_date))
+
+        return missing_date_ranges
+
+    def get_most_overlapping_date_range(self, date_ranges, start_date, finish_date):
+        """Gets the date range which overlaps most with start_date/finish_date (or None if none of them overlap)
+
+        Parameters
+        ----------
+        date_ranges : list(tuple)
+            start/finish dates
+        start_date : DateTime
+            start date of the request
+        finish_date : DateTime
+            finish date of the request
+
+        Returns
+        -------
+        tuple
+        """
+
+        start_date = self._to_naive_utc(start_date)
+        finish_date = self._to_naive_utc(finish_date)
+
+        date_range_best = None
+        overlap_best = None
+
+        for x, y in date_ranges:
+            x = self._to_naive_utc(x)
+            y = self._to_naive_utc(y)
+
+            overlap = min(y, finish_date) - max(x, start_date)
+
+            if overlap >= pandas.Timedelta(0) and (overlap_best is None or overlap > overlap_best):
+                date_range_best = (x, y)
+                overlap_best = overlap
+
+        return date_range_best
+
+    def get_date_ranges_from_data(self, data_frame):
+        """Gets the date range of time series, for disk caches written without date ranges (we can't tell whether
+        these have gaps, so assume they don't)
+
+        Parameters
+        ----------
+        data_frame : DataFrame
+            time series read from disk
+
+        Returns
+        -------
+        list(tuple)
+        """
+
+        if data_frame is None or data_frame.empty: return []
+
+        return [(data_frame.index[0], data_frame.index[-1])]
+
+    def merge_date_ranges(self, date_ranges):
+        """Merges date ranges which overlap (or touch)
+
+        Parameters
+        ----------
+        date_ranges : list(tuple)
+            start/finish dates
+
+        Returns
+        -------
+        list(tuple)
+            sorted date ranges which don't overlap
+        """
+
+        merged = []
+
+        for x, y in sorted(date_ranges):
+            if merged != [] and x <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], y))
+            else:
+                merged.append((x, y))
+
+        return merged
+
+    def get_date_ranges_file_name(self, fname):
+        """Gets the name of the file with the date ranges covered by a disk cache file
+
+        Parameters
+        ----------
+        fname : str
+            cache file name
+
+        Returns
+        -------
+        str
+        """
+
+        return fname + '_date_ranges.json'
+
+    def read_date_ranges_from_disk(self, fname):
+        """Reads the date ranges covered by each column of a disk cache file (or all the columns of intraday files,
+        under _all_columns)
+
+        Parameters
+        ----------
+        fname : str
+            cache file name
+
+        Returns
+        -------
+        dict(str, list(tuple))
+            naive UTC start/finish dates for each column (empty if there is no date ranges file)
+        """
+
+        try:
+            with open(self.get_date_ranges_file_name(fname), 'r') as f:
+                date_ranges = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            self.logger.warning("Couldn't read date ranges for disk cache " + fname + ": " + str(e))
+
+            return {}
+
+        return {col : [(pandas.Timestamp(x), pandas.Timestamp(y)) for x, y in v] for col, v in date_ranges.items()}
+
+    def add_date_ranges_to_disk(self, fname, date_ranges):
+        """Adds date ranges to those covered by each column of a disk cache file (only call after the time series for
+        them have been written)
+
+        Parameters
+        ----------
+        fname : str
+            cache file name
+        date_ranges : dict(str, list(tuple))
+            start/finish dates for each column
+        """
+
+        # a request running into the future only covers up to now
+        now = pandas.Timestamp.now(tz='UTC').tz_localize(None)
+
+        try:
+            with CachedMarketDataGenerator._date_ranges_lock:
+                date_ranges_disk = self.read_date_ranges_from_disk(fname)
+
+                for col, v in date_ranges.items():
+                    v = [(self._to_naive_utc(x), min(self._to_naive_utc(y), now)) for x, y in v]
+
+                    date_ranges_disk[col] = self.merge_date_ranges(
+                        date_ranges_disk.get(col, []) + [x for x in v if x[0] <= x[1]])
+
+                date_ranges_fname = self.get_date_ranges_file_name(fname)
+
+                with open(date_ranges_fname + '.temp', 'w') as f:
+                    json.dump({col : [[x.isoformat(), y.isoformat()] for x, y in v]
+                               for col, v in date_ranges_disk.items()}, f)
+
+                os.replace(date_ranges_fname + '.temp', date_ranges_fname)
+        except Exception as e:
+            self.logger.warning("Couldn't write date ranges for disk cache " + fname + ": " + str(e))
+
+    def remove_date_ranges_on_disk(self, fname):
+        """Removes the date ranges of a disk cache file
+
+        Parameters
+        ----------
+        fname : str
+            cache file name
+        """
+
+        with CachedMarketDataGenerator._date_ranges_lock:
+            try:
+                os.remove(self.get_date_ranges_file_name(fname))
+            except OSError:
+                pass
+
+    def _to_naive_utc(self, date):
+        # date ranges are stored/compared in UTC without a timezone (naive dates are assumed to be UTC already)
+        date = pandas.Timestamp(date)
+
+        if date.tz is not None:
+            return date.tz_convert('UTC').tz_localize(None)
+
+        return date
+
+    def _localize_date(self, date, like_date):
+        # dates need to have the same timezone (or lack of it) to be compared
+        date = pandas.Timestamp(date)
+
+        if like_date.tz is not None and date.tz is None:
+            return date.tz_localize('UTC').tz_convert(like_date.tz)
+
+        if like_date.tz is None and date.tz is not None:
+            return date.tz_convert('UTC').tz_localize(None)
+
+        return date
+
+    def read_time_series_from_disk(self, fname, start_date = None, finish_date = None):
+        """Reads time series from the disk cache (returning None if it isn't there or can't be read)
+
+        Parameters
+        ----------
+        fname : str
+            cache file name
+        start_date : DateTime (optional)
+            start date of time series to read
+        finish_date : DateTime (optional)
+            finish date of time series to read
+
+        Returns
+        -------
+        pandas.DataFrame
+        """
+
+        try:
+            return self.io_engine.read_time_series_cache_from_disk(fname, engine = self.engine,
+                                                                   start_date = start_date, finish_date = finish_date,
+                                                                   db_server = self.db_server)
+        except Exception as e:
+            self.logger.warning("Couldn't read from disk cache " + fname + ": " + str(e))
+
+        return None
+
+    def read_time_series_from_disk_bulk(self, fname_list, start_date = None, finish_date = None):
+        """Reads many time series from the disk cache at the same time (returning an empty dict if they can't be read)
+
+        Parameters
+        ----------
+        fname_list : list(str)
+            cache file names
+        start_date : DateTime (optional)
+            start date of time series to read
+        finish_date : DateTime (optional)
+            finish date of time series to read
+
+        Returns
+        -------
+        dict(str, pandas.DataFrame)
+        """
+
+        try:
+            return self.io_engine.read_time_series_cache_from_disk_bulk(fname_list, engine = self.engine,
+                                                                        start_date = start_date,
+                                                                        finish_date = finish_date,
+                                                                        db_server = self.db_server)
+        except Exception as e:
+            self.logger.warning("Couldn't read from disk cache " + str(fname_list) + ": " + str(e))
+
+        return {}
+
+    def write_time_series_to_disk(self, fname, data_frame, append_data = False):
+        """Writes time series to the disk cache
+
+        Parameters
+        ----------
+        fname : str
+            cache file name
+        data_frame : DataFrame
+            time series to be written
+        append_data : bool
+            add to the time series already on disk (new points overwrite old points at the same time) rather than
+            replacing it
+
+        Returns
+        -------
+        bool
+            True if the time series was written
+        """
+
+        try:
+            folder = os.path.dirname(fname)
+
+            if self.engine != 'arctic' and folder != '' and not os.path.exists(folder):
+                os.makedirs(folder)
+
+            # bcolz renames the columns in place, so don't let it touch the time series in the memory cache
+            if self.engine == 'bcolz':
+                # and can't append, so splice with what is on disk ourselves
+                if append_data:
+                    data_frame = self.splice_time_series(self.read_time_series_from_disk(fname), data_frame)
+                    append_data = False
+
+                data_frame = data_frame.copy()
+
+            self.io_engine.write_time_series_cache_to_disk(fname, data_frame, engine = self.engine,
+                                                           db_server = self.db_server, append_data = append_data)
+
+            return True
+        except Exception as e:
+            self.logger.warning("Couldn't write to disk cache " + fname + ": " + str(e))
+
+        return False
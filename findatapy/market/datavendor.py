@@ -15,6 +15,8 @@ __author__ = 'saeedamen' # Saeed Amen
 import abc
 import copy
 
+from findatapy.market.datavendorretry import DataVendorRetry
+from findatapy.market.datavendorthrottle import DataVendorThrottle
 from findatapy.market.marketdatarequest import MarketDataRequest
 from findatapy.util import ConfigManager
 
@@ -45,10 +47,71 @@ class DataVendor(object):
 
         # to be implemented by subclasses
 
+    def load_ticker_chunks(self, market_data_request, chunk_freq = 'day'):
+        """Retrieves market data from external data source in chunks (in date order), so long histories can be processed
+        without holding all of them in memory. By default the whole time series is returned as a single chunk, data
+        sources which can download in pieces (eg. Dukascopy) should override this.
+
+        Parameters
+        ----------
+        market_data_request : MarketDataRequest
+            contains all the various parameters detailing time series start and finish, tickers etc
+        chunk_freq : str
+            'hour' or 'day' (size of each chunk)
+
+        Returns
+        -------
+        generator(DataFrame)
+        """
+
+        data_frame = self.load_ticker(market_data_request)
+
+        if data_frame is not None:
+            yield data_frame
+
     @abc.abstractmethod
     def kill_session(self):
         return
 
+    def call_vendor(self, data_source, func, *args, **kwargs):
+        """Calls the data provider, subject to the rate limit and adaptive concurrency limit of the data source (shared
+        across all DataVendors), retrying with backoff if it fails
+
+        Parameters
+        ----------
+        data_source : str
+            data source eg. quandl
+        func : function
+            function which calls the data provider
+
+        Returns
+        -------
+        object
+            whatever func returns
+        """
+
+        return DataVendorRetry.get_retry(data_source).call(DataVendorThrottle.get_throttle(data_source).call,
+                                                           func, *args, **kwargs)
+
+    def retry_vendor(self, data_source, func, *args, **kwargs):
+        """Calls a function, retrying with backoff if it fails (without rate limiting it, eg. if the calls to the data
+        provider inside are already rate limited)
+
+        Parameters
+        ----------
+        data_source : str
+            data source eg. quandl
+        func : function
+            function which calls the data provider
+
+        Returns
+        -------
+        object
+            whatever func returns
+        """
+
+        return DataVendorRetry.get_retry(data_source).call(func, *args, **kwargs)
+
     def construct_vendor_market_data_request(self, market_data_request):
         """Creates a MarketDataRequest with the vendor tickers
 
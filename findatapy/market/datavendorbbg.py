@@ -13,6 +13,7 @@ __author__ = 'saeedamen' # Saeed Amen
 #
 
 from findatapy.market.datavendor import DataVendor
+from findatapy.market.datavendorretry import DataVendorRetry
 from findatapy.market.marketdatarequest import MarketDataRequest
 
 import abc
@@ -297,7 +298,7 @@ class DataVendorBBGOpen(DataVendorBBG):
         low_level_loader = BBGLowLevelTick()
 
         # by default we download all available fields!
-        data_frame = low_level_loader.load_time_series(market_data_request)
+        data_frame = self.call_vendor('bloomberg', low_level_loader.load_time_series, market_data_request)
 
         # self.kill_session() # need to forcibly kill_session since can't always reopen
 
@@ -309,7 +310,7 @@ class DataVendorBBGOpen(DataVendorBBG):
         low_level_loader = BBGLowLevelIntraday()
 
         # by default we download all available fields!
-        data_frame = low_level_loader.load_time_series(market_data_request)
+        data_frame = self.call_vendor('bloomberg', low_level_loader.load_time_series, market_data_request)
 
         # self.kill_session() # need to forcibly kill_session since can't always reopen
 
@@ -320,7 +321,7 @@ class DataVendorBBGOpen(DataVendorBBG):
         low_level_loader = BBGLowLevelDaily()
 
         # by default we download all available fields!
-        data_frame = low_level_loader.load_time_series(market_data_request)
+        data_frame = self.call_vendor('bloomberg', low_level_loader.load_time_series, market_data_request)
 
         # self.kill_session() # need to forcibly kill_session since can't always reopen
 
@@ -340,7 +341,7 @@ class DataVendorBBGOpen(DataVendorBBG):
         # if 'last-tradeable-day' in market_data_request.fields:
         #     market_data_request_vendor_selective.fields = ['LAST_TRADEABLE_DT']
 
-        data_frame =  low_level_loader.load_time_series(market_data_request_vendor_selective)
+        data_frame = self.call_vendor('bloomberg', low_level_loader.load_time_series, market_data_request_vendor_selective)
 
         # self.kill_session() # need to forcibly kill_session since can't always reopen
 
@@ -503,40 +504,35 @@ class BBGLowLevelTemplate(object): # in order that the init function works in ch
 
     # create a session for Bloomberg with appropriate server & port
     def start_bloomberg_session(self):
-        tries = 0
-
         session = None
 
-        # try up to 5 times to start a session
-        while(tries < 5):
-            try:
-                # fill SessionOptions
-                sessionOptions = blpapi.SessionOptions()
-                sessionOptions.setServerHost(DataConstants().bbg_server)
-                sessionOptions.setServerPort(DataConstants().bbg_server_port)
-
-                self.logger.info("Starting Bloomberg session...")
+        # retry with backoff if we can't start a session (eg. terminal not ready)
+        try:
+            session = DataVendorRetry.get_retry('bloomberg').call(self._start_bloomberg_session)
+        except Exception as e:
+            self.logger.error("Failed to start session: " + str(e))
 
-                # create a Session
-                session = blpapi.Session(sessionOptions)
+        # BBGLowLevelTemplate._session = session
 
-                # start a Session
-                if not session.start():
-                    self.logger.error("Failed to start session.")
-                    return
+        return session
 
-                self.logger.info("Returning session...")
+    def _start_bloomberg_session(self):
+        # fill SessionOptions
+        sessionOptions = blpapi.SessionOptions()
+        sessionOptions.setServerHost(DataConstants().bbg_server)
+        sessionOptions.setServerPort(DataConstants().bbg_server_port)
 
-                tries = 5
-            except:
-                tries = tries + 1
+        self.logger.info("Starting Bloomberg session...")
 
-        # BBGLowLevelTemplate._session = session
+        # create a Session
+        session = blpapi.Session(sessionOptions)
 
-        if session is None:
-            self.logger.error("Failed to start session.")
-            return
+        # start a Session
+        if not session.start():
+            raise Exception("Bloomberg session didn't start on " + str(DataConstants().bbg_server) + ":"
+                            + str(DataConstants().bbg_server_port))
 
+        self.logger.info("Returning session...")
 
         return session
 
@@ -0,0 +1,267 @@
+__author__ = 'saeedamen' # Saeed Amen
+
+#
+# Copyright 2016 Cuemacro
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#
+# See the License for the specific language governing permissions and limitations under the License.
+#
+
+import random
+import threading
+import time
+
+from findatapy.util.dataconstants import DataConstants
+from findatapy.util.loggermanager import LoggerManager
+
+class DataVendorRetry(object):
+    """Retry policy for calls to a data source, shared by every DataVendor in the process. Failed calls are retried with
+    exponential backoff and (full) jitter, until we run out of attempts or time. Errors which won't go away by retrying
+    (eg. bad API key, unknown ticker, bugs) are raised immediately.
+
+    Settings are in DataConstants (market_retry_max_attempts, market_retry_base_delay, market_retry_max_delay and
+    market_retry_max_elapsed).
+
+    """
+
+    _retries = {}
+    _lock = threading.Lock()
+
+    # programming errors, no point retrying these
+    _non_retryable_types = (TypeError, AttributeError, KeyError, IndexError, NameError, NotImplementedError)
+
+    # errors from libraries we may not have installed are matched on the name of their type (eg. quandl errors,
+    # requests.ConnectionError, requests.Timeout)
+    _non_retryable_type_names = ['AuthenticationError', 'ForbiddenError', 'InvalidRequestError', 'NotFoundError']
+
+    _retryable_type_names = ['LimitExceededError', 'InternalServerError', 'ServiceUnavailableError', 'ConnectionError',
+                             'Timeout', 'TimeoutError', 'ChunkedEncodingError']
+
+    # for errors without a status code or a type we recognise (eg. ValueError from Fred)
+    _non_retryable_messages = ['api key', 'api_key', 'no data exists', 'does not exist']
+
+    _retryable_messages = ['too many requests', 'rate limit', 'timed out']
+
+    _retryable_status_codes = [429, 500, 502, 503, 504]
+
+    def __init__(self, data_source, max_attempts = None, base_delay = None, max_delay = None, max_elapsed = None):
+        self.logger = LoggerManager().getLogger(__name__)
+        self.data_source = data_source
+
+        constants = DataConstants()
+
+        if max_attempts is None: max_attempts = constants.market_retry_max_attempts
+        if base_delay is None: base_delay = constants.market_retry_base_delay
+        if max_delay is None: max_delay = constants.market_retry_max_delay
+        if max_elapsed is None: max_elapsed = constants.market_retry_max_elapsed
+
+        self.max_attempts = max(max_attempts, 1)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_elapsed = max_elapsed
+
+        self._stats = {'calls' : 0, 'retries' : 0, 'give_ups' : 0, 'non_retryable' : 0}
+        self._stats_lock = threading.Lock()
+
+    @staticmethod
+    def get_retry(data_source):
+        """Gets the retry policy for a data source (creating it if necessary)
+
+        Parameters
+        ----------
+        data_source : str
+            data source eg. bloomberg (or forms like bloomberg-boe)
+
+        Returns
+        -------
+        DataVendorRetry
+        """
+        data_source = str(data_source).split("-")[0]
+
+        with DataVendorRetry._lock:
+            if data_source not in DataVendorRetry._retries:
+                DataVendorRetry._retries[data_source] = DataVendorRetry(data_source)
+
+            return DataVendorRetry._retries[data_source]
+
+    @staticmethod
+    def reset():
+        """Removes all the retry policies (eg. after changing DataConstants), they will be recreated when next used
+        """
+        with DataVendorRetry._lock:
+            DataVendorRetry._retries = {}
+
+    def call(self, func, *args, **kwargs):
+        """Calls a function, retrying with exponential backoff if it fails (or returns an HTTP response which is worth
+        retrying, in which case the last response is returned when we give up)
+
+        Parameters
+        ----------
+        func : function
+            function which calls the data provider
+
+        Returns
+        -------
+        object
+            whatever func returns
+        """
+        self._increment('calls')
+
+        start = time.time()
+        attempt = 0
+
+        while True:
+            attempt = attempt + 1
+
+            try:
+                result = func(*args, **kwargs)
+
+                if not(self.is_retryable_result(result)):
+                    return result
+
+                reason = "status code " + str(result.status_code)
+            except Exception as e:
+                if not(self.is_retryable_error(e)):
+                    self._increment('non_retryable')
+
+                    raise
+
+                result = None
+                reason = str(e)
+
+                if not(self._can_retry(attempt, start)):
+                    self._give_up(attempt, reason)
+
+                    raise
+
+            if not(self._can_retry(attempt, start)):
+                self._give_up(attempt, reason)
+
+                return result
+
+            delay = self.get_delay(attempt)
+
+            # don't sleep past the time budget
+            if self.max_elapsed is not None:
+                delay = max(0, min(delay, self.max_elapsed - (time.time() - start)))
+
+            self._increment('retries')
+            self.logger.info("Retrying " + self.data_source + " in " + str(round(delay, 2)) + "s (attempt "
+                             + str(attempt) + " failed: " + reason + ")")
+
+            time.sleep(delay)
+
+    def get_delay(self, attempt):
+        """Gets how long to wait before the next attempt (exponential backoff with full jitter)
+
+        Parameters
+        ----------
+        attempt : int
+            number of attempts so far
+
+        Returns
+        -------
+        float
+        """
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def is_retryable_error(self, e):
+        """Checks whether an exception is likely to be temporary (eg. network problems, throttling), from its HTTP
+        status code if it has one, otherwise from its type
+        """
+        if isinstance(e, self._non_retryable_types):
+            return False
+
+        status_code = self.get_status_code(e)
+
+        if status_code is not None:
+            return status_code in self._retryable_status_codes or status_code >= 500
+
+        type_names = [t.__name__ for t in type(e).__mro__]
+
+        for t in type_names:
+            if t in self._non_retryable_type_names: return False
+
+        for t in type_names:
+            if t in self._retryable_type_names: return True
+
+        message = str(e).lower()
+
+        for m in self._non_retryable_messages:
+            if m in message: return False
+
+        for m in self._retryable_messages:
+            if m in message: return True
+
+        # by default assume other errors are temporary
+        return True
+
+    def get_status_code(self, e):
+        """Gets the HTTP status code of an exception (or the exception it was raised from), eg. from
+        requests.HTTPError, urllib's HTTPError or quandl errors
+
+        Parameters
+        ----------
+        e : Exception
+            error raised by the data provider
+
+        Returns
+        -------
+        int
+            None if there is no status code
+        """
+        while e is not None:
+            response = getattr(e, 'response', None)
+
+            for status_code in [getattr(response, 'status_code', None), getattr(e, 'http_status', None),
+                                getattr(e, 'code', None)]:
+                if isinstance(status_code, int) and 100 <= status_code < 600: return status_code
+
+            e = e.__cause__
+
+        return None
+
+    def is_retryable_result(self, result):
+        """Checks whether an HTTP response is worth retrying (eg. throttled or server errors)
+        """
+        return getattr(result, 'status_code', None) in self._retryable_status_codes
+
+    def get_stats(self):
+        """Gets the number of calls, retries, give ups and calls which failed without retrying
+
+        Returns
+        -------
+        dict
+        """
+        with self._stats_lock:
+            return dict(self._stats)
+
+    @staticmethod
+    def get_all_stats():
+        """Gets the retry statistics for every data source
+
+        Returns
+        -------
+        dict
+        """
+        with DataVendorRetry._lock:
+            retries = dict(DataVendorRetry._retries)
+
+        return {k : v.get_stats() for k, v in retries.items()}
+
+    def _can_retry(self, attempt, start):
+        return attempt < self.max_attempts and \
+               (self.max_elapsed is None or time.time() - start < self.max_elapsed)
+
+    def _give_up(self, attempt, reason):
+        self._increment('give_ups')
+        self.logger.error("Giving up on " + self.data_source + " after " + str(attempt) + " attempts: " + reason)
+
+    def _increment(self, stat):
+        with self._stats_lock:
+            self._stats[stat] = self._stats[stat] + 1
@@ -0,0 +1,282 @@
+__author__ = 'saeedamen' # Saeed Amen
+
+#
+# Copyright 2016 Cuemacro
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#
+# See the License for the specific language governing permissions and limitations under the License.
+#
+
+"""Rate limiting and adaptive concurrency for calls to data providers, shared by all DataVendor implementations
+
+TokenBucket - limits the rate of calls
+AIMDController - limits the number of concurrent calls (additive increase/multiplicative decrease)
+DataVendorThrottle - combines both for each data source
+"""
+
+import threading
+import time
+
+from findatapy.util.dataconstants import DataConstants
+from findatapy.util.loggermanager import LoggerManager
+
+class TokenBucket(object):
+    """Token bucket rate limiter. Tokens are added at a fixed rate (up to a maximum burst) and every call needs a token.
+
+    """
+
+    def __init__(self, rate, burst = None):
+        if burst is None: burst = max(rate, 1)
+
+        self.rate = float(rate)
+        self.burst = float(burst)
+
+        self._tokens = self.burst
+        self._last = time.time()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until a token is available (and takes it)
+        """
+        while True:
+            with self._lock:
+                now = time.time()
+
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+
+                if self._tokens >= 1:
+                    self._tokens = self._tokens - 1
+
+                    return
+
+                wait = (1 - self._tokens) / self.rate
+
+            time.sleep(wait)
+
+class AIMDController(object):
+    """Limits the number of concurrent calls to a data provider. The limit grows additively whilst calls succeed with
+    a latency close to normal, and is cut multiplicatively when calls fail or are throttled by the data provider.
+
+    """
+
+    def __init__(self, initial_limit, min_limit = 1, max_limit = None, increase = 1.0, decrease = 0.5,
+                 latency_tolerance = 2.0):
+        if max_limit is None: max_limit = initial_limit
+
+        self.min_limit = min_limit
+        self.max_limit = max(max_limit, min_limit)
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_tolerance = latency_tolerance
+
+        self._limit = float(min(max(initial_limit, min_limit), self.max_limit))
+        self._in_flight = 0
+        self._latency = None   # exponentially weighted average of latency of successful calls
+
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        """Blocks until the number of calls in flight is below the current limit
+        """
+        with self._condition:
+            while self._in_flight >= int(self._limit):
+                self._condition.wait()
+
+            self._in_flight = self._in_flight + 1
+
+    def release(self, latency, success = True):
+        """Marks a call as finished, adjusting the limit depending on how it went
+
+        Parameters
+        ----------
+        latency : float
+            time taken by the call (in seconds)
+        success : bool
+            False if the call failed or was throttled
+        """
+        with self._condition:
+            self._in_flight = self._in_flight - 1
+
+            if not(success):
+                self._limit = max(self.min_limit, self._limit * self.decrease)
+            else:
+                # only grow if the latency is good (otherwise the data provider might be struggling)
+                if self._latency is None or latency <= self._latency * self.latency_tolerance:
+                    self._limit = min(self.max_limit, self._limit + self.increase / self._limit)
+
+                if self._latency is None:
+                    self._latency = latency
+                else:
+                    self._latency = 0.9 * self._latency + 0.1 * latency
+
+            self._condition.notify_all()
+
+    def get_limit(self):
+        return int(self._limit)
+
+    def get_in_flight(self):
+        return self._in_flight
+
+    def get_latency(self):
+        return self._latency
+
+class DataVendorThrottle(object):
+    """Rate limiter and adaptive concurrency controller for a data source, which is shared by every DataVendor (and
+    every thread) in the process. Rates and concurrency are set in DataConstants (market_rate_limit, market_thread_no
+    and market_thread_no_max).
+
+    """
+
+    _throttles = {}
+    _lock = threading.Lock()
+
+    def __init__(self, data_source):
+        self.logger = LoggerManager().getLogger(__name__)
+        self.data_source = data_source
+
+        constants = DataConstants()
+
+        rate = self._get_constant(constants.market_rate_limit, data_source)
+
+        self.token_bucket = None
+
+        if rate is not None:
+            self.token_bucket = TokenBucket(rate)
+
+        self.controller = None
+
+        if constants.market_adaptive_concurrency:
+            self.controller = AIMDController(self._get_constant(constants.market_thread_no, data_source),
+                                             max_limit = self._get_constant(constants.market_thread_no_max, data_source))
+
+        self._stats = {'calls' : 0, 'errors' : 0, 'throttled' : 0}
+        self._stats_lock = threading.Lock()
+
+    @staticmethod
+    def get_throttle(data_source):
+        """Gets the throttle for a data source (creating it if necessary)
+
+        Parameters
+        ----------
+        data_source : str
+            data source eg. bloomberg (or forms like bloomberg-boe)
+
+        Returns
+        -------
+        DataVendorThrottle
+        """
+        data_source = str(data_source).split("-")[0]
+
+        with DataVendorThrottle._lock:
+            if data_source not in DataVendorThrottle._throttles:
+                DataVendorThrottle._throttles[data_source] = DataVendorThrottle(data_source)
+
+            return DataVendorThrottle._throttles[data_source]
+
+    @staticmethod
+    def reset():
+        """Removes all the throttles (eg. after changing DataConstants), they will be recreated when next used
+        """
+        with DataVendorThrottle._lock:
+            DataVendorThrottle._throttles = {}
+
+    def get_max_concurrency(self):
+        """Gets the maximum number of concurrent calls we'd ever make to this data source
+
+        Returns
+        -------
+        int
+        """
+        if self.controller is not None:
+            return self.controller.max_limit
+
+        return self._get_constant(DataConstants().market_thread_no, self.data_source)
+
+    def call(self, func, *args, **kwargs):
+        """Calls a data provider function, waiting for the rate limiter and concurrency controller first
+
+        Parameters
+        ----------
+        func : function
+            function which calls the data provider
+
+        Returns
+        -------
+        object
+            whatever func returns
+        """
+        if self.token_bucket is not None: self.token_bucket.acquire()
+        if self.controller is not None: self.controller.acquire()
+
+        start = time.time()
+        success = False
+
+        try:
+            result = func(*args, **kwargs)
+
+            # some HTTP clients (eg. requests) don't raise exceptions when throttled
+            success = not(self.is_throttled_response(result))
+
+            if not(success):
+                self._increment('throttled')
+
+            return result
+        except Exception as e:
+            if self.is_throttled_error(e):
+                self._increment('throttled')
+            else:
+                self._increment('errors')
+
+            raise
+        finally:
+            self._increment('calls')
+
+            if self.controller is not None:
+                self.controller.release(time.time() - start, success = success)
+
+    def is_throttled_error(self, e):
+        """Checks whether an exception means the data provider is throttling us
+        """
+        message = str(e).lower()
+
+        return '429' in message or 'too many requests' in message or 'rate limit' in message
+
+    def is_throttled_response(self, result):
+        """Checks whether an HTTP response means the data provider is throttling us (or is overloaded)
+        """
+        status_code = getattr(result, 'status_code', None)
+
+        return status_code in [429, 503]
+
+    def get_stats(self):
+        """Gets the number of calls, errors and throttled calls, as well as the current concurrency limit and latency
+
+        Returns
+        -------
+        dict
+        """
+        with self._stats_lock:
+            stats = dict(self._stats)
+
+        if self.controller is not None:
+            stats['limit'] = self.controller.get_limit()
+            stats['in_flight'] = self.controller.get_in_flight()
+            stats['latency'] = self.controller.get_latency()
+
+        return stats
+
+    def _increment(self, stat):
+        with self._stats_lock:
+            self._stats[stat] = self._stats[stat] + 1
+
+    def _get_constant(self, constant, data_source):
+        if data_source in constant:
+            return constant[data_source]
+
+        return constant['other']
@@ -89,22 +89,15 @@ class DataVendorQuandl(DataVendor):
         return data_frame
 
     def download_daily(self, market_data_request):
-        trials = 0
-
         data_frame = None
 
-        while(trials < 5):
-            try:
-                data_frame = Quandl.get(market_data_request.tickers, authtoken=DataConstants().quandl_api_key, trim_start=market_data_request.start_date,
-                                        trim_end=market_data_request.finish_date)
-
-                break
-            except Exception as e:
-                trials = trials + 1
-                self.logger.info("Attempting... " + str(trials) + " request to download from Quandl due to following error: " + str(e))
-
-        if trials == 5:
-            self.logger.error("Couldn't download from Quandl after several attempts!")
+        try:
+            data_frame = self.call_vendor('quandl', Quandl.get, market_data_request.tickers,
+                                          authtoken=DataConstants().quandl_api_key,
+                                          trim_start=market_data_request.start_date,
+                                          trim_end=market_data_request.finish_date)
+        except Exception as e:
+            self.logger.error("Couldn't download from Quandl: " + str(e))
 
         return data_frame
 
@@ -118,6 +111,7 @@ class DataVendorQuandl(DataVendor):
 #     pass
 
 from findatapy.market.datavendor import DataVendor
+from findatapy.market.datavendorthrottle import DataVendorThrottle
 from findatapy.timeseries import Filter, Calculations
 
 class DataVendorALFRED(DataVendor):
@@ -170,125 +164,129 @@ class DataVendorALFRED(DataVendor):
         return data_frame
 
     def download_daily(self, market_data_request):
-        trials = 0
-
         data_frame_list = []
         data_frame_release = []
 
-        # TODO refactor this code, a bit messy at the moment!
         for i in range(0, len(market_data_request.tickers)):
-            while (trials < 5):
-                try:
-                    fred = Fred(api_key=DataConstants().fred_api_key)
+            try:
+                data_frame_list_ticker, data_frame_release_ticker = self.download_daily_ticker(market_data_request, i)
 
-                    # acceptable fields: close, actual-release, release-date-time-full
-                    if 'close' in market_data_request.fields and 'release-date-time-full' in market_data_request.fields:
-                        data_frame = fred.get_series_all_releases(market_data_request.tickers[i],
-                                                                  observation_start=market_data_request.start_date,
-                                                                  observation_end=market_data_request.finish_date)
+                data_frame_list.extend(data_frame_list_ticker)
+                data_frame_release.extend(data_frame_release_ticker)
+            except Exception as e:
+                self.logger.error("Couldn't download from ALFRED/FRED: " + str(e))
 
-                        data_frame.columns = ['Date', market_data_request.tickers[i] + '.release-date-time-full',
-                                              market_data_request.tickers[i] + '.close']
+        calc = Calculations()
 
-                        data_frame = data_frame.sort_values(by=['Date', market_data_request.tickers[i] + '.release-date-time-full'])
-                        data_frame = data_frame.drop_duplicates(subset=['Date'], keep='last')
-                        data_frame = data_frame.set_index(['Date'])
+        data_frame1 = calc.pandas_outer_join(data_frame_list)
+        data_frame2 = calc.pandas_outer_join(data_frame_release)
 
-                        filter = Filter()
-                        data_frame = filter.filter_time_series_by_date(market_data_request.start_date,
-                                                                       market_data_request.finish_date, data_frame)
+        data_frame = pandas.concat([data_frame1, data_frame2], axis=1)
 
-                        data_frame_list.append(data_frame)
-                    elif 'close' in market_data_request.fields:
+        return data_frame
 
-                        data_frame = fred.get_series(series_id=market_data_request.tickers[i],
-                                                     observation_start=market_data_request.start_date,
-                                                     observation_end=market_data_request.finish_date)
+    def download_daily_ticker(self, market_data_request, i):
+        data_frame_list = []
+        data_frame_release = []
 
-                        data_frame = pandas.DataFrame(data_frame)
-                        data_frame.columns = [market_data_request.tickers[i] + '.close']
-                        data_frame_list.append(data_frame)
+        # TODO refactor this code, a bit messy at the moment!
+        # calls to ALFRED/FRED are rate limited inside Fred, so only need to retry each call (rather than redoing all
+        # of them if one fails)
+        fred = Fred(api_key=DataConstants().fred_api_key, throttle=DataVendorThrottle.get_throttle('alfred'))
 
-                    if 'first-revision' in market_data_request.fields:
-                        data_frame = fred.get_series_first_revision(market_data_request.tickers[i],
-                                                                    observation_start=market_data_request.start_date,
-                                                                    observation_end=market_data_request.finish_date)
+        # acceptable fields: close, actual-release, release-date-time-full
+        if 'close' in market_data_request.fields and 'release-date-time-full' in market_data_request.fields:
+            data_frame = self.retry_vendor('alfred', fred.get_series_all_releases, market_data_request.tickers[i],
+                                           observation_start=market_data_request.start_date,
+                                           observation_end=market_data_request.finish_date)
 
-                        data_frame = pandas.DataFrame(data_frame)
-                        data_frame.columns = [market_data_request.tickers[i] + '.first-revision']
+            data_frame.columns = ['Date', market_data_request.tickers[i] + '.release-date-time-full',
+                                  market_data_request.tickers[i] + '.close']
 
-                        filter = Filter()
-                        data_frame = filter.filter_time_series_by_date(market_data_request.start_date,
-                                                                       market_data_request.finish_date, data_frame)
+            data_frame = data_frame.sort_values(by=['Date', market_data_request.tickers[i] + '.release-date-time-full'])
+            data_frame = data_frame.drop_duplicates(subset=['Date'], keep='last')
+            data_frame = data_frame.set_index(['Date'])
 
-                        data_frame_list.append(data_frame)
+            filter = Filter()
+            data_frame = filter.filter_time_series_by_date(market_data_request.start_date,
+                                                           market_data_request.finish_date, data_frame)
 
-                    if 'actual-release' in market_data_request.fields and 'release-date-time-full' in market_data_request.fields:
-                        data_frame = fred.get_series_all_releases(market_data_request.tickers[i],
-                                                                  observation_start=market_data_request.start_date,
-                                                                  observation_end=market_data_request.finish_date)
+            data_frame_list.append(data_frame)
+        elif 'close' in market_data_request.fields:
 
-                        data_frame.columns = ['Date', market_data_request.tickers[i] + '.release-date-time-full',
-                                              market_data_request.tickers[i] + '.actual-release']
+            data_frame = self.retry_vendor('alfred', fred.get_series, series_id=market_data_request.tickers[i],
+                                           observation_start=market_data_request.start_date,
+                                           observation_end=market_data_request.finish_date)
 
-                        data_frame = data_frame.sort_values(by=['Date', market_data_request.tickers[i] + '.release-date-time-full'])
-                        data_frame = data_frame.drop_duplicates(subset=['Date'], keep='first')
-                        data_frame = data_frame.set_index(['Date'])
+            data_frame = pandas.DataFrame(data_frame)
+            data_frame.columns = [market_data_request.tickers[i] + '.close']
+            data_frame_list.append(data_frame)
 
-                        filter = Filter()
-                        data_frame = filter.filter_time_series_by_date(market_data_request.start_date,
-                                                                       market_data_request.finish_date, data_frame)
+        if 'first-revision' in market_data_request.fields:
+            data_frame = self.retry_vendor('alfred', fred.get_series_first_revision, market_data_request.tickers[i],
+                                           observation_start=market_data_request.start_date,
+                                           observation_end=market_data_request.finish_date)
 
-                        data_frame_list.append(data_frame)
+            data_frame = pandas.DataFrame(data_frame)
+            data_frame.columns = [market_data_request.tickers[i] + '.first-revision']
 
-                    elif 'actual-release' in market_data_request.fields:
-                        data_frame = fred.get_series_first_release(market_data_request.tickers[i],
-                                                                   observation_start=market_data_request.start_date,
-                                                                   observation_end=market_data_request.finish_date)
+            filter = Filter()
+            data_frame = filter.filter_time_series_by_date(market_data_request.start_date,
+                                                           market_data_request.finish_date, data_frame)
 
-                        data_frame = pandas.DataFrame(data_frame)
-                        data_frame.columns = [market_data_request.tickers[i] + '.actual-release']
+            data_frame_list.append(data_frame)
 
-                        filter = Filter()
-                        data_frame = filter.filter_time_series_by_date(market_data_request.start_date,
-                                                                       market_data_request.finish_date, data_frame)
+        if 'actual-release' in market_data_request.fields and 'release-date-time-full' in market_data_request.fields:
+            data_frame = self.retry_vendor('alfred', fred.get_series_all_releases, market_data_request.tickers[i],
+                                           observation_start=market_data_request.start_date,
+                                           observation_end=market_data_request.finish_date)
 
-                        data_frame_list.append(data_frame)
+            data_frame.columns = ['Date', market_data_request.tickers[i] + '.release-date-time-full',
+                                  market_data_request.tickers[i] + '.actual-release']
 
-                    elif 'release-date-time-full' in market_data_request.fields:
-                        data_frame = fred.get_series_all_releases(market_data_request.tickers[i],
-                                                                  observation_start=market_data_request.start_date,
-                                                                  observation_end=market_data_request.finish_date)
+            data_frame = data_frame.sort_values(by=['Date', market_data_request.tickers[i] + '.release-date-time-full'])
+            data_frame = data_frame.drop_duplicates(subset=['Date'], keep='first')
+            data_frame = data_frame.set_index(['Date'])
 
-                        data_frame = data_frame['realtime_start']
+            filter = Filter()
+            data_frame = filter.filter_time_series_by_date(market_data_request.start_date,
+                                                           market_data_request.finish_date, data_frame)
 
-                        data_frame = pandas.DataFrame(data_frame)
-                        data_frame.columns = [market_data_request.tickers[i] + '.release-date-time-full']
+            data_frame_list.append(data_frame)
 
-                        data_frame.index = data_frame[market_data_request.tickers[i] + '.release-date-time-full']
-                        data_frame = data_frame.sort()
-                        data_frame = data_frame.drop_duplicates()
+        elif 'actual-release' in market_data_request.fields:
+            data_frame = self.retry_vendor('alfred', fred.get_series_first_release, market_data_request.tickers[i],
+                                           observation_start=market_data_request.start_date,
+                                           observation_end=market_data_request.finish_date)
 
-                        filter = Filter()
-                        data_frame_release.append(filter.filter_time_series_by_date(market_data_request.start_date,
-                                                                       market_data_request.finish_date, data_frame))
+            data_frame = pandas.DataFrame(data_frame)
+            data_frame.columns = [market_data_request.tickers[i] + '.actual-release']
 
-                    break
-                except:
-                    trials = trials + 1
-                    self.logger.info("Attempting... " + str(trials) + " request to download from ALFRED/FRED")
+            filter = Filter()
+            data_frame = filter.filter_time_series_by_date(market_data_request.start_date,
+                                                           market_data_request.finish_date, data_frame)
 
-            if trials == 5:
-                self.logger.error("Couldn't download from ALFRED/FRED after several attempts!")
+            data_frame_list.append(data_frame)
 
-        calc = Calculations()
+        elif 'release-date-time-full' in market_data_request.fields:
+            data_frame = self.retry_vendor('alfred', fred.get_series_all_releases, market_data_request.tickers[i],
+                                           observation_start=market_data_request.start_date,
+                                           observation_end=market_data_request.finish_date)
 
-        data_frame1 = calc.pandas_outer_join(data_frame_list)
-        data_frame2 = calc.pandas_outer_join(data_frame_release)
+            data_frame = data_frame['realtime_start']
 
-        data_frame = pandas.concat([data_frame1, data_frame2], axis=1)
+            data_frame = pandas.DataFrame(data_frame)
+            data_frame.columns = [market_data_request.tickers[i] + '.release-date-time-full']
 
-        return data_frame
+            data_frame.index = data_frame[market_data_request.tickers[i] + '.release-date-time-full']
+            data_frame = data_frame.sort()
+            data_frame = data_frame.drop_duplicates()
+
+            filter = Filter()
+            data_frame_release.append(filter.filter_time_series_by_date(market_data_request.start_date,
+                                                           market_data_request.finish_date, data_frame))
+
+        return data_frame_list, data_frame_release
 
 
 #######################################################################################################################
@@ -494,15 +492,21 @@ class DataVendorPandasWeb(DataVendor):
         return data_frame
 
     def download_daily(self, market_data_request):
-        return web.DataReader(market_data_request.tickers, market_data_request.data_source, market_data_request.start_date, market_data_request.finish_date)
+        return self.call_vendor(market_data_request.data_source, web.DataReader, market_data_request.tickers,
+                                market_data_request.data_source, market_data_request.start_date, market_data_request.finish_date)
 
 ########################################################################################################################
 
+import hashlib
+import itertools
 import os
+import threading
 from datetime import timedelta
 
+import numpy
 import pandas
 import requests
+from requests.adapters import HTTPAdapter
 
 try:
     from numba import jit
@@ -517,13 +521,17 @@ except ImportError:
 
 # abstract class on which this is based
 from findatapy.market.datavendor import DataVendor
+from findatapy.market.marketdatarequest import MarketDataRequest
+
+from findatapy.market.datavendorthrottle import DataVendorThrottle
 
 # for logging and constants
-from findatapy.util import ConfigManager, DataConstants, LoggerManager
+from findatapy.util import ConfigManager, DataConstants, LoggerManager, ThreadPoolManager
 
 class DataVendorDukasCopy(DataVendor):
     """Class for downloading tick data from DukasCopy (note: past month of data is not available). Selecting very large
-    histories is not recommended as you will likely run out memory given the amount of data requested.
+    histories is not recommended as you will likely run out memory given the amount of data requested (instead use
+    MarketDataGenerator.fetch_market_data_chunks, which returns the ticks a day or an hour at a time).
 
     Parsing of files is rewritten version https://github.com/nelseric/ticks/
         parsing has been speeded up considerably
@@ -532,6 +540,17 @@ class DataVendorDukasCopy(DataVendor):
     """
     tick_name  = "{symbol}/{year}/{month}/{day}/{hour}h_ticks.bi5"
 
+    # HTTP session (with connection pool) shared by all instances
+    _session = None
+    _session_lock = threading.Lock()
+
+    # fields of bars built from ticks (open/high/low/close are for mid)
+    bar_fields = ['open', 'high', 'low', 'close', 'bid-open', 'bid-high', 'bid-low', 'bid-close',
+                  'ask-open', 'ask-high', 'ask-low', 'ask-close', 'bidv', 'askv', 'numEvents']
+
+    # bi5 record: milliseconds since start of the hour, ask, bid (without decimal point), ask volume, bid volume
+    tick_dtype = numpy.dtype([('ms', '>u4'), ('ask', '>u4'), ('bid', '>u4'), ('askv', '>f4'), ('bidv', '>f4')])
+
     def __init__(self):
         super(DataVendor, self).__init__()
         self.logger = LoggerManager().getLogger(__name__)
@@ -554,22 +573,25 @@ class DataVendorDukasCopy(DataVendor):
         DataFrame
         """
 
-        market_data_request_vendor = self.construct_vendor_market_data_request(market_data_request)
-
         data_frame = None
         self.logger.info("Request Dukascopy data")
 
-        # doesn't support non-tick data
-        if (market_data_request.freq in ['daily', 'weekly', 'monthly', 'quarterly', 'yearly', 'intraday', 'minute', 'hourly']):
-            self.logger.warning("Dukascopy loader is for tick data only")
+        # second/minute/hourly bars are built from the ticks as they are downloaded
+        bar_ms = self.get_bar_ms(market_data_request)
+
+        # doesn't support daily data
+        if bar_ms is None and market_data_request.freq != 'tick':
+            self.logger.warning("Dukascopy loader is for tick data (or bars built from tick data) only")
 
             return None
 
+        market_data_request_vendor = self.construct_vendor_market_data_request(self.get_tick_request(market_data_request))
+
         # assume one ticker only (MarketDataGenerator only calls one ticker at a time)
-        if (market_data_request.freq in ['tick']):
+        if bar_ms is not None or market_data_request.freq == 'tick':
             # market_data_request_vendor.tickers = market_data_request_vendor.tickers[0]
 
-            data_frame = self.get_tick(market_data_request, market_data_request_vendor)
+            data_frame = self.get_tick(market_data_request, market_data_request_vendor, bar_ms = bar_ms)
 
             if data_frame is not None: data_frame.tz_localize('UTC')
 
@@ -580,9 +602,118 @@ class DataVendorDukasCopy(DataVendor):
     def kill_session(self):
         return
 
-    def get_tick(self, market_data_request, market_data_request_vendor):
+    def load_ticker_chunks(self, market_data_request, chunk_freq = 'day'):
+        """Retrieves tick data from Dukascopy an hour or a day at a time, so long histories can be processed without
+        holding all of them in memory (the next chunk is downloaded whilst the current one is being processed)
+
+        Parameters
+        ----------
+        market_data_request : MarketDataRequest
+            contains all the various parameters detailing time series start and finish, tickers etc
+        chunk_freq : str
+            'hour' or 'day' (size of each chunk)
+
+        Returns
+        -------
+        generator(DataFrame)
+        """
+
+        bar_ms = self.get_bar_ms(market_data_request)
+
+        if bar_ms is None and market_data_request.freq != 'tick':
+            self.logger.warning("Dukascopy loader is for tick data (or bars built from tick data) only")
+
+            return
+
+        market_data_request_vendor = self.construct_vendor_market_data_request(self.get_tick_request(market_data_request))
+
+        symbol = market_data_request_vendor.tickers[0]
+
+        self.logger.info("About to download chunks from Dukascopy... for " + symbol)
 
-        data_frame = self.download_tick(market_data_request_vendor)
+        time_list = list(self.hour_range(market_data_request.start_date, market_data_request.finish_date))
+
+        if chunk_freq == 'hour':
+            chunk_list = [[time] for time in time_list]
+        else:
+            chunk_list = [list(g) for k, g in itertools.groupby(time_list, key = lambda time: time.date())]
+
+        if chunk_list == []: return
+
+        # each generator prefetches one chunk at a time, the pool is sized by market_thread_no so that several
+        # generators (eg. for different tickers) can prefetch at the same time, rather than queueing
+        executor = ThreadPoolManager.get_executor('dukascopy.chunk', ThreadPoolManager.get_thread_no('dukascopy'))
+        future = executor.submit(self.download_tick_hours, chunk_list[0], symbol, bar_ms)
+
+        # the last bar of a chunk may carry on into the next chunk, so hold it back until the next chunk arrives
+        bar_pending = None
+
+        for i in range(0, len(chunk_list)):
+            data_frame = future.result()
+
+            # start downloading the next chunk before handing this one over
+            if i + 1 < len(chunk_list):
+                future = executor.submit(self.download_tick_hours, chunk_list[i + 1], symbol, bar_ms)
+
+            if self.is_bar_split(bar_ms):
+                if bar_pending is not None:
+                    data_frame = bar_pending if data_frame is None else \
+                        self.combine_bars(pandas.concat([bar_pending, data_frame]), bar_ms)
+
+                bar_pending = None
+
+                if data_frame is not None and i + 1 < len(chunk_list):
+                    bar_pending = data_frame.iloc[-1:]
+                    data_frame = data_frame.iloc[:-1]
+
+                    if data_frame.empty: data_frame = None
+
+            if data_frame is not None:
+                yield self.translate_tick_columns(data_frame, market_data_request, market_data_request_vendor)
+
+    def get_bar_ms(self, market_data_request):
+        """Gets the length of bars (in milliseconds) to build from the ticks, if the MarketDataRequest asks for second,
+        minute or hourly data (eg. gran_freq = 'minute' and freq_mult = 5 for 5 minute bars)
+
+        Parameters
+        ----------
+        market_data_request : MarketDataRequest
+            contains all the various parameters detailing time series start and finish, tickers etc
+
+        Returns
+        -------
+        int
+            None if we want ticks
+        """
+
+        unit_ms = {'second' : 1000, 'minute' : 60 * 1000, 'hourly' : 60 * 60 * 1000}
+
+        if market_data_request.gran_freq not in unit_ms:
+            return None
+
+        freq_mult = market_data_request.freq_mult
+
+        if freq_mult is None: freq_mult = 1
+
+        return int(unit_ms[market_data_request.gran_freq] * freq_mult)
+
+    def get_tick_request(self, market_data_request):
+        # tickers are only defined for tick data in the configuration files (bars are built from the ticks)
+        if market_data_request.freq == 'tick':
+            return market_data_request
+
+        market_data_request = MarketDataRequest(md_request=market_data_request)
+        market_data_request.freq = 'tick'
+
+        return market_data_request
+
+    def get_tick(self, market_data_request, market_data_request_vendor, bar_ms = None):
+
+        data_frame = self.download_tick(market_data_request_vendor, bar_ms = bar_ms)
+
+        return self.translate_tick_columns(data_frame, market_data_request, market_data_request_vendor)
+
+    def translate_tick_columns(self, data_frame, market_data_request, market_data_request_vendor):
 
         # convert from vendor to findatapy tickers/fields
         if data_frame is not None:
@@ -603,31 +734,37 @@ class DataVendorDukasCopy(DataVendor):
 
         return data_frame
 
-    def download_tick(self, market_data_request):
+    def download_tick(self, market_data_request, bar_ms = None):
 
         symbol = market_data_request.tickers[0]
-        df_list = []
 
         self.logger.info("About to download from Dukascopy... for " + symbol)
 
-        # single threaded
-        df_list = [self.fetch_file(time, symbol) for time in
-                  self.hour_range(market_data_request.start_date, market_data_request.finish_date)]
+        time_list = list(self.hour_range(market_data_request.start_date, market_data_request.finish_date))
+
+        return self.download_tick_hours(time_list, symbol, bar_ms = bar_ms)
 
-        # TODO parallel (has pickle issues)
-        # time_list = self.hour_range(market_data_request.start_date, market_data_request.finish_date)
-        # import multiprocessing_on_dill as multiprocessing
-        #
-        # pool = multiprocessing.Pool(processes=4)
-        # results = [pool.apply_async(self.fetch_file, args=(time, symbol)) for time in time_list]
-        # df_list = [p.get() for p in results]
+    def download_tick_hours(self, time_list, symbol, bar_ms = None):
+
+        # download (and decompress/parse) each hour in a shared thread pool, the DataVendorThrottle for Dukascopy
+        # decides how many downloads are actually in flight at once
+        thread_no = DataVendorThrottle.get_throttle('dukascopy').get_max_concurrency()
+
+        df_list = ThreadPoolManager.map('dukascopy.tick', lambda time: self.fetch_file(time, symbol, bar_ms = bar_ms),
+                                        time_list, thread_no = thread_no)
 
         try:
-            return pandas.concat(df_list)
+            data_frame = pandas.concat(df_list)
         except:
             return None
 
-    def fetch_file(self, time, symbol):
+        # bars which don't divide an hour span several files, so combine the partial bars
+        if self.is_bar_split(bar_ms):
+            data_frame = self.combine_bars(data_frame, bar_ms)
+
+        return data_frame
+
+    def fetch_file(self, time, symbol, bar_ms = None):
         if time.hour % 24 == 0: self.logger.info("Downloading... " + str(time))
 
         tick_path = self.tick_name.format(
@@ -638,57 +775,173 @@ class DataVendorDukasCopy(DataVendor):
                 hour = str(time.hour).rjust(2, '0')
             )
 
-        tick = self.fetch_tick(DataConstants().dukascopy_base_url + tick_path)
+        tick = None
 
+        # check the local store first (so we don't download the same hour again)
         if DataConstants().dukascopy_write_temp_tick_disk:
-            out_path = DataConstants().temp_folder + "/dkticks/" + tick_path
+            out_path = DataConstants().dukascopy_tick_folder + "/" + tick_path
+
+            tick = self.read_tick(out_path)
+
+        if tick is None:
+            tick = self.fetch_tick(DataConstants().dukascopy_base_url + tick_path)
 
-            if not os.path.exists(out_path):
+            if DataConstants().dukascopy_write_temp_tick_disk and tick is not None:
                 if not os.path.exists(os.path.dirname(out_path)):
                     os.makedirs(os.path.dirname(out_path))
 
-            self.write_tick(tick, out_path)
+                if len(tick) > 0:
+                    self.write_tick(tick, out_path)
+                elif self.is_hour_final(time):
+                    # no ticks for this hour (eg. weekend), remember that so we don't ask again
+                    self.write_tick(tick, out_path + ".empty")
+
+        # no data for this hour
+        if tick is None or len(tick) == 0:
+            return None
 
         try:
+            if bar_ms is not None:
+                return self.retrieve_bars(lzma.decompress(tick), symbol, time, bar_ms)
+
             return self.retrieve_df(lzma.decompress(tick), symbol, time)
         except:
             return None
 
     def fetch_tick(self, tick_url):
-        i = 0
         tick_request = None
 
-        # try up to 5 times to download
-        while i < 5:
-            try:
-                tick_request = requests.get(tick_url)
-                i = 5
-            except:
-                i = i + 1
+        # retries with backoff if Dukascopy is down or throttling us
+        try:
+            tick_request = self.call_vendor('dukascopy', self.get_session().get, tick_url)
+        except Exception as e:
+            self.logger.warning("Failed to download from " + tick_url + ": " + str(e))
 
         if (tick_request is None):
-            self.logger("Failed to download from " + tick_url)
+            return None
+
+        # no file means there were no ticks in that hour
+        if tick_request.status_code == 404:
+            return b''
+
+        if tick_request.status_code != 200:
+            self.logger.warning("Failed to download from " + tick_url + ": status code " + str(tick_request.status_code))
+
             return None
 
         return tick_request.content
 
+    @staticmethod
+    def get_session():
+        """Gets the HTTP session shared by all the Dukascopy downloads, which keeps connections alive between requests
+
+        Returns
+        -------
+        requests.Session
+        """
+        with DataVendorDukasCopy._session_lock:
+            if DataVendorDukasCopy._session is None:
+                thread_no = DataVendorThrottle.get_throttle('dukascopy').get_max_concurrency()
+
+                adapter = HTTPAdapter(pool_connections = 1, pool_maxsize = max(thread_no, 1))
+
+                session = requests.Session()
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+
+                DataVendorDukasCopy._session = session
+
+            return DataVendorDukasCopy._session
+
+    def read_tick(self, out_path):
+        """Reads a bi5 file from the local store, checking its size and checksum against those recorded when it was
+        written
+
+        Parameters
+        ----------
+        out_path : str
+            path of the bi5 file
+
+        Returns
+        -------
+        bytes
+            contents of the file (empty if we know there were no ticks in that hour, None if it isn't in the store or
+            is corrupted)
+        """
+
+        if os.path.exists(out_path + ".empty"):
+            return b''
+
+        if not os.path.exists(out_path) or not os.path.exists(out_path + ".md5"):
+            return None
+
+        try:
+            with open(out_path + ".md5", "r") as checksum_file:
+                checksum, size = checksum_file.read().split()
+
+            with open(out_path, "rb") as data_file:
+                content = data_file.read()
+        except Exception as e:
+            self.logger.warning("Couldn't read " + out_path + ": " + str(e))
+
+            return None
+
+        if len(content) != int(size) or hashlib.md5(content).hexdigest() != checksum:
+            self.logger.warning("Corrupted file in Dukascopy store, will download again " + out_path)
+
+            return None
+
+        return content
+
     def write_tick(self, content, out_path):
-        data_file = open(out_path, "wb+")
-        data_file.write(content)
-        data_file.close()
+        """Writes a bi5 file to the local store, together with its checksum and size (empty files are used as markers
+        for hours without ticks)
+
+        Parameters
+        ----------
+        content : bytes
+            contents of the bi5 file
+        out_path : str
+            path of the bi5 file
+        """
+
+        try:
+            # write to a temporary file first, so other processes never see a half written file
+            temp_path = out_path + "." + str(os.getpid()) + "." + str(threading.current_thread().ident) + ".tmp"
+
+            with open(temp_path, "wb") as data_file:
+                data_file.write(content)
+
+            if len(content) > 0:
+                with open(out_path + ".md5", "w") as checksum_file:
+                    checksum_file.write(hashlib.md5(content).hexdigest() + " " + str(len(content)))
+
+            os.replace(temp_path, out_path)
+        except Exception as e:
+            self.logger.warning("Couldn't write " + out_path + ": " + str(e))
+
+    def is_hour_final(self, time):
+        """Checks whether an hour is old enough that Dukascopy won't add any more ticks to it
+
+        Parameters
+        ----------
+        time : datetime
+            start of the hour
+
+        Returns
+        -------
+        bool
+        """
+
+        return pandas.Timestamp(time).tz_localize(None) < \
+               pandas.Timestamp.utcnow().tz_localize(None) - pandas.Timedelta(days = DataConstants().dukascopy_tick_final_days)
 
     def chunks(self, list, n):
         if n < 1:
             n = 1
         return [list[i:i + n] for i in range(0, len(list), n)]
 
-    def retrieve_df(self, data, symbol, epoch):
-        date, tuple = self.parse_tick_data(data, epoch)
-
-        df = pandas.DataFrame(data = tuple, columns=['temp', 'ask', 'bid', 'askv', 'bidv'], index = date)
-        df.drop('temp', axis = 1)
-        df.index.name = 'Date'
-
+    def get_divisor(self, symbol):
         divisor = 100000
 
         # where JPY is the terms currency we have different divisor
@@ -698,12 +951,119 @@ class DataVendorDukasCopy(DataVendor):
         if symbol == 'BRENTCMDUSD':
             divisor = 1000
 
+        return divisor
+
+    def retrieve_df(self, data, symbol, epoch):
+        date, ticks = self.parse_tick_data(data, epoch)
+
+        divisor = self.get_divisor(symbol)
+
         # prices are returned without decimal point (need to divide)
-        df['bid'] =  df['bid'] /  divisor
-        df['ask'] =  df['ask'] / divisor
+        ask = ticks['ask'].astype(numpy.float64)
+        bid = ticks['bid'].astype(numpy.float64)
+
+        numpy.divide(ask, divisor, out = ask)
+        numpy.divide(bid, divisor, out = bid)
+
+        df = pandas.DataFrame(data = {'ask' : ask, 'bid' : bid,
+                                      'askv' : ticks['askv'].astype(numpy.float64),
+                                      'bidv' : ticks['bidv'].astype(numpy.float64)},
+                              columns = ['ask', 'bid', 'askv', 'bidv'], index = date)
+        df.index.name = 'Date'
+
+        return df
+
+    def retrieve_bars(self, data, symbol, epoch, bar_ms):
+        """Builds bars from an hour of ticks, without creating a DataFrame of the ticks. Bars have OHLC for mid, bid and
+        ask, the bid/ask volume traded and the number of ticks (bars without any ticks are skipped).
+
+        Parameters
+        ----------
+        data : bytes
+            decompressed bi5 file
+        symbol : str
+            Dukascopy ticker
+        epoch : datetime
+            start of the hour
+        bar_ms : int
+            length of each bar in milliseconds, bars are aligned to the epoch (not the start of the hour), so bars
+            which straddle two hours are returned partially by each hour (see combine_bars)
+
+        Returns
+        -------
+        DataFrame
+        """
+
+        ticks = numpy.frombuffer(data, dtype = self.tick_dtype, count = len(data) // self.tick_dtype.itemsize)
+
+        if len(ticks) == 0: return None
+
+        # bucket on milliseconds since the epoch, so bars line up across hours (eg. for 7 minute bars)
+        epoch_ms = pandas.Timestamp(epoch).value // 1000000
+
+        # ticks are in time order, so each bar is a contiguous block of ticks
+        bar = (ticks['ms'].astype(numpy.int64) + epoch_ms) // bar_ms
+        start = numpy.concatenate(([0], numpy.flatnonzero(numpy.diff(bar)) + 1))
+        finish = numpy.concatenate((start[1:], [len(ticks)])) - 1
+
+        divisor = self.get_divisor(symbol)
+
+        data_dict = {}
+
+        bid = ticks['bid'].astype(numpy.float64)
+        ask = ticks['ask'].astype(numpy.float64)
+
+        numpy.divide(bid, divisor, out = bid)
+        numpy.divide(ask, divisor, out = ask)
+
+        mid = (bid + ask) / 2.0
+
+        for name, price in [('', mid), ('bid-', bid), ('ask-', ask)]:
+            data_dict[name + 'open'] = price[start]
+            data_dict[name + 'high'] = numpy.maximum.reduceat(price, start)
+            data_dict[name + 'low'] = numpy.minimum.reduceat(price, start)
+            data_dict[name + 'close'] = price[finish]
+
+        data_dict['bidv'] = numpy.add.reduceat(ticks['bidv'].astype(numpy.float64), start)
+        data_dict['askv'] = numpy.add.reduceat(ticks['askv'].astype(numpy.float64), start)
+        data_dict['numEvents'] = (finish - start + 1).astype(numpy.float64)
+
+        date = pandas.DatetimeIndex((bar[start] * bar_ms).astype('datetime64[ms]').astype('datetime64[ns]'))
+
+        df = pandas.DataFrame(data = data_dict, columns = self.bar_fields, index = date)
+        df.index.name = 'Date'
 
         return df
 
+    def is_bar_split(self, bar_ms):
+        """Checks whether bars of this length can straddle two hourly files (ie. they don't divide an hour), in which
+        case the partial bars from each hour need to be combined
+        """
+        return bar_ms is not None and (60 * 60 * 1000) % bar_ms != 0
+
+    def combine_bars(self, data_frame, bar_ms):
+        """Combines partial bars with the same timestamp (ie. which straddle several hourly files, such as 7 minute
+        or 4 hour bars) into a single bar. Bars must be in time order.
+        """
+
+        agg = {}
+
+        for name in ['', 'bid-', 'ask-']:
+            agg[name + 'open'] = 'first'
+            agg[name + 'high'] = 'max'
+            agg[name + 'low'] = 'min'
+            agg[name + 'close'] = 'last'
+
+        for name in ['bidv', 'askv', 'numEvents']:
+            agg[name] = 'sum'
+
+        if not(data_frame.index.has_duplicates): return data_frame
+
+        data_frame = data_frame.groupby(level = 0, sort = True).agg(agg)
+        data_frame.index.name = 'Date'
+
+        return data_frame[self.bar_fields]
+
     def hour_range(self, start_date, end_date):
           delta_t = end_date - start_date
 
@@ -713,26 +1073,29 @@ class DataVendorDukasCopy(DataVendor):
               yield start_date + timedelta(0, 0, 0, 0, 0, n) # Hours
 
     def parse_tick_data(self, data, epoch):
-        import struct
+        """Parses a decompressed bi5 file, which is made up of 20 byte big endian records (milliseconds since the start
+        of the hour, ask, bid, ask volume and bid volume)
 
-        # tick = namedtuple('Tick', 'Date ask bid askv bidv')
-
-        chunks_list = self.chunks(data, 20)
-        parsed_list = []
-        date = []
+        Parameters
+        ----------
+        data : bytes
+            decompressed bi5 file
+        epoch : datetime
+            start of the hour
 
-        # note: Numba can speed up for loops
-        for row in chunks_list:
-            d = struct.unpack(">LLLff", row)
-            date.append((epoch + timedelta(0,0,0, d[0])))
+        Returns
+        -------
+        DatetimeIndex, numpy.ndarray
+        """
 
-            # SLOW: no point using named tuples!
-            # row_data = tick._asdict(tick._make(d))
-            # row_data['Date'] = (epoch + timedelta(0,0,0,row_data['Date']))
+        # read the whole buffer in one go (without copying), ignoring any incomplete record at the end
+        ticks = numpy.frombuffer(data, dtype = self.tick_dtype, count = len(data) // self.tick_dtype.itemsize)
 
-            parsed_list.append(d)
+        date = pandas.DatetimeIndex(
+            (pandas.Timestamp(epoch).to_datetime64().astype('datetime64[ms]') + ticks['ms'].astype('timedelta64[ms]'))
+                .astype('datetime64[ns]'))
 
-        return date, parsed_list
+        return date, ticks
 
     def chunks(self, list, n):
         if n < 1: n = 1
@@ -773,7 +1136,8 @@ class Fred(object):
 
     def __init__(self,
                  api_key=None,
-                 api_key_file=None):
+                 api_key_file=None,
+                 throttle=None):
         """Initialize the Fred class that provides useful functions to query the Fred dataset. You need to specify a valid
         API key in one of 3 ways: pass the string via api_key, or set api_key_file to a file with the api key in the
         first line, or set the environment variable 'FRED_API_KEY' to the value of your api key. You can sign up for a
@@ -790,6 +1154,9 @@ class Fred(object):
             self.api_key = os.environ.get('FRED_API_KEY')
         self.root_url = 'https://api.stlouisfed.org/fred'
 
+        # optional DataVendorThrottle to rate limit calls
+        self.throttle = throttle
+
         if self.api_key is None:
             import textwrap
             raise ValueError(textwrap.dedent("""\
@@ -804,11 +1171,15 @@ class Fred(object):
         """Helper function for fetching data given a request URL
         """
         try:
-            response = urlopen(url)
+            if self.throttle is not None:
+                response = self.throttle.call(urlopen, url)
+            else:
+                response = urlopen(url)
+
             root = ET.fromstring(response.read())
         except HTTPError as exc:
             root = ET.fromstring(exc.read())
-            raise ValueError(root.get('message'))
+            raise ValueError(root.get('message')) from exc
         return root
 
     def _parse(self, date_str, format='%Y-%m-%d'):
@@ -13,10 +13,12 @@ __author__ = 'saeedamen' # Saeed Amen
 #
 
 import pandas
+import numpy
 import codecs
 import datetime
 from dateutil.parser import parse
 import shutil
+import threading
 
 try:
     import bcolz
@@ -25,8 +27,10 @@ except: pass
 from openpyxl import load_workbook
 import os.path
 
+from findatapy.timeseries import Calculations
 from findatapy.util.dataconstants import DataConstants
 from findatapy.util.loggermanager import LoggerManager
+from findatapy.util.threadpoolmanager import ThreadPoolManager
 
 # NOTE: BCOLZ support is alpha!
 _replace_chars = ['_a_',
@@ -50,12 +54,27 @@ _invalid_chars = ['&',
                   '=',
                   ' ']
 
+# positions of year, month, day, hour, minute and second in the dates of intraday CSV files
+_intraday_date_positions = {None : [(6, 10), (3, 5), (0, 2), (11, 13), (14, 16), (17, 19)],
+                            'dukascopy' : [(0, 4), (5, 7), (8, 10), (11, 13), (14, 16), (17, 19)]}
+
 class IOEngine(object):
     """Write and reads time series data to disk in various formats, CSV and HDF5 format. (planning to add other interfaces too).
-    Also supports BColz (but not currently stable).
+    Also supports BColz (but not currently stable), Parquet (parquet, needs pyarrow), where date ranges and columns are
+    read without loading the whole file, Parquet files partitioned by ticker and day (parquet_day, needs pyarrow),
+    which is suited to appending tick data, and Arrow IPC files (arrow, needs pyarrow), which are memory mapped when
+    read, so processes reading the same file share its pages rather than each having a copy.
+
+    Arctic stores (and their MongoDB clients, which keep a pool of connections) are shared by all IOEngines in the
+    process, one for each db_server, as are the Arctic libraries opened on them.
 
     """
 
+    _arctic_stores = {}
+    _arctic_clients = {}
+    _arctic_libraries = {}
+    _arctic_lock = threading.Lock()
+
     def __init__(self):
         self.logger = LoggerManager().getLogger(__name__)
 
@@ -129,196 +148,1261 @@ class IOEngine(object):
         DataFrame
         """
 
-        return self.read_csv_data_frame(f_name, freq, cutoff = cutoff, dateparse = dateparse,
-                            postfix = postfix, intraday_tz = intraday_tz, excel_sheet = excel_sheet)
+        return self.read_csv_data_frame(f_name, freq, cutoff = cutoff, dateparse = dateparse,
+                            postfix = postfix, intraday_tz = intraday_tz, excel_sheet = excel_sheet)
+
+    def remove_time_series_cache_on_disk(self, fname, engine = 'hdf5_fixed', db_server = '127.0.0.1'):
+
+        if 'hdf5' in engine:
+            engine = 'hdf5'
+
+        if (engine == 'bcolz'):
+            # convert invalid characters to substitutes (which Bcolz can't deal with)
+            pass
+        elif (engine == 'arctic'):
+            fname = self.get_arctic_library_name(fname)
+
+            self.logger.info('Load MongoDB library: ' + fname)
+
+            with IOEngine._arctic_lock:
+                IOEngine._arctic_libraries.pop((db_server, fname), None)
+
+            IOEngine.get_arctic_store(db_server).delete_library(fname)
+
+            self.logger.info("Deleted MongoDB library: " + fname)
+
+        elif (engine == 'parquet'):
+            try:
+                os.remove(self.get_parquet_filename(fname))
+            except:
+                pass
+
+        elif (engine == 'arrow'):
+            try:
+                os.remove(self.get_arrow_filename(fname))
+            except:
+                pass
+
+        elif (engine == 'parquet_day'):
+            shutil.rmtree(self.get_parquet_day_foldername(fname), ignore_errors=True)
+
+        elif (engine == 'hdf5'):
+            h5_filename = self.get_h5_filename(fname)
+
+            # delete the old copy
+            try:
+                os.remove(h5_filename)
+            except:
+                pass
+
+
+    ### functions to handle HDF5 on disk
+    def write_time_series_cache_to_disk(self, fname, data_frame,
+                                        engine = 'hdf5_fixed', append_data = False, db_server = '127.0.0.1',
+                                        filter_out_matching = None, data_columns = None, compression = None):
+        """Writes Pandas data frame to disk as HDF5 format or bcolz format or in Arctic
+
+        Parmeters
+        ---------
+        fname : str
+            path of file
+        data_frame : DataFrame
+            data frame to be written to disk
+        data_columns : list(str) or bool (optional)
+            for hdf5_table, columns which can be used in where clauses when reading (the dates can always be used)
+        compression : (str, int) or str (optional)
+            codec and level (eg. ('blosc:lz4', 5)) for HDF5, parquet, parquet_day and arrow, otherwise taken from
+            DataConstants.market_data_cache_compression
+        """
+
+        # default HDF5 format
+        hdf5_format = 'fixed'
+
+        if 'hdf5' in engine:
+            hdf5_format = engine.split('_')[1]
+            engine = 'hdf5'
+
+        if (engine == 'bcolz'):
+            # convert invalid characters to substitutes (which Bcolz can't deal with)
+            data_frame.columns = self.find_replace_chars(data_frame.columns, _invalid_chars, _replace_chars)
+            data_frame.columns = ['A_' + x for x in data_frame.columns]
+
+            data_frame['DTS_'] = pandas.to_datetime(data_frame.index, unit='ns')
+
+            bcolzpath = self.get_bcolz_filename(fname)
+            shutil.rmtree(bcolzpath, ignore_errors=True)
+            zlens = bcolz.ctable.fromdataframe(data_frame, rootdir=bcolzpath)
+        elif (engine == 'arctic'):
+            self.write_arctic(fname, data_frame, append_data = append_data, db_server = db_server,
+                              filter_out_matching = filter_out_matching)
+
+        elif (engine == 'parquet'):
+            if ('intraday' in fname):
+                data_frame = data_frame.astype('float32')
+
+            self.write_time_series_parquet(fname, data_frame, append_data = append_data, compression = compression)
+
+        elif (engine == 'arrow'):
+            if ('intraday' in fname):
+                data_frame = data_frame.astype('float32')
+
+            self.write_time_series_arrow(fname, data_frame, append_data = append_data, compression = compression)
+
+        elif (engine == 'parquet_day'):
+            if ('intraday' in fname):
+                data_frame = data_frame.astype('float32')
+
+            self.write_time_series_partitioned(fname, data_frame, append_data = append_data,
+                                               compression = compression)
+
+        elif (engine == 'hdf5'):
+            h5_filename = self.get_h5_filename(fname)
+
+            complib, complevel = self.get_compression(fname, 'hdf5', compression = compression)
+
+            # append data only works properly for HDF5 stored as tables (but this is much slower than fixed format)
+            # new points overwrite old points at the same time
+            if append_data and os.path.isfile(h5_filename):
+                store = pandas.HDFStore(h5_filename, complib=complib, complevel=complevel)
+
+                if ('intraday' in fname):
+                    data_frame = data_frame.astype('float32')
+
+                try:
+                    self.append_hdf5_data_frame(store, data_frame, data_columns = data_columns)
+                finally:
+                    store.close()
+            else:
+                h5_filename_temp = self.get_h5_filename(fname + ".temp")
+
+                # delete the old copy
+                try:
+                    os.remove(h5_filename_temp)
+                except: pass
+
+                store = pandas.HDFStore(h5_filename_temp, complib=complib, complevel=complevel)
+
+                if ('intraday' in fname):
+                    data_frame = data_frame.astype('float32')
+
+                if hdf5_format == 'table':
+                    store.put(key='data', value=data_frame, format=hdf5_format, data_columns=data_columns, index=False)
+
+                    self.create_hdf5_table_index(store)
+                    self.set_hdf5_last_date(store, data_frame)
+                else:
+                    store.put(key='data', value=data_frame, format=hdf5_format)
+
+                store.close()
+
+                # delete the old copy
+                try:
+                    os.remove(h5_filename)
+                except: pass
+
+                # once written to disk rename
+                os.rename(h5_filename_temp, h5_filename)
+
+    def append_hdf5_data_frame(self, store, data_frame, data_columns = None):
+        """Appends time series to an HDF5 store. Only the tail of the existing table which overlaps with the new time
+        series is read (and rewritten), using the last date stored in the metadata of the table, so appending is
+        quick however long the existing time series is. Fixed format stores have to be rewritten in full.
+
+        Parameters
+        ----------
+        store : HDFStore
+            HDF5 store with time series (in 'data')
+        data_frame : DataFrame
+            time series to be appended
+        data_columns : list(str) or bool (optional)
+            columns which can be used in where clauses when reading
+        """
+        data_frame = data_frame.sort_index()
+
+        if 'data' not in store:
+            store.append('data', data_frame, format='table', data_columns=data_columns)
+            self.set_hdf5_last_date(store, data_frame)
+
+            return
+
+        if not store.get_storer('data').is_table:
+            store.put('data', self.combine_time_series(store.select('data'), data_frame), format='fixed')
+
+            return
+
+        last_date = self.get_hdf5_last_date(store)
+        first_date = data_frame.index[0]
+
+        if last_date is not None and first_date <= last_date:
+            # the where clause uses the index on the dates, so only the overlapping rows are touched
+            data_frame = self.combine_time_series(store.select('data', where='index >= first_date'), data_frame)
+            store.remove('data', where='index >= first_date')
+
+        store.append('data', data_frame, format='table', data_columns=data_columns)
+        self.set_hdf5_last_date(store, data_frame)
+
+    def get_hdf5_last_date(self, store):
+        """Gets the last date of the time series in an HDF5 table, from its metadata (or otherwise by reading the last
+        row)
+
+        Parameters
+        ----------
+        store : HDFStore
+            HDF5 store with time series in table format (in 'data')
+
+        Returns
+        -------
+        Timestamp
+        """
+        storer = store.get_storer('data')
+
+        if 'last_date' in storer.attrs:
+            return storer.attrs.last_date
+
+        nrows = storer.nrows
+
+        if not nrows: return None
+
+        return store.select('data', start=nrows - 1, stop=nrows).index[-1]
+
+    def set_hdf5_last_date(self, store, data_frame):
+        """Stores the last date of the time series in the metadata of an HDF5 table (if it is later than the current one)
+
+        Parameters
+        ----------
+        store : HDFStore
+            HDF5 store with time series in table format (in 'data')
+        data_frame : DataFrame
+            time series which has just been written
+        """
+        if data_frame.empty: return
+
+        storer = store.get_storer('data')
+        last_date = data_frame.index[-1]
+
+        if 'last_date' in storer.attrs and storer.attrs.last_date is not None and storer.attrs.last_date > last_date:
+            return
+
+        storer.attrs.last_date = last_date
+
+    def combine_time_series(self, data_frame_old, data_frame):
+        """Combines an existing time series with a new one, where the new points overwrite old points at the same time
+
+        Parameters
+        ----------
+        data_frame_old : DataFrame
+            existing time series
+        data_frame : DataFrame
+            new time series
+
+        Returns
+        -------
+        DataFrame
+        """
+        if data_frame_old is None or data_frame_old.empty: return data_frame
+
+        data_frame_old = data_frame_old.loc[~data_frame_old.index.isin(data_frame.index)]
+
+        return pandas.concat([data_frame_old, data_frame]).sort_index()
+
+    def create_hdf5_table_index(self, store):
+        """Creates a completely sorted index on the dates (and any data columns) of an HDF5 table, which makes reads
+        with where clauses on them much quicker
+
+        Parameters
+        ----------
+        store : HDFStore
+            HDF5 store with time series in table format (in 'data')
+        """
+        store.create_table_index('data', optlevel=9, kind='full')
+
+    def read_hdf5_data_frame(self, fname, start_date = None, finish_date = None, columns = None):
+        """Reads time series from an HDF5 file. For HDF5 files in table format, the date range and columns are passed to
+        HDF5 as a where clause, so only the matching rows are read (quick if written with an index, see
+        create_hdf5_table_index). For fixed format files, everything is read and then filtered.
+
+        Parameters
+        ----------
+        fname : str
+            filename of the time series
+        start_date : datetime (optional)
+            start date
+        finish_date : datetime (optional)
+            finish date
+        columns : list(str) (optional)
+            columns to read (default all)
+
+        Returns
+        -------
+        DataFrame
+        """
+        if isinstance(columns, str):
+            columns = [columns]
+
+        store = pandas.HDFStore(self.get_h5_filename(fname), mode='r')
+
+        try:
+            if store.get_storer('data').is_table:
+                where = []
+
+                if start_date is not None or finish_date is not None:
+                    # dates need to match the timezone (or lack of it) of the stored dates
+                    tz = store.select('data', start=0, stop=1).index.tz
+
+                    # where clauses can refer to local variables
+                    if start_date is not None:
+                        start_ts = self.get_tz_timestamp(start_date, tz)
+                        where.append('index >= start_ts')
+
+                    if finish_date is not None:
+                        finish_ts = self.get_tz_timestamp(finish_date, tz)
+                        where.append('index <= finish_ts')
+
+                return store.select('data', where=where if where != [] else None, columns=columns)
+
+            data_frame = store.select('data')
+        finally:
+            store.close()
+
+        if columns is not None:
+            data_frame = data_frame[columns]
+
+        if start_date is not None or finish_date is not None:
+            index = data_frame.index
+
+            if index.tz is None:
+                index = index.tz_localize('UTC')
+            else:
+                index = index.tz_convert('UTC')
+
+            mask = numpy.ones(len(index), dtype=bool)
+
+            if start_date is not None:
+                mask &= index >= self.get_utc_timestamp(start_date)
+
+            if finish_date is not None:
+                mask &= index <= self.get_utc_timestamp(finish_date)
+
+            data_frame = data_frame.loc[mask]
+
+        return data_frame
+
+    ### functions to handle Arctic (MongoDB)
+    @staticmethod
+    def get_arctic_store(db_server = '127.0.0.1'):
+        """Gets the Arctic store for a MongoDB server, which is shared across the process (created when first used).
+        Its MongoDB client keeps a pool of connections open, so we don't have to connect for every read/write.
+
+        Parameters
+        ----------
+        db_server : str
+            MongoDB server
+
+        Returns
+        -------
+        Arctic
+        """
+        with IOEngine._arctic_lock:
+            if db_server not in IOEngine._arctic_stores:
+                import pymongo
+
+                constants = DataConstants()
+
+                c = pymongo.MongoClient(db_server, connect=False,
+                                        socketTimeoutMS=constants.arctic_socket_timeout_ms,
+                                        serverSelectionTimeoutMS=constants.arctic_server_selection_timeout_ms,
+                                        maxPoolSize=constants.arctic_max_pool_size)
+
+                IOEngine._set_arctic_client(db_server, c)
+
+            return IOEngine._arctic_stores[db_server]
+
+    @staticmethod
+    def set_arctic_client(db_server, client):
+        """Sets the MongoDB client to use for a db_server (eg. a mongomock client for testing), replacing (and closing)
+        any existing one
+
+        Parameters
+        ----------
+        db_server : str
+            MongoDB server
+        client : MongoClient
+            client for the MongoDB server
+        """
+        with IOEngine._arctic_lock:
+            client_old = IOEngine._set_arctic_client(db_server, client)
+
+        if client_old is not None and client_old is not client:
+            IOEngine._close_arctic_client(client_old)
+
+    @staticmethod
+    def _set_arctic_client(db_server, client):
+        """Sets the MongoDB client for a db_server (the caller must hold _arctic_lock), returning the previous one
+        """
+        from arctic import Arctic
+
+        client_old = IOEngine._arctic_clients.get(db_server, None)
+
+        IOEngine._arctic_clients[db_server] = client
+        IOEngine._arctic_stores[db_server] = Arctic(client)
+        IOEngine._arctic_libraries = {k: v for k, v in IOEngine._arctic_libraries.items() if k[0] != db_server}
+
+        return client_old
+
+    @staticmethod
+    def _close_arctic_client(client):
+        try:
+            client.close()
+        except:
+            pass
+
+    @staticmethod
+    def close_arctic_stores():
+        """Closes the connections to all MongoDB servers (they will be reopened if used again)
+        """
+        with IOEngine._arctic_lock:
+            clients = list(IOEngine._arctic_clients.values())
+
+            IOEngine._arctic_stores = {}
+            IOEngine._arctic_clients = {}
+            IOEngine._arctic_libraries = {}
+
+        for client in clients:
+            IOEngine._close_arctic_client(client)
+
+    def get_arctic_library_name(self, fname):
+        """Gets the name of the Arctic library for a time series
+
+        Parameters
+        ----------
+        fname : str
+            filename of the time series
+
+        Returns
+        -------
+        str
+        """
+        return os.path.basename(fname).replace('.', '_')
+
+    def get_arctic_library(self, fname, db_server = '127.0.0.1', create = False):
+        """Gets an Arctic library (cached after it is first opened)
+
+        Parameters
+        ----------
+        fname : str
+            name of the library
+        db_server : str
+            MongoDB server
+        create : bool
+            create the library if it doesn't exist
+
+        Returns
+        -------
+        VersionStore
+        """
+        key = (db_server, fname)
+
+        with IOEngine._arctic_lock:
+            if key in IOEngine._arctic_libraries:
+                return IOEngine._arctic_libraries[key]
+
+        store = IOEngine.get_arctic_store(db_server)
+
+        library = None
+
+        try:
+            library = store[fname]
+            self.logger.info("Got MongoDB library: " + fname)
+        except:
+            if not create: raise
+
+        if library is None:
+            store.initialize_library(fname, audit=False)
+            self.logger.info("Created MongoDB library: " + fname)
+
+            library = store[fname]
+
+        with IOEngine._arctic_lock:
+            IOEngine._arctic_libraries[key] = library
+
+        return library
+
+    def write_arctic(self, fname, data_frame, append_data = False, db_server = '127.0.0.1', filter_out_matching = None):
+        """Writes time series to Arctic (in a library with the same name as the time series)
+
+        Parameters
+        ----------
+        fname : str
+            name of the time series
+        data_frame : DataFrame
+            time series to be written
+        append_data : bool
+            append to the existing time series
+        db_server : str
+            MongoDB server
+        filter_out_matching : str (optional)
+            don't write columns containing this
+        """
+        if ('intraday' in fname):
+            data_frame = data_frame.astype('float32')
+
+        fname = self.get_arctic_library_name(fname)
+
+        self.logger.info('Load MongoDB library: ' + fname)
+
+        # Access the library
+        library = self.get_arctic_library(fname, db_server = db_server, create = True)
+
+        if filter_out_matching is not None:
+            cols = data_frame.columns
+
+            new_cols = []
+
+            for col in cols:
+                if filter_out_matching not in col:
+                    new_cols.append(col)
+
+            data_frame = data_frame[new_cols]
+
+        # can duplicate values if we have existing dates
+        if append_data:
+            library.append(fname, data_frame)
+        else:
+            library.write(fname, data_frame)
+
+        self.logger.info("Written MongoDB library: " + fname)
+
+    def read_arctic(self, fname, start_date = None, finish_date = None, db_server = '127.0.0.1'):
+        """Reads time series from Arctic
+
+        Parameters
+        ----------
+        fname : str
+            name of the time series
+        start_date : datetime (optional)
+            start date
+        finish_date : datetime (optional)
+            finish date
+        db_server : str
+            MongoDB server
+
+        Returns
+        -------
+        DataFrame
+        """
+        fname = self.get_arctic_library_name(fname)
+
+        self.logger.info('Load MongoDB library: ' + fname)
+
+        # Access the library
+        library = self.get_arctic_library(fname, db_server = db_server)
+
+        if start_date is None and finish_date is None:
+            item = library.read(fname)
+        else:
+            from arctic.date import DateRange
+            item = library.read(fname, date_range=DateRange(start_date, finish_date))
+
+        self.logger.info('Read ' + fname)
+
+        return item.data
+
+    def write_arctic_bulk(self, fname_list, data_frame_list, append_data = False, db_server = '127.0.0.1',
+                          filter_out_matching = None):
+        """Writes many time series to Arctic at the same time, over the pooled connections to the MongoDB server
+
+        Parameters
+        ----------
+        fname_list : list(str)
+            names of the time series
+        data_frame_list : list(DataFrame)
+            time series to be written
+        append_data : bool
+            append to the existing time series
+        db_server : str
+            MongoDB server
+        filter_out_matching : str (optional)
+            don't write columns containing this
+        """
+        ThreadPoolManager.map('arctic.' + db_server,
+                              lambda x: self.write_arctic(x[0], x[1], append_data = append_data, db_server = db_server,
+                                                          filter_out_matching = filter_out_matching),
+                              list(zip(fname_list, data_frame_list)), thread_no = DataConstants().arctic_thread_no)
+
+    def read_arctic_bulk(self, fname_list, start_date = None, finish_date = None, db_server = '127.0.0.1'):
+        """Reads many time series from Arctic at the same time, over the pooled connections to the MongoDB server
+
+        Parameters
+        ----------
+        fname_list : list(str)
+            names of the time series
+        start_date : datetime (optional)
+            start date
+        finish_date : datetime (optional)
+            finish date
+        db_server : str
+            MongoDB server
+
+        Returns
+        -------
+        list(DataFrame)
+        """
+        return ThreadPoolManager.map('arctic.' + db_server,
+                                     lambda x: self.read_arctic(x, start_date = start_date, finish_date = finish_date,
+                                                                db_server = db_server),
+                                     list(fname_list), thread_no = DataConstants().arctic_thread_no)
+
+    def get_compression(self, fname, engine, compression = None):
+        """Gets the compression codec and level to write a time series with. Unless it is specified, it is taken from
+        DataConstants.market_data_cache_compression for the engine, using the first category (eg. intraday) which is in
+        the filename (or otherwise 'other'). Codecs are converted to the nearest one the engine supports, eg. lz4 is
+        blosc:lz4 for HDF5 and blosc:zstd is zstd for Parquet.
+
+        Parameters
+        ----------
+        fname : str
+            filename of the time series
+        engine : str
+            hdf5, parquet, parquet_day or arrow
+        compression : (str, int) or str (optional)
+            codec and level
+
+        Returns
+        -------
+        (str, int)
+        """
+        if compression is None:
+            engine_compression = DataConstants().market_data_cache_compression.get(engine, {})
+            name = os.path.basename(fname)
+
+            compression = engine_compression.get('other', (None, None))
+
+            for category in engine_compression.keys():
+                if category != 'other' and category in name:
+                    compression = engine_compression[category]
+                    break
+
+        if compression is None or isinstance(compression, str):
+            compression = (compression, None)
+
+        codec, level = compression
+
+        if codec is not None and codec.lower() == 'none':
+            codec = None
+
+        if engine == 'hdf5':
+            if codec is None:
+                return None, 0
+
+            if codec in ['blosclz', 'lz4', 'lz4hc', 'snappy', 'zstd']:
+                codec = 'blosc:' + codec
+
+            return codec, 9 if level is None else level
+
+        # pyarrow doesn't have blosc, so use the compressor inside it
+        if codec is not None and codec.startswith('blosc'):
+            codec = codec.split(':')[1] if ':' in codec else 'lz4'
+
+            if codec in ['blosclz', 'lz4hc']: codec = 'lz4'
+
+        if codec == 'zlib':
+            codec = 'gzip'
+
+        if engine == 'parquet' or engine == 'parquet_day':
+            return 'none' if codec is None else codec, level
+
+        # Arrow IPC files can only be compressed with lz4 or zstd
+        if codec is not None and codec not in ['lz4', 'zstd']:
+            codec = 'lz4'
+
+        return codec, level
+
+    def get_disk_size(self, fname, engine):
+        """Gets the size on disk (in bytes) of a time series written by write_time_series_cache_to_disk
+
+        Parameters
+        ----------
+        fname : str
+            filename of the time series
+        engine : str
+            engine it was written with eg. hdf5_fixed, parquet
+
+        Returns
+        -------
+        int
+        """
+        if 'hdf5' in engine:
+            path = self.get_h5_filename(fname)
+        elif engine == 'parquet':
+            path = self.get_parquet_filename(fname)
+        elif engine == 'arrow':
+            path = self.get_arrow_filename(fname)
+        elif engine == 'parquet_day':
+            size = 0
+
+            for root, dirs, files in os.walk(self.get_parquet_day_foldername(fname)):
+                for f in files:
+                    size = size + os.path.getsize(os.path.join(root, f))
+
+            return size
+        else:
+            return None
+
+        return os.path.getsize(path) if os.path.isfile(path) else None
+
+    def benchmark_compression(self, data_frame_dict, engine_compression_list = None, folder = None, repeat = 3):
+        """Writes and reads time series with different engines and compression settings, and reports the speed (in MB of
+        uncompressed data per second) and the size on disk of each, so we can choose the settings for each dataset.
+
+        Parameters
+        ----------
+        data_frame_dict : dict(str, DataFrame)
+            time series to test, by name (eg. {'fx_daily' : .., 'fx_intraday' : .., 'fx_tick' : ..}), names
+            containing 'intraday' are stored as float32 (as in the disk cache)
+        engine_compression_list : list((str, (str, int))) (optional)
+            engines and compression eg. [('hdf5_fixed', ('blosc', 9)), ('parquet', ('snappy', None))]
+        folder : str (optional)
+            folder to write to (default a temporary folder, which is deleted afterwards)
+        repeat : int
+            number of times to write/read each time series (the quickest time is used)
+
+        Returns
+        -------
+        DataFrame
+        """
+        import tempfile
+        import time
+
+        if engine_compression_list is None:
+            engine_compression_list = [('hdf5_fixed', ('blosc', 9)), ('hdf5_fixed', ('blosc:lz4', 5)),
+                                       ('hdf5_fixed', ('blosc:zstd', 5)), ('hdf5_fixed', (None, None)),
+                                       ('hdf5_table', ('blosc:lz4', 5)),
+                                       ('parquet', ('snappy', None)), ('parquet', ('zstd', None)),
+                                       ('parquet', (None, None)),
+                                       ('arrow', (None, None)), ('arrow', ('lz4', None))]
+
+        remove_folder = folder is None
+
+        if folder is None:
+            folder = tempfile.mkdtemp()
+
+        results = []
+
+        try:
+            for name, data_frame in data_frame_dict.items():
+                if 'intraday' in name:
+                    data_frame = data_frame.astype('float32')
+
+                size_mb = data_frame.memory_usage(index=True, deep=True).sum() / (1024.0 ** 2)
+
+                for engine, compression in engine_compression_list:
+                    fname = os.path.join(folder, name)
+                    read_engine = 'hdf5' if 'hdf5' in engine else engine
+
+                    write_time = []
+                    read_time = []
+
+                    try:
+                        for i in range(0, repeat):
+                            self.remove_time_series_cache_on_disk(fname, engine = engine)
+
+                            start = time.perf_counter()
+                            self.write_time_series_cache_to_disk(fname, data_frame, engine = engine,
+                                                                 compression = compression)
+                            write_time.append(time.perf_counter() - start)
+
+                            start = time.perf_counter()
+                            self.read_time_series_cache_from_disk(fname, engine = read_engine)
+                            read_time.append(time.perf_counter() - start)
+
+                        disk_mb = self.get_disk_size(fname, engine) / (1024.0 ** 2)
+                    except Exception as e:
+                        self.logger.warning("Couldn't benchmark " + engine + " " + str(compression) + ": " + str(e))
+
+                        continue
+                    finally:
+                        self.remove_time_series_cache_on_disk(fname, engine = engine)
+
+                    codec, level = self.get_compression(fname, read_engine, compression = compression)
+
+                    results.append([name, engine, 'none' if codec is None else codec, level, size_mb / min(write_time), size_mb / min(read_time),
+                                    disk_mb, size_mb / disk_mb])
+        finally:
+            if remove_folder:
+                shutil.rmtree(folder, ignore_errors=True)
+
+        return pandas.DataFrame(results, columns=['data', 'engine', 'codec', 'level', 'write MB/s', 'read MB/s',
+                                                  'disk MB', 'compression ratio'])
+
+    def get_h5_filename(self, fname):
+        """Strips h5 off filename returning first portion of filename
+
+        Parameters
+        ----------
+        fname : str
+            h5 filename to strip
+
+        Returns
+        -------
+        str
+        """
+        if fname[-3:] == '.h5':
+            return fname
+
+        return fname + ".h5"
+
+    def get_parquet_filename(self, fname):
+        """Strips parquet off filename returning first portion of filename
+
+        Parameters
+        ----------
+        fname : str
+            parquet filename to strip
+
+        Returns
+        -------
+        str
+        """
+        if fname[-8:] == '.parquet':
+            return fname
+
+        return fname + ".parquet"
+
+    def write_time_series_parquet(self, fname, data_frame, append_data = False, compression = None):
+        """Writes time series to a Parquet file, sorted by date and split into row groups of
+        DataConstants.parquet_row_group_size rows. Each row group stores the min/max of the dates in it, so reads for a
+        date range can skip the row groups outside of it.
+
+        Parameters
+        ----------
+        fname : str
+            filename of the time series
+        data_frame : DataFrame
+            time series to be written
+        append_data : bool
+            if True, add to the existing time series (new points overwrite old points at the same time)
+        compression : (str, int) or str (optional)
+            codec and level (default from DataConstants.market_data_cache_compression)
+        """
+        import pyarrow
+        import pyarrow.parquet
+
+        path = self.get_parquet_filename(fname)
+
+        codec, level = self.get_compression(fname, 'parquet', compression = compression)
+
+        data_frame = data_frame.sort_index()
+
+        if data_frame.index.name is None:
+            data_frame.index.name = 'Date'
+
+        if append_data and os.path.isfile(path):
+            data_frame = self.combine_time_series(pyarrow.parquet.read_table(path).to_pandas(), data_frame)
+
+        # write to a temporary file first, so readers never see a half written file
+        path_temp = path + '.temp'
+
+        pyarrow.parquet.write_table(pyarrow.Table.from_pandas(data_frame, preserve_index=True), path_temp,
+                                    row_group_size=DataConstants().parquet_row_group_size,
+                                    compression=codec, compression_level=level)
+        os.replace(path_temp, path)
+
+    def read_time_series_parquet(self, fname, start_date = None, finish_date = None, columns = None):
+        """Reads time series from a Parquet file. The date range is used to skip row groups (and the columns to skip
+        column chunks), so only the parts of the file which are needed are read from disk.
+
+        Parameters
+        ----------
+        fname : str
+            filename of the time series
+        start_date : datetime (optional)
+            start date
+        finish_date : datetime (optional)
+            finish date
+        columns : list(str) (optional)
+            columns to read (default all)
+
+        Returns
+        -------
+        DataFrame
+        """
+        import pyarrow.parquet
+
+        path = self.get_parquet_filename(fname)
+
+        if not os.path.isfile(path): return None
+
+        schema = pyarrow.parquet.read_schema(path)
+        index_col = schema.pandas_metadata['index_columns'][0]
+
+        # dates need to match the timezone (or lack of it) of the stored dates
+        tz = schema.field(index_col).type.tz
+
+        filters = []
+
+        if start_date is not None:
+            filters.append((index_col, '>=', self.get_tz_timestamp(start_date, tz)))
+
+        if finish_date is not None:
+            filters.append((index_col, '<=', self.get_tz_timestamp(finish_date, tz)))
+
+        if columns is not None:
+            if isinstance(columns, str):
+                columns = [columns]
+
+            columns = list(columns) + [index_col]
+
+        table = pyarrow.parquet.read_table(path, columns=columns, filters=filters if filters != [] else None)
+
+        return table.to_pandas()
+
+    def get_tz_timestamp(self, date, tz):
+        """Converts a date to a Timestamp in a timezone (naive dates are assumed to be in UTC), or to a naive
+        Timestamp if tz is None
+
+        Parameters
+        ----------
+        date : datetime
+            date to be converted
+        tz : str
+            timezone
+
+        Returns
+        -------
+        Timestamp
+        """
+        date = self.get_utc_timestamp(date)
+
+        if tz is None:
+            return date.tz_localize(None)
+
+        return date.tz_convert(tz)
+
+    def get_arrow_filename(self, fname):
+        """Strips arrow off filename returning first portion of filename
+
+        Parameters
+        ----------
+        fname : str
+            arrow filename to strip
+
+        Returns
+        -------
+        str
+        """
+        if fname[-6:] == '.arrow':
+            return fname
+
+        return fname + ".arrow"
+
+    def write_time_series_arrow(self, fname, data_frame, append_data = False, compression = None):
+        """Writes time series to an Arrow IPC file (sorted by date), which can be memory mapped when read. If the file is
+        compressed (lz4 or zstd), reading it has to decompress it into memory, rather than using the mapped file.
+
+        Parameters
+        ----------
+        fname : str
+            filename of the time series
+        data_frame : DataFrame
+            time series to be written
+        append_data : bool
+            if True, add to the existing time series (new points overwrite old points at the same time)
+        compression : (str, int) or str (optional)
+            codec and level (default from DataConstants.market_data_cache_compression)
+        """
+        import pyarrow
+
+        path = self.get_arrow_filename(fname)
+
+        codec, level = self.get_compression(fname, 'arrow', compression = compression)
+
+        data_frame = data_frame.sort_index()
+
+        if data_frame.index.name is None:
+            data_frame.index.name = 'Date'
+
+        if append_data and os.path.isfile(path):
+            data_frame = self.combine_time_series(self.read_time_series_arrow(path), data_frame)
+
+        # combine_chunks, so each column is contiguous on disk (and can be read without copying)
+        table = pyarrow.Table.from_pandas(data_frame, preserve_index=True).combine_chunks()
+
+        # write to a temporary file first, so readers (which might have the old file mapped) are unaffected
+        path_temp = path + '.temp'
+
+        with pyarrow.OSFile(path_temp, 'wb') as sink:
+            options = pyarrow.ipc.IpcWriteOptions(
+                compression = None if codec is None else pyarrow.Codec(codec, compression_level = level))
+
+            with pyarrow.ipc.new_file(sink, table.schema, options = options) as writer:
+                writer.write_table(table)
+
+        os.replace(path_temp, path)
+
+    def read_time_series_arrow(self, fname, start_date = None, finish_date = None, columns = None):
+        """Reads time series from an Arrow IPC file, by memory mapping it. The columns of the returned DataFrame point to
+        the mapped file (rather than being copied into memory) and are hence read only. The operating system shares the
+        pages between every process reading the same file.
+
+        Parameters
+        ----------
+        fname : str
+            filename of the time series
+        start_date : datetime (optional)
+            start date
+        finish_date : datetime (optional)
+            finish date
+        columns : list(str) (optional)
+            columns to read (default all)
+
+        Returns
+        -------
+        DataFrame
+        """
+        import pyarrow
+
+        path = self.get_arrow_filename(fname)
+
+        if not os.path.isfile(path): return None
+
+        table = pyarrow.ipc.open_file(pyarrow.memory_map(path, 'r')).read_all()
 
-    def remove_time_series_cache_on_disk(self, fname, engine = 'hdf5_fixed', db_server = '127.0.0.1'):
+        index_col = table.schema.pandas_metadata['index_columns'][0]
 
-        if 'hdf5' in engine:
-            engine = 'hdf5'
+        if columns is not None:
+            if isinstance(columns, str):
+                columns = [columns]
 
-        if (engine == 'bcolz'):
-            # convert invalid characters to substitutes (which Bcolz can't deal with)
-            pass
-        elif (engine == 'arctic'):
-            from arctic import Arctic
-            import pymongo
+            table = table.select(list(columns) + [index_col])
 
-            socketTimeoutMS = 10 * 1000
-            fname = os.path.basename(fname).replace('.', '_')
+        # dates are sorted, so the date range is a slice of the table (which doesn't copy)
+        if start_date is not None or finish_date is not None:
+            dates = table.column(index_col)
+            dates = dates.chunk(0) if dates.num_chunks == 1 else dates.combine_chunks()
 
-            self.logger.info('Load MongoDB library: ' + fname)
+            # as datetime64 in UTC (or naive)
+            dates = dates.to_numpy(zero_copy_only=False)
 
-            c = pymongo.MongoClient(db_server, connect=False)
-            store = Arctic(c, socketTimeoutMS=socketTimeoutMS, serverSelectionTimeoutMS=socketTimeoutMS)
-            store.delete_library(fname)
+            start = 0
+            finish = len(dates)
 
-            c.close()
+            if start_date is not None:
+                start = dates.searchsorted(numpy.datetime64(self.get_utc_timestamp(start_date).tz_localize(None)),
+                                           side='left')
 
-            self.logger.info("Deleted MongoDB library: " + fname)
+            if finish_date is not None:
+                finish = dates.searchsorted(numpy.datetime64(self.get_utc_timestamp(finish_date).tz_localize(None)),
+                                            side='right')
 
-        elif (engine == 'hdf5'):
-            h5_filename = self.get_h5_filename(fname)
+            table = table.slice(start, max(finish - start, 0))
 
-            # delete the old copy
-            try:
-                os.remove(h5_filename)
-            except:
-                pass
+        # split_blocks stops pandas consolidating the columns into one (copied) block
+        return table.to_pandas(split_blocks=True)
 
+    def get_parquet_day_foldername(self, fname):
+        """Gets the folder for a time series stored in Parquet files partitioned by ticker and day
 
-    ### functions to handle HDF5 on disk
-    def write_time_series_cache_to_disk(self, fname, data_frame,
-                                        engine = 'hdf5_fixed', append_data = False, db_server = '127.0.0.1',
-                                        filter_out_matching = None):
-        """Writes Pandas data frame to disk as HDF5 format or bcolz format or in Arctic
+        Parameters
+        ----------
+        fname : str
+            filename of the time series
 
-        Parmeters
-        ---------
+        Returns
+        -------
+        str
+        """
+        if fname[-12:] == '.parquet_day':
+            return fname
+
+        return fname + ".parquet_day"
+
+    def write_time_series_partitioned(self, fname, data_frame, append_data = False, compression = None):
+        """Writes time series (eg. tick data) as Parquet files partitioned by ticker and day (folder/ticker/YYYYMMDD.parquet),
+        where the tickers are taken from the column names (eg. EURUSD.bid). When appending, only the days in the new
+        time series are (re)written, so appends don't get slower as the history grows.
+
+        Parameters
+        ----------
         fname : str
-            path of file
+            filename of the time series
         data_frame : DataFrame
-            data frame to be written to disk
+            time series to be written
+        append_data : bool
+            if True, keep existing days (merging with any overlapping days) otherwise replace the whole time series
+        compression : (str, int) or str (optional)
+            codec and level (default from DataConstants.market_data_cache_compression)
         """
+        import pyarrow
+        import pyarrow.parquet
 
-        # default HDF5 format
-        hdf5_format = 'fixed'
+        folder = self.get_parquet_day_foldername(fname)
 
-        if 'hdf5' in engine:
-            hdf5_format = engine.split('_')[1]
-            engine = 'hdf5'
+        codec, level = self.get_compression(fname, 'parquet_day', compression = compression)
 
-        if (engine == 'bcolz'):
-            # convert invalid characters to substitutes (which Bcolz can't deal with)
-            data_frame.columns = self.find_replace_chars(data_frame.columns, _invalid_chars, _replace_chars)
-            data_frame.columns = ['A_' + x for x in data_frame.columns]
+        if not append_data:
+            shutil.rmtree(folder, ignore_errors=True)
 
-            data_frame['DTS_'] = pandas.to_datetime(data_frame.index, unit='ns')
+        if data_frame is None or data_frame.empty: return
 
-            bcolzpath = self.get_bcolz_filename(fname)
-            shutil.rmtree(bcolzpath, ignore_errors=True)
-            zlens = bcolz.ctable.fromdataframe(data_frame, rootdir=bcolzpath)
-        elif (engine == 'arctic'):
-            from arctic import Arctic
-            import pymongo
+        data_frame = data_frame.sort_index()
 
-            socketTimeoutMS = 30 * 1000
-            fname = os.path.basename(fname).replace('.', '_')
+        # partition by day (in UTC for timezone aware time series)
+        days = data_frame.index
 
-            self.logger.info('Load MongoDB library: ' + fname)
+        if days.tz is not None:
+            days = days.tz_convert('UTC')
 
-            c = pymongo.MongoClient(db_server, connect=False)
-            store = Arctic(c, socketTimeoutMS=socketTimeoutMS, serverSelectionTimeoutMS=socketTimeoutMS)
+        days = days.strftime('%Y%m%d')
 
-            database = None
+        for ticker, columns in self.get_ticker_columns(data_frame.columns).items():
+            ticker_folder = os.path.join(folder, ticker)
 
-            try:
-                database = store[fname]
-            except:
-                pass
+            if not os.path.exists(ticker_folder):
+                os.makedirs(ticker_folder)
 
-            if database is None:
-                store.initialize_library(fname, audit=False)
-                self.logger.info("Created MongoDB library: " + fname)
-            else:
-                self.logger.info("Got MongoDB library: " + fname)
+            for day, data_frame_day in data_frame[columns].groupby(days, sort=False):
+                path = os.path.join(ticker_folder, day + '.parquet')
 
-            # Access the library
-            library = store[fname]
+                if append_data and os.path.isfile(path):
+                    data_frame_day = self.combine_time_series(pyarrow.parquet.read_table(path).to_pandas(), data_frame_day)
 
-            if ('intraday' in fname):
-                data_frame = data_frame.astype('float32')
+                # write to a temporary file first, so readers never see a half written file
+                path_temp = path + '.temp'
+
+                pyarrow.parquet.write_table(pyarrow.Table.from_pandas(data_frame_day, preserve_index=True), path_temp,
+                                            compression=codec, compression_level=level)
+                os.replace(path_temp, path)
+
+    def read_time_series_partitioned(self, fname, start_date = None, finish_date = None):
+        """Reads time series stored in Parquet files partitioned by ticker and day, only opening the files for days
+        between start_date and finish_date
+
+        Parameters
+        ----------
+        fname : str
+            filename of the time series
+        start_date : datetime (optional)
+            start date
+        finish_date : datetime (optional)
+            finish date
 
-            if filter_out_matching is not None:
-                cols = data_frame.columns
+        Returns
+        -------
+        DataFrame
+        """
+        import pyarrow.parquet
 
-                new_cols = []
+        folder = self.get_parquet_day_foldername(fname)
 
-                for col in cols:
-                    if filter_out_matching not in col:
-                        new_cols.append(col)
+        if not os.path.isdir(folder): return None
 
-                data_frame = data_frame[new_cols]
+        # days are in UTC (naive dates are assumed to be UTC)
+        start_date = self.get_utc_timestamp(start_date)
+        finish_date = self.get_utc_timestamp(finish_date)
 
-            # can duplicate values if we have existing dates
-            if append_data:
-                library.append(fname, data_frame)
-            else:
-                library.write(fname, data_frame)
+        start_day = None if start_date is None else start_date.strftime('%Y%m%d')
+        finish_day = None if finish_date is None else finish_date.strftime('%Y%m%d')
 
-            c.close()
+        data_frame_list = []
 
-            self.logger.info("Written MongoDB library: " + fname)
+        for ticker in sorted(os.listdir(folder)):
+            ticker_folder = os.path.join(folder, ticker)
 
-        elif (engine == 'hdf5'):
-            h5_filename = self.get_h5_filename(fname)
+            if not os.path.isdir(ticker_folder): continue
 
-            # append data only works for HDF5 stored as tables (but this is much slower than fixed format)
-            # removes duplicated entries at the end
-            if append_data:
-                store = pandas.HDFStore(h5_filename, format=hdf5_format, complib="blosc", complevel=9)
+            day_list = sorted([x[:-8] for x in os.listdir(ticker_folder) if x.endswith('.parquet')])
 
-                if ('intraday' in fname):
-                    data_frame = data_frame.astype('float32')
+            # prune days outside the date range
+            day_list = [x for x in day_list if (start_day is None or x >= start_day) and
+                        (finish_day is None or x <= finish_day)]
 
-                # get last row which matches and remove everything after that (because append
-                # function doesn't check for duplicated rows
-                nrows = len(store['data'].index)
-                last_point = data_frame.index[-1]
+            if day_list == []: continue
 
-                i = nrows - 1
+            # the days of one ticker are simply stacked (joining them would blow up on repeated timestamps)
+            data_frame = pandas.concat(
+                [pyarrow.parquet.read_table(os.path.join(ticker_folder, x + '.parquet')).to_pandas() for x in day_list])
 
-                while(i > 0):
-                    read_index = store.select('data', start=i, stop=nrows).index[0]
+            data_frame = self.trim_time_series_utc(data_frame.sort_index(kind = 'mergesort'), start_date, finish_date)
 
-                    if (read_index <= last_point): break
+            if not(data_frame.empty): data_frame_list.append(data_frame)
 
-                    i = i - 1
+        if data_frame_list == []: return None
 
-                # remove rows at the end, which are duplicates of the incoming time series
-                store.remove(key='data', start=i, stop=nrows)
-                store.put(key='data', value=data_frame, format=hdf5_format, append=True)
-                store.close()
-            else:
-                h5_filename_temp = self.get_h5_filename(fname + ".temp")
+        if len(data_frame_list) == 1: return data_frame_list[0]
 
-                # delete the old copy
-                try:
-                    os.remove(h5_filename_temp)
-                except: pass
+        # only join across tickers
+        return Calculations().merge_outer_join(data_frame_list)
 
-                store = pandas.HDFStore(h5_filename_temp, format=hdf5_format, complib="blosc", complevel=9)
+    def trim_time_series_utc(self, data_frame, start_date, finish_date):
+        """Trims a time series to lie between start_date and finish_date (UTC Timestamps), treating a naive index as UTC
+        """
+        index = data_frame.index
 
-                if ('intraday' in fname):
-                    data_frame = data_frame.astype('float32')
+        if index.tz is None:
+            index = index.tz_localize('UTC')
+        else:
+            index = index.tz_convert('UTC')
 
-                store.put(key='data', value=data_frame, format=hdf5_format)
-                store.close()
+        if start_date is not None:
+            data_frame = data_frame.loc[index >= start_date]
+            index = index[index >= start_date]
 
-                # delete the old copy
-                try:
-                    os.remove(h5_filename)
-                except: pass
+        if finish_date is not None:
+            data_frame = data_frame.loc[index <= finish_date]
 
-                # once written to disk rename
-                os.rename(h5_filename_temp, h5_filename)
+        return data_frame
 
-    def get_h5_filename(self, fname):
-        """Strips h5 off filename returning first portion of filename
+    def get_utc_timestamp(self, date):
+        """Converts a date to a UTC Timestamp (naive dates are assumed to be in UTC)
 
         Parameters
         ----------
-        fname : str
-            h5 filename to strip
+        date : datetime
+            date to be converted
 
         Returns
         -------
-        str
+        Timestamp
         """
-        if fname[-3:] == '.h5':
-            return fname
+        if date is None: return None
 
-        return fname + ".h5"
+        date = pandas.Timestamp(date)
+
+        if date.tz is None:
+            return date.tz_localize('UTC')
+
+        return date.tz_convert('UTC')
+
+    def get_ticker_columns(self, columns):
+        """Groups columns by ticker (eg. EURUSD.bid and EURUSD.ask are both EURUSD), columns without a ticker are
+        grouped under 'data'
+
+        Parameters
+        ----------
+        columns : list(str)
+            columns of a time series
+
+        Returns
+        -------
+        dict
+        """
+        ticker_columns = {}
+
+        for col in columns:
+            if '.' in col:
+                ticker = col.rsplit('.', 1)[0]
+            else:
+                ticker = 'data'
+
+            # tickers are used as folder names
+            ticker = ticker.replace('/', '_').replace('\\', '_')
+
+            if ticker not in ticker_columns:
+                ticker_columns[ticker] = []
+
+            ticker_columns[ticker].append(col)
+
+        return ticker_columns
 
     def get_bcolz_filename(self, fname):
         """Strips bcolz off filename returning first portion of filename
@@ -375,13 +1459,16 @@ class IOEngine(object):
         store_export.put('df_for_r', data_frame32, data_columns=cols)
         store_export.close()
 
-    def read_time_series_cache_from_disk(self, fname, engine = 'hdf5', start_date = None, finish_date = None, db_server = '127.0.0.1'):
+    def read_time_series_cache_from_disk(self, fname, engine = 'hdf5', start_date = None, finish_date = None, db_server = '127.0.0.1',
+                                         columns = None):
         """Reads time series cache from disk in either HDF5 or bcolz
 
         Parameters
         ----------
         fname : str
             file to be read from
+        columns : list(str) (optional)
+            columns to read (only for HDF5, parquet and arrow)
 
         Returns
         -------
@@ -406,45 +1493,98 @@ class IOEngine(object):
             except:
                 return None
         elif(engine == 'arctic'):
-            socketTimeoutMS = 2 * 1000
+            return self.read_arctic(fname, start_date = start_date, finish_date = finish_date, db_server = db_server)
+        elif(engine == 'parquet'):
+            data_frame = self.read_time_series_parquet(fname, start_date = start_date, finish_date = finish_date,
+                                                       columns = columns)
+
+            if data_frame is not None and ('intraday' in fname):
+                data_frame = data_frame.astype('float32')
 
-            import pymongo
-            from arctic import Arctic
+            return data_frame
+        elif(engine == 'arrow'):
+            # intraday data is already stored as float32 (converting would copy the memory mapped columns)
+            return self.read_time_series_arrow(fname, start_date = start_date, finish_date = finish_date,
+                                               columns = columns)
+        elif(engine == 'parquet_day'):
+            data_frame = self.read_time_series_partitioned(fname, start_date = start_date, finish_date = finish_date)
+
+            if data_frame is not None and ('intraday' in fname):
+                data_frame = data_frame.astype('float32')
 
-            fname = os.path.basename(fname).replace('.', '_')
+            return data_frame
+        elif os.path.isfile(self.get_h5_filename(fname)):
+            data_frame = self.read_hdf5_data_frame(fname, start_date = start_date, finish_date = finish_date,
+                                                   columns = columns)
 
-            self.logger.info('Load MongoDB library: ' + fname)
+            if ('intraday' in fname):
+                data_frame = data_frame.astype('float32')
 
-            c = pymongo.MongoClient(db_server, connect=False)
+            return data_frame
 
-            store = Arctic(c, socketTimeoutMS=socketTimeoutMS, serverSelectionTimeoutMS=socketTimeoutMS)
+        return None
 
-            # Access the library
-            library = store[fname]
+    def read_time_series_cache_from_disk_bulk(self, fname_list, engine = 'hdf5', start_date = None, finish_date = None,
+                                              db_server = '127.0.0.1', columns = None, join = False):
+        """Reads many time series caches from disk at the same time (eg. when each ticker is cached in its own file),
+        with the date range (and columns) pushed down to the read of each file. Other formats are read in threads, but
+        PyTables isn't thread safe, so HDF5 files are read one after another. Alternatively, HDF5 files can be read in a
+        shared pool of (spawned) processes by setting DataConstants.market_data_cache_read_hdf5_processes = True, in
+        which case scripts calling this (including via CachedMarketDataGenerator) need an
+        if __name__ == '__main__': guard, otherwise each new process re-runs the script.
 
-            if start_date is None and finish_date is None:
-                item = library.read(fname)
-            else:
-                from arctic.date import DateRange
-                item = library.read(fname, date_range=DateRange(start_date, finish_date))
+        Parameters
+        ----------
+        fname_list : list(str)
+            files to be read from
+        engine : str
+            format of the files eg. hdf5, parquet, arrow, arctic
+        start_date : datetime (optional)
+            start date
+        finish_date : datetime (optional)
+            finish date
+        db_server : str
+            MongoDB server (for arctic)
+        columns : list(str) (optional)
+            columns to read (only for HDF5, parquet and arrow)
+        join : bool
+            if True, return the time series outer joined into one DataFrame
 
-            c.close()
+        Returns
+        -------
+        dict(str, DataFrame) or DataFrame
+        """
+        fname_list = list(fname_list)
 
-            self.logger.info('Read ' + fname)
+        if engine == 'arctic':
+            data_frame_list = self.read_arctic_bulk(fname_list, start_date = start_date, finish_date = finish_date,
+                                                    db_server = db_server)
+        else:
+            constants = DataConstants()
+            thread_no = constants.market_data_cache_read_thread_no
 
-            return item.data
-        elif os.path.isfile(self.get_h5_filename(fname)):
-            store = pandas.HDFStore(self.get_h5_filename(fname))
-            data_frame = store.select("data")
+            args_list = [(fname, engine, start_date, finish_date, db_server, columns) for fname in fname_list]
 
-            if ('intraday' in fname):
-                data_frame = data_frame.astype('float32')
+            if 'hdf5' in engine and constants.market_data_cache_read_hdf5_processes:
+                # no point in having more processes than cores (each has to send its time series back to us)
+                thread_no = min(thread_no, len(args_list), os.cpu_count() or 1)
 
-            store.close()
+                data_frame_list = ThreadPoolManager.map_processes('io_engine.read_hdf5', _read_time_series_cache_from_disk,
+                                                                  args_list, thread_no)
+            elif 'hdf5' in engine:
+                data_frame_list = [_read_time_series_cache_from_disk(x) for x in args_list]
+            else:
+                data_frame_list = ThreadPoolManager.map('io_engine.read', _read_time_series_cache_from_disk, args_list,
+                                                        thread_no = thread_no)
 
-            return data_frame
+        if join:
+            data_frame_list = [x for x in data_frame_list if x is not None]
 
-        return None
+            if data_frame_list == []: return None
+
+            return Calculations().pandas_outer_join(data_frame_list)
+
+        return dict(zip(fname_list, data_frame_list))
 
     ### functions for CSV reading and writing
     def write_time_series_to_csv(self, csv_path, data_frame):
@@ -478,34 +1618,13 @@ class IOEngine(object):
 
         if(freq == 'intraday'):
 
-            if dateparse is None:
-                dateparse = lambda x: datetime.datetime(*map(int, [x[6:10], x[3:5], x[0:2],
-                                                   x[11:13], x[14:16], x[17:19]]))
-            elif dateparse is 'dukascopy':
-                dateparse = lambda x: datetime.datetime(*map(int, [x[0:4], x[5:7], x[8:10],
-                                                   x[11:13], x[14:16], x[17:19]]))
-            elif dateparse is 'c':
-                # use C library for parsing dates, several hundred times quicker
-                # requires compilation of library to install
-                import ciso8601
-                dateparse = lambda x: ciso8601.parse_datetime(x)
-
             if excel_sheet is None:
-                data_frame = pandas.read_csv(f_name, index_col = 0, parse_dates = True, date_parser = dateparse)
+                data_frame = pandas.read_csv(f_name, index_col = 0)
+                data_frame.index = self.parse_intraday_dates(data_frame.index, dateparse = dateparse)
             else:
                 data_frame = pandas.read_excel(f_name, excel_sheet, index_col = 0, na_values=['NA'])
 
-            data_frame = data_frame.astype('float32')
-            data_frame.index.names = ['Date']
-
-            old_cols = data_frame.columns
-            new_cols = []
-
-            # add '.close' to each column name
-            for col in old_cols:
-                new_cols.append(col + postfix)
-
-            data_frame.columns = new_cols
+            data_frame = self.format_intraday_data_frame(data_frame, postfix = postfix)
         else:
             # daily data
             if 'events' in f_name:
@@ -542,13 +1661,155 @@ class IOEngine(object):
 
         # end cutoff date
         if cutoff is not None:
-            if (isinstance(cutoff, str)):
-                cutoff = parse(cutoff)
+            data_frame = self.filter_cutoff(data_frame, cutoff)
+
+        return data_frame
+
+    def read_csv_data_frame_chunks(self, f_name, freq, chunksize = None, cutoff = None, dateparse = None,
+                                   postfix = '.close', intraday_tz = 'UTC'):
+        """Reads CSV from disk in chunks of rows, so very large files can be processed without holding all of them in
+        memory (daily data is returned as a single chunk)
+
+        Parameters
+        ----------
+        f_name : str
+            CSV file path to read
+        freq : str
+            Frequency of data to read (intraday/daily etc)
+        chunksize : int (optional)
+            number of rows in each chunk (default DataConstants.csv_chunksize)
+        cutoff : DateTime (optional)
+            end date to read up to
+        dateparse : str (optional)
+            date parser to use
+        postfix : str (optional)
+            postfix to add to each columns
+        intraday_tz : str (optional)
+            timezone of file if uses intraday data
+
+        Returns
+        -------
+        generator(DataFrame)
+        """
+
+        if freq != 'intraday':
+            yield self.read_csv_data_frame(f_name, freq, cutoff = cutoff, dateparse = dateparse, postfix = postfix,
+                                           intraday_tz = intraday_tz)
+
+            return
+
+        if chunksize is None: chunksize = DataConstants().csv_chunksize
+
+        for data_frame in pandas.read_csv(f_name, index_col = 0, chunksize = chunksize):
+            data_frame.index = self.parse_intraday_dates(data_frame.index, dateparse = dateparse)
+
+            data_frame = self.format_intraday_data_frame(data_frame, postfix = postfix)
+            data_frame = data_frame.tz_localize(intraday_tz)
+
+            if cutoff is not None:
+                data_frame = self.filter_cutoff(data_frame, cutoff)
+
+            if not(data_frame.empty):
+                yield data_frame
+
+    def parse_intraday_dates(self, dates, dateparse = None):
+        """Parses the dates of intraday CSV files in one vectorised step (rather than calling a Python function for each
+        row)
+
+        Parameters
+        ----------
+        dates : Index
+            dates as strings
+        dateparse : str or function (optional)
+            None for dd/mm/yyyy HH:MM:SS, 'dukascopy' for yyyy-mm-dd HH:MM:SS (any separators, anything after the
+            seconds is ignored in both cases), 'c' for ISO 8601, a strftime format or a function to parse each date
+
+        Returns
+        -------
+        DatetimeIndex
+        """
+
+        if callable(dateparse):
+            return pandas.DatetimeIndex(dates.map(dateparse))
+
+        if dateparse == 'c':
+            # ISO 8601 dates are parsed in C by pandas
+            return pandas.DatetimeIndex(pandas.to_datetime(dates))
 
-            data_frame = data_frame.loc[data_frame.index < cutoff]
+        if dateparse is None or dateparse == 'dukascopy':
+            # the fields are at fixed positions, so read the digits straight from the bytes of the dates (quicker than
+            # strptime, which is no quicker than calling a Python function for each date)
+            digits = numpy.array(list(dates), dtype='S19').view(numpy.uint8).reshape(-1, 19).astype(numpy.int64) - 48
+
+            fields = []
+
+            for start, finish in _intraday_date_positions[dateparse]:
+                field = digits[:, start]
+
+                for i in range(start + 1, finish):
+                    field = field * 10 + digits[:, i]
+
+                fields.append(field)
+
+            return pandas.DatetimeIndex(pandas.to_datetime(pandas.DataFrame(dict(
+                zip(['year', 'month', 'day', 'hour', 'minute', 'second'], fields)))))
+
+        return pandas.DatetimeIndex(pandas.to_datetime(dates, format = dateparse))
+
+    def format_intraday_data_frame(self, data_frame, postfix = '.close'):
+        """Converts intraday time series to float32 and adds a postfix to each column
+
+        Parameters
+        ----------
+        data_frame : DataFrame
+            intraday time series
+        postfix : str (optional)
+            postfix to add to each columns
+
+        Returns
+        -------
+        DataFrame
+        """
+
+        data_frame = data_frame.astype('float32')
+        data_frame.index.names = ['Date']
+
+        old_cols = data_frame.columns
+        new_cols = []
+
+        # add '.close' to each column name
+        for col in old_cols:
+            new_cols.append(col + postfix)
+
+        data_frame.columns = new_cols
 
         return data_frame
 
+    def filter_cutoff(self, data_frame, cutoff):
+        """Filters time series to before a cutoff date (in the timezone of the time series, if it isn't specified)
+
+        Parameters
+        ----------
+        data_frame : DataFrame
+            time series
+        cutoff : DateTime or str
+            end date to read up to
+
+        Returns
+        -------
+        DataFrame
+        """
+
+        if (isinstance(cutoff, str)):
+            cutoff = parse(cutoff)
+
+        cutoff = pandas.Timestamp(cutoff)
+
+        if data_frame.index.tz is not None and cutoff.tz is None:
+            cutoff = cutoff.tz_localize(data_frame.index.tz)
+
+        return data_frame.loc[data_frame.index < cutoff]
+
     def find_replace_chars(self, array, to_find, replace_with):
 
         for i in range(0, len(to_find)):
@@ -556,8 +1817,13 @@ class IOEngine(object):
 
         return array
 
-    def convert_csv_data_frame(self, f_name, category, freq, cutoff=None, dateparse=None):
-        """Converts CSV file to HDF5 file
+    def convert_csv_data_frame(self, f_name, category, freq, cutoff=None, dateparse=None, engine='hdf5_fixed',
+                               chunksize='default'):
+        """Converts CSV file to HDF5 file (or another engine)
+
+        Intraday CSV files are read and written in chunks of rows (appending each to the disk cache), so memory use
+        stays flat however large the file is. This needs an engine which appends cheaply (hdf5_table or parquet_day), so
+        hdf5_fixed is switched to hdf5_table. Set chunksize to None to read the whole file at once (as before).
 
         Parameters
         ----------
@@ -571,16 +1837,69 @@ class IOEngine(object):
             filter dates up to here
         dateparse : str
             date parser to use
+        engine : str
+            format to write eg. hdf5_fixed, hdf5_table, parquet_day
+        chunksize : int (optional)
+            number of rows to read and write at a time (default DataConstants.csv_chunksize), None to read the whole
+            file at once
         """
 
         self.logger.info("About to read... " + f_name)
 
-        data_frame = self.read_csv_data_frame(f_name, freq, cutoff=cutoff, dateparse=dateparse)
-
         category_f_name = self.create_cache_file_name(category)
 
-        self.write_time_series_cache_to_disk(
-            category_f_name, data_frame)
+        if chunksize == 'default': chunksize = DataConstants().csv_chunksize
+
+        # daily files are small enough to read in one go
+        if chunksize is None or freq != 'intraday':
+            data_frame = self.read_csv_data_frame(f_name, freq, cutoff=cutoff, dateparse=dateparse)
+
+            self.write_time_series_cache_to_disk(
+                category_f_name, data_frame, engine=engine)
+
+            return
+
+        if engine == 'hdf5_fixed':
+            self.logger.info("Can't append to hdf5_fixed, so writing " + category_f_name + " as hdf5_table")
+
+            engine = 'hdf5_table'
+
+        self.remove_time_series_cache_on_disk(category_f_name, engine=engine)
+
+        for data_frame in self.read_csv_data_frame_chunks(f_name, freq, chunksize=chunksize, cutoff=cutoff,
+                                                          dateparse=dateparse):
+            self.write_time_series_cache_to_disk(category_f_name, data_frame, engine=engine, append_data=True)
+
+    def convert_csv_data_frame_list(self, f_name_list, category_list, freq, cutoff=None, dateparse=None,
+                                    engine='hdf5_fixed', chunksize='default'):
+        """Converts many CSV files at the same time, each in its own (spawned) process (at most one for each core).
+        Scripts calling this need an if __name__ == '__main__': guard, otherwise each new process re-runs the script.
+
+        Parameters
+        ----------
+        f_name_list : list(str)
+            File names to be read
+        category_list : list(str)
+            data category of each file (used in filenames)
+        freq : str
+            intraday/daily frequency (used in HDF5 filename)
+        cutoff : DateTime (optional)
+            filter dates up to here
+        dateparse : str
+            date parser to use
+        engine : str
+            format to write eg. hdf5_fixed, hdf5_table, parquet_day
+        chunksize : int (optional)
+            number of rows to read and write at a time (default DataConstants.csv_chunksize), None to read each whole
+            file at once
+        """
+
+        args_list = [(f_name, category, freq, cutoff, dateparse, engine, chunksize)
+                     for f_name, category in zip(f_name_list, category_list)]
+
+        thread_no = min(DataConstants().csv_convert_process_no, len(args_list), os.cpu_count() or 1)
+
+        ThreadPoolManager.map_processes('io_engine.convert_csv', _convert_csv_data_frame, args_list, thread_no)
 
     def clean_csv_file(self, f_name):
         """Cleans up CSV file (removing empty characters) before writing back to disk
@@ -605,3 +1924,18 @@ class IOEngine(object):
 
     def create_cache_file_name(self, filename):
         return DataConstants().folder_time_series_data + "/" + filename
+
+def _read_time_series_cache_from_disk(args):
+    # module level, so it can be pickled when reading in other processes
+    fname, engine, start_date, finish_date, db_server, columns = args
+
+    return IOEngine().read_time_series_cache_from_disk(fname, engine = engine, start_date = start_date,
+                                                       finish_date = finish_date, db_server = db_server,
+                                                       columns = columns)
+
+def _convert_csv_data_frame(args):
+    # module level, so it can be pickled when converting in other processes
+    f_name, category, freq, cutoff, dateparse, engine, chunksize = args
+
+    IOEngine().convert_csv_data_frame(f_name, category, freq, cutoff=cutoff, dateparse=dateparse, engine=engine,
+                                      chunksize=chunksize)
@@ -12,7 +12,7 @@ __author__ = 'saeedamen' # Saeed Amen
 # See the License for the specific language governing permissions and limitations under the License.
 #
 
-from findatapy.util import DataConstants
+from findatapy.util import DataConstants, ThreadPoolManager
 # from deco import *
 
 class Market(object):
@@ -23,19 +23,24 @@ class Market(object):
 
     """
 
+    # categories which are handled differently by fetch_market
+    _special_categories = ['fx-spot-volume', 'fx', 'fx-tot', 'fx-implied-vol', 'fx-vol-market']
+
     def __init__(self, market_data_generator = None, md_request = None):
         if market_data_generator is None:
             if DataConstants().default_market_data_generator == "marketdatagenerator":
                 from findatapy.market import MarketDataGenerator
                 market_data_generator = MarketDataGenerator()
             elif DataConstants().default_market_data_generator == 'cachedmarketdatagenerator':
-                # NOT CURRENTLY IMPLEMENTED FOR FUTURE USE
-                from finaddpy.market import CachedMarketDataGenerator
+                from findatapy.market import CachedMarketDataGenerator
                 market_data_generator = CachedMarketDataGenerator()
 
         self.market_data_generator = market_data_generator
         self.md_request = md_request
 
+        self.logger = LoggerManager().getLogger(__name__)
+        self.filter = Filter()
+
     def fetch_market(self, md_request = None):
         """Fetches market data for specific tickers
 
@@ -66,6 +71,13 @@ class Market(object):
         if self.md_request is not None:
             md_request = self.md_request
 
+        return self._fetch_market(md_request)
+
+    def _fetch_market(self, md_request):
+        """Fetches market data for a MarketDataRequest (see fetch_market), ignoring any MarketDataRequest that Market
+        was constructed with
+        """
+
         # special cases when a predefined category has been asked
         if md_request.category is not None:
 
@@ -154,6 +166,197 @@ class Market(object):
         # by default: pass the market data request to MarketDataGenerator
         return self.market_data_generator.fetch_market_data(md_request)
 
+    def fetch_market_batch(self, md_request_list):
+        """Fetches market data for many MarketDataRequests, merging those which can be downloaded together, so that we
+        make the minimum number of calls to the data providers
+
+        Requests with the same data source, category, frequency, cut, fields etc. and overlapping date ranges are merged
+        into a single request (with the tickers deduplicated and the date range covering all the requests). The time
+        series for each original request are then filtered out of the merged time series. Requests for special
+        categories (eg. FX crosses or vol surfaces) are fetched individually.
+
+        Parameters
+        ----------
+        md_request_list : list(MarketDataRequest)
+            Describing what market data to fetch
+
+        Returns
+        -------
+        list(pandas.DataFrame)
+            Contains the requested market data (in the same order as the requests)
+        """
+
+        data_frame_list = [None] * len(md_request_list)
+
+        # indices of the requests in each merged group
+        groups = {}
+        group_keys = []
+
+        for i in range(0, len(md_request_list)):
+            key = self._create_batch_key(md_request_list[i])
+
+            if key not in groups:
+                groups[key] = []
+                group_keys.append(key)
+
+            groups[key].append(i)
+
+        # only merge requests whose date ranges overlap (so we don't download the gaps between them)
+        batches = []
+
+        for key in group_keys:
+            if key[0] == 'individual':
+                batches.append((key, groups[key]))
+            else:
+                batches.extend([(key, x) for x in self._split_overlapping_md_requests(md_request_list, groups[key])])
+
+        def fetch_group(batch):
+            key, indices = batch
+
+            # can't merge these, so fetch each individually (the same request object can appear several times)
+            if key[0] == 'individual':
+                md_request = md_request_list[indices[0]]
+
+                # special categories (eg. FX crosses) need the extra handling in _fetch_market
+                if md_request.category in self._special_categories:
+                    data_frame = self._fetch_market(md_request)
+                else:
+                    data_frame = self.market_data_generator.fetch_market_data(md_request)
+
+                return [data_frame] * len(indices)
+
+            md_request_merged = self._merge_md_requests([md_request_list[i] for i in indices])
+
+            self.logger.debug("Merged " + str(len(indices)) + " requests for " + str(md_request_merged.tickers))
+
+            data_frame_merged = self.market_data_generator.fetch_market_data(md_request_merged)
+
+            if data_frame_merged is None or 'return' not in md_request_merged.cache_algo:
+                return [None] * len(indices)
+
+            data_frame_group = []
+
+            for i in indices:
+                md_request = md_request_list[i]
+
+                if md_request.category is not None and 'events' in md_request.category:
+                    data_frame_group.append(data_frame_merged)
+                else:
+                    data_frame_group.append(self.filter.filter_time_series(md_request, data_frame_merged,
+                                                                           pad_columns=True))
+
+            return data_frame_group
+
+        # different groups (eg. for different data sources) can be downloaded at the same time
+        results = ThreadPoolManager.map('market_batch', fetch_group, batches)
+
+        for batch, data_frame_group in zip(batches, results):
+            for i, data_frame in zip(batch[1], data_frame_group):
+                data_frame_list[i] = data_frame
+
+        return data_frame_list
+
+    def _split_overlapping_md_requests(self, md_request_list, indices):
+        """Splits the indices of MarketDataRequests (with the same key from _create_batch_key) into groups, where the
+        date ranges in each group overlap (or touch), so each group can be merged into a single request
+        """
+
+        indices = sorted(indices, key=lambda i: pandas.Timestamp(md_request_list[i].start_date))
+
+        split = []
+        finish_date = None
+
+        for i in indices:
+            md_request = md_request_list[i]
+
+            if finish_date is None or pandas.Timestamp(md_request.start_date) > finish_date:
+                split.append([])
+                finish_date = pandas.Timestamp(md_request.finish_date)
+            else:
+                finish_date = max(finish_date, pandas.Timestamp(md_request.finish_date))
+
+            split[-1].append(i)
+
+        return split
+
+    def _create_batch_key(self, md_request):
+        """Creates a key for a MarketDataRequest, which is identical for requests which can be merged together
+        """
+
+        if md_request.category in self._special_categories or md_request.tickers is None or md_request.tickers == [] \
+                or (md_request.category is not None and 'events' in md_request.category):
+            return ('individual', id(md_request))
+
+        def to_tuple(x):
+            if x is None: return None
+
+            return tuple(x)
+
+        # only merge requests for the same fields, so the merged request doesn't download fields nobody asked for
+        # (date ranges are checked for overlaps later, in _split_overlapping_md_requests)
+        key = (md_request.data_source, md_request.category, md_request.freq, md_request.gran_freq,
+               md_request.freq_mult, md_request.cut, md_request.environment, md_request.trade_side,
+               md_request.cache_algo, md_request.vendor_tickers is None, to_tuple(md_request.vendor_fields),
+               to_tuple(md_request.fields))
+
+        return key
+
+    def _merge_md_requests(self, md_request_list):
+        """Merges several MarketDataRequests (with the same key from _create_batch_key, so the same fields, and
+        overlapping date ranges) into a single request for all their tickers, covering all their date ranges
+        """
+
+        md_request_merged = MarketDataRequest(md_request=md_request_list[0])
+
+        tickers = []
+        vendor_tickers = []
+
+        for md_request in md_request_list:
+            for i in range(0, len(md_request.tickers)):
+                if md_request.tickers[i] not in tickers:
+                    tickers.append(md_request.tickers[i])
+
+                    if md_request.vendor_tickers is not None:
+                        vendor_tickers.append(md_request.vendor_tickers[i])
+
+            if pandas.Timestamp(md_request.start_date) < pandas.Timestamp(md_request_merged.start_date):
+                md_request_merged.start_date = md_request.start_date
+
+            if pandas.Timestamp(md_request.finish_date) > pandas.Timestamp(md_request_merged.finish_date):
+                md_request_merged.finish_date = md_request.finish_date
+
+        md_request_merged.tickers = tickers
+
+        if md_request_merged.vendor_tickers is not None:
+            md_request_merged.vendor_tickers = vendor_tickers
+
+        return md_request_merged
+
+    async def fetch_market_async(self, md_request = None):
+        """Fetches market data for specific tickers (see fetch_market), without blocking the asyncio event loop
+
+        Each call is run in a thread pool for its data source, with at most DataConstants.market_thread_no concurrent
+        calls per data source. Use asyncio.gather to fetch many requests concurrently.
+
+        Parameters
+        ----------
+        md_request : MarketDataRequest
+            Describing what market data to fetch
+
+        Returns
+        -------
+        pandas.DataFrame
+            Contains the requested market data
+
+        """
+        if self.md_request is not None:
+            md_request = self.md_request
+
+        data_source = md_request.data_source
+
+        return await ThreadPoolManager.run_async('async.' + str(data_source), self.fetch_market, md_request,
+                                                 thread_no = ThreadPoolManager.get_thread_no(data_source))
+
 ########################################################################################################################
 
 from findatapy.util.fxconv import FXConv
@@ -180,54 +383,82 @@ class FXCrossFactory(object):
 
     def get_fx_cross_tick(self, start, end, cross,
                      cut = "NYC", data_source = "dukascopy", cache_algo = 'internet_load_return', type = 'spot',
-                     environment = 'backtest', fields = ['bid', 'ask']):
+                     environment = 'backtest', fields = ['bid', 'ask'], gran_freq = 'tick', freq_mult = 1):
+        """Gets FX tick data, or bars built from the ticks whilst they are downloaded (eg. gran_freq = 'second' or
+        'minute', with freq_mult = 5 for 5 minute bars), which is much quicker and uses much less memory than
+        resampling the ticks afterwards. Bars have the fields open, high, low, close (for mid), bid-open, bid-high,
+        bid-low, bid-close, ask-open, ask-high, ask-low, ask-close, bidv, askv and numEvents.
+        """
 
         if isinstance(cross, str):
             cross = [cross]
 
-        market_data_request = MarketDataRequest(
-            gran_freq="tick",
-            freq_mult = 1,
-            freq = 'tick',
-            cut = cut,
-            fields = ['bid', 'ask', 'bidv', 'askv'],
-            cache_algo=cache_algo,
-            environment = environment,
-            start_date = start,
-            finish_date = end,
-            data_source = data_source,
-            category = 'fx'
-        )
+        if gran_freq == 'tick':
+            request_fields = ['bid', 'ask', 'bidv', 'askv']
+        else:
+            request_fields = fields
 
-        market_data_generator = self.market_data_generator
-        data_frame_agg = None
+        market_data_request_list = []
 
         for cr in cross:
+            market_data_request = MarketDataRequest(
+                gran_freq=gran_freq,
+                freq_mult = freq_mult,
+                freq = 'tick',
+                cut = cut,
+                fields = request_fields,
+                cache_algo=cache_algo,
+                environment = environment,
+                start_date = start,
+                finish_date = end,
+                data_source = data_source,
+                category = 'fx'
+            )
 
-            if (type == 'spot'):
-                market_data_request.tickers = cr
+            market_data_request.type = type
+            market_data_request.cross = cr
+            market_data_request.cross_fields = fields
+            market_data_request.tickers = cr
 
-                cross_vals = market_data_generator.fetch_market_data(market_data_request)
+            market_data_request_list.append(market_data_request)
 
-                # if user only wants 'close' calculate that from the bid/ask fields
-                if fields == ['close']:
-                    cross_vals = cross_vals[[cr + '.bid', cr + '.ask']].mean(axis=1)
-                    cross_vals.columns = [cr + '.close']
-                else:
-                    filter = Filter()
+        # download the crosses in parallel (reusing a thread pool for each data source)
+        # note: must be a different pool to the one MarketDataGenerator uses for the underlying downloads
+        result = ThreadPoolManager.map('fx_cross_tick.' + str(data_source), self._get_individual_fx_cross_tick,
+                                       market_data_request_list,
+                                       thread_no = ThreadPoolManager.get_thread_no(data_source))
 
-                    filter_columns = [cr + '.' + f for f in fields]
-                    cross_vals = filter.filter_time_series_by_columns(filter_columns, cross_vals)
+        # align all the crosses in one go (rather than joining them one by one)
+        data_frame_agg = self.calculations.merge_outer_join(result)
 
-            if data_frame_agg is None:
-                data_frame_agg = cross_vals
-            else:
-                data_frame_agg = data_frame_agg.join(cross_vals, how='outer')
+        if data_frame_agg is None: return None
 
         # strip the nan elements
         data_frame_agg = data_frame_agg.dropna()
         return data_frame_agg
 
+    def _get_individual_fx_cross_tick(self, market_data_request):
+        cr = market_data_request.cross
+        fields = market_data_request.cross_fields
+
+        cross_vals = None
+
+        if (market_data_request.type == 'spot'):
+            cross_vals = self.market_data_generator.fetch_market_data(market_data_request)
+
+            if cross_vals is None: return None
+
+            # if user only wants 'close' calculate that from the bid/ask fields (bars already have close)
+            if fields == ['close'] and market_data_request.gran_freq == 'tick':
+                cross_vals = cross_vals[[cr + '.bid', cr + '.ask']].mean(axis=1).to_frame(name = cr + '.close')
+            else:
+                filter = Filter()
+
+                filter_columns = [cr + '.' + f for f in fields]
+                cross_vals = filter.filter_time_series_by_columns(filter_columns, cross_vals)
+
+        return cross_vals
+
 
     def get_fx_cross(self, start, end, cross,
                      cut = "NYC", data_source = "bloomberg", freq = "intraday", cache_algo='internet_load_return', type = 'spot',
@@ -268,38 +499,37 @@ class FXCrossFactory(object):
 
         data_frame_agg = []
 
-        # depends on the nature of operation as to whether we should use threading or multiprocessing library
-        if DataConstants().market_thread_technique is "thread":
-            from multiprocessing.dummy import Pool
-        else:
-            # most of the time is spend waiting for Bloomberg to return, so can use threads rather than multiprocessing
-            # must use the multiprocessing_on_dill library otherwise can't pickle objects correctly
-            # note: currently not very stable
-            from multiprocessing_on_dill import Pool
-
-        thread_no = DataConstants().market_thread_no['other']
-
-        if market_data_request_list[0].data_source in DataConstants().market_thread_no:
-            thread_no = DataConstants().market_thread_no[market_data_request_list[0].data_source]
+        thread_no = ThreadPoolManager.get_thread_no(market_data_request_list[0].data_source)
 
         # fudge, issue with multithreading and accessing HDF5 files
         # if self.market_data_generator.__class__.__name__ == 'CachedMarketDataGenerator':
         #    thread_no = 0
 
         if (thread_no > 0):
-            pool = Pool(thread_no)
+            # depends on the nature of operation as to whether we should use threading or multiprocessing library
+            if DataConstants().market_thread_technique == "thread":
+                # open the market data downloads in their own threads (reusing a thread pool for each data source)
+                # note: must be a different pool to the one MarketDataGenerator uses for the underlying downloads
+                result = ThreadPoolManager.map('fx_cross.' + str(market_data_request_list[0].data_source),
+                                               self._get_individual_fx_cross, market_data_request_list,
+                                               thread_no = thread_no)
+            else:
+                # most of the time is spend waiting for Bloomberg to return, so can use threads rather than multiprocessing
+                # must use the multiprocessing_on_dill library otherwise can't pickle objects correctly
+                # note: currently not very stable
+                from multiprocessing_on_dill import Pool
+
+                pool = Pool(thread_no)
+
+                # open the market data downloads in their own processes and return the results
+                result = pool.map_async(self._get_individual_fx_cross, market_data_request_list).get()
 
-            # open the market data downloads in their own threads and return the results
-            result = pool.map_async(self._get_individual_fx_cross, market_data_request_list)
-            data_frame_agg = self.calculations.iterative_outer_join(result.get())
+                pool.close()
+                pool.join()
 
-            # data_frame_agg = self.calculations.pandas_outer_join(result.get())
+            data_frame_agg = self.calculations.iterative_outer_join(result)
 
-            # pool would have already been closed earlier
-            # try:
-            #    pool.close()
-            #    pool.join()
-            # except: pass
+            # data_frame_agg = self.calculations.pandas_outer_join(result)
         else:
             for md_request in market_data_request_list:
                 data_frame_agg.append(self._get_individual_fx_cross(md_request))
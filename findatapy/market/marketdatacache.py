@@ -0,0 +1,286 @@
+__author__ = 'saeedamen' # Saeed Amen
+
+#
+# Copyright 2016 Cuemacro
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#
+# See the License for the specific language governing permissions and limitations under the License.
+#
+
+import collections
+import threading
+import time
+
+from findatapy.util.dataconstants import DataConstants
+from findatapy.util.loggermanager import LoggerManager
+
+class MarketDataCache(object):
+    """In memory cache of time series, used by MarketDataGenerator to avoid downloading the same data repeatedly.
+
+    Entries are partitioned by environment (eg. backtest, prod) and each partition has its own memory budget (in bytes,
+    measured with DataFrame.memory_usage(deep=True)). When a partition exceeds its budget, the least recently used
+    entries are evicted. Entries can also expire after a time to live. Hit/miss/eviction counters are kept for each
+    partition.
+
+    """
+
+    def __init__(self, max_bytes = None, ttl_seconds = None):
+        self.logger = LoggerManager().getLogger(__name__)
+
+        if max_bytes is None: max_bytes = DataConstants().market_data_cache_max_bytes
+        if ttl_seconds is None: ttl_seconds = DataConstants().market_data_cache_ttl_seconds
+
+        # max_bytes can either be a single number for all environments or a dict of environment -> bytes
+        self._max_bytes = max_bytes
+        self._ttl_seconds = ttl_seconds
+
+        self._partitions = {}
+        self._stats = {}
+        self._lock = threading.RLock()
+
+    def get_max_bytes(self, environment):
+        """Gets the memory budget for a particular environment
+
+        Parameters
+        ----------
+        environment : str
+            environment of the partition eg. backtest
+
+        Returns
+        -------
+        int
+            None if unbounded (including environments which aren't listed, if there is no 'other' limit)
+        """
+        if isinstance(self._max_bytes, dict):
+            if environment in self._max_bytes:
+                return self._max_bytes[environment]
+
+            return self._max_bytes.get('other', None)
+
+        return self._max_bytes
+
+    def get_data_frame_size(self, data_frame):
+        """Calculates the memory used by a DataFrame (including its index and any object columns)
+
+        Parameters
+        ----------
+        data_frame : DataFrame
+            time series to be measured
+
+        Returns
+        -------
+        int
+        """
+        if data_frame is None: return 0
+
+        try:
+            return int(data_frame.memory_usage(index=True, deep=True).sum())
+        except:
+            # eg. for Series, which return a single number
+            return int(data_frame.memory_usage(index=True, deep=True))
+
+    def put(self, key, data_frame, environment = 'backtest', start_date = None, finish_date = None,
+            tickers = None, fields = None):
+        """Adds a time series to the cache (evicting least recently used time series if we exceed the memory budget)
+
+        Parameters
+        ----------
+        key : str
+            key for the time series (typically from MarketDataGenerator.create_time_series_hash_key)
+        data_frame : DataFrame
+            time series to be cached
+        environment : str
+            environment of the time series eg. backtest
+        start_date : DateTime (optional)
+            start of the date range the time series covers
+        finish_date : DateTime (optional)
+            finish of the date range the time series covers
+        tickers : list(str) (optional)
+            tickers in the time series
+        fields : list(str) (optional)
+            fields in the time series
+
+        Returns
+        -------
+        bool
+            True if the time series was cached
+        """
+        if data_frame is None: return False
+
+        size = self.get_data_frame_size(data_frame)
+        max_bytes = self.get_max_bytes(environment)
+
+        with self._lock:
+            partition = self._get_partition(environment)
+
+            if key in partition:
+                self._remove_entry(environment, key)
+
+            # don't flush the whole partition for a time series which could never fit
+            if max_bytes is not None and size > max_bytes:
+                self.logger.warning("Time series " + key + " too large to cache in memory (" + str(size) + " bytes)")
+
+                return False
+
+            partition[key] = {'data_frame' : data_frame, 'size' : size, 'time' : time.time(),
+                              'start_date' : start_date, 'finish_date' : finish_date,
+                              'tickers' : tickers, 'fields' : fields}
+            self._stats[environment]['bytes'] = self._stats[environment]['bytes'] + size
+
+            self._evict(environment, max_bytes)
+
+        return True
+
+    def get(self, key, environment = 'backtest'):
+        """Gets a time series from the cache (or None if it isn't there or has expired)
+
+        Parameters
+        ----------
+        key : str
+            key for the time series
+        environment : str
+            environment of the time series eg. backtest
+
+        Returns
+        -------
+        DataFrame
+        """
+        entry = self.get_entry(key, environment = environment)
+
+        if entry is None: return None
+
+        return entry['data_frame']
+
+    def get_entry(self, key, environment = 'backtest'):
+        """Gets a cache entry, which contains the time series ('data_frame') and the date range ('start_date',
+        'finish_date'), 'tickers' and 'fields' it covers
+
+        Parameters
+        ----------
+        key : str
+            key for the time series
+        environment : str
+            environment of the time series eg. backtest
+
+        Returns
+        -------
+        dict
+        """
+        with self._lock:
+            partition = self._get_partition(environment)
+            stats = self._stats[environment]
+
+            if key not in partition:
+                stats['misses'] = stats['misses'] + 1
+
+                return None
+
+            if self._is_expired(partition[key]):
+                self._remove_entry(environment, key)
+
+                stats['expirations'] = stats['expirations'] + 1
+                stats['misses'] = stats['misses'] + 1
+
+                return None
+
+            # mark as most recently used
+            partition.move_to_end(key)
+            stats['hits'] = stats['hits'] + 1
+
+            return dict(partition[key])
+
+    def contains(self, key, environment = 'backtest'):
+        with self._lock:
+            partition = self._get_partition(environment)
+
+            return key in partition and not self._is_expired(partition[key])
+
+    def remove(self, key, environment = 'backtest'):
+        with self._lock:
+            if key in self._get_partition(environment):
+                self._remove_entry(environment, key)
+
+    def flush(self, environment = None):
+        """Removes all the time series from the cache
+
+        Parameters
+        ----------
+        environment : str (optional)
+            only flush this environment (otherwise flush everything)
+        """
+        with self._lock:
+            if environment is None:
+                environments = list(self._partitions.keys())
+            else:
+                environments = [environment]
+
+            for env in environments:
+                if env in self._partitions:
+                    self._partitions[env].clear()
+                    self._stats[env]['bytes'] = 0
+
+    def get_stats(self, environment = None):
+        """Gets the hit/miss/eviction counters and memory used by the cache
+
+        Parameters
+        ----------
+        environment : str (optional)
+            environment to return stats for (otherwise a dict with every environment)
+
+        Returns
+        -------
+        dict
+        """
+        with self._lock:
+            for env in self._partitions.keys():
+                self._stats[env]['entries'] = len(self._partitions[env])
+
+            if environment is not None:
+                self._get_partition(environment)
+
+                return dict(self._stats[environment])
+
+            return dict((env, dict(stats)) for env, stats in self._stats.items())
+
+    def _get_partition(self, environment):
+        if environment not in self._partitions:
+            self._partitions[environment] = collections.OrderedDict()
+            self._stats[environment] = {'hits' : 0, 'misses' : 0, 'evictions' : 0, 'expirations' : 0,
+                                        'bytes' : 0, 'entries' : 0}
+
+        return self._partitions[environment]
+
+    def _is_expired(self, entry):
+        if self._ttl_seconds is None: return False
+
+        return (time.time() - entry['time']) > self._ttl_seconds
+
+    def _remove_entry(self, environment, key):
+        entry = self._partitions[environment].pop(key)
+        self._stats[environment]['bytes'] = self._stats[environment]['bytes'] - entry['size']
+
+        return entry
+
+    def _evict(self, environment, max_bytes):
+        partition = self._partitions[environment]
+        stats = self._stats[environment]
+
+        # first get rid of anything which has expired
+        for key in [k for k, v in partition.items() if self._is_expired(v)]:
+            self._remove_entry(environment, key)
+            stats['expirations'] = stats['expirations'] + 1
+
+        if max_bytes is None: return
+
+        # then the least recently used time series (at the front of the OrderedDict)
+        while stats['bytes'] > max_bytes and len(partition) > 0:
+            key = next(iter(partition))
+            self._remove_entry(environment, key)
+            stats['evictions'] = stats['evictions'] + 1
+
+            self.logger.debug("Evicted from memory cache " + key)
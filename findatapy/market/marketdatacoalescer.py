@@ -0,0 +1,137 @@
+__author__ = 'saeedamen' # Saeed Amen
+
+#
+# Copyright 2016 Cuemacro
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#
+# See the License for the specific language governing permissions and limitations under the License.
+#
+
+import threading
+
+import pandas
+
+from findatapy.util.loggermanager import LoggerManager
+
+class MarketDataCoalescer(object):
+    """Coalesces identical MarketDataRequests which are being downloaded at the same time (eg. from different threads),
+    so that only the first one calls the data provider and the rest wait for its result.
+
+    Keeps counters of how many calls to the data provider were made and how many were saved.
+
+    """
+
+    def __init__(self):
+        self.logger = LoggerManager().getLogger(__name__)
+
+        self._in_flight = {}
+        self._stats = {'calls' : 0, 'coalesced' : 0, 'errors' : 0}
+        self._lock = threading.Lock()
+
+    def create_request_key(self, market_data_request):
+        """Creates a key for a MarketDataRequest, which is identical for requests which would return the same data
+
+        Parameters
+        ----------
+        market_data_request : MarketDataRequest
+            contains various properties describing time series to fetched, including ticker, start & finish date etc.
+
+        Returns
+        -------
+        str
+        """
+
+        def to_str(x):
+            if isinstance(x, list): return ','.join([str(y) for y in x])
+
+            return str(x)
+
+        return '|'.join([to_str(x) for x in [
+            market_data_request.data_source, market_data_request.category, market_data_request.freq,
+            market_data_request.gran_freq, market_data_request.freq_mult, market_data_request.cut,
+            market_data_request.environment, market_data_request.trade_side,
+            market_data_request.start_date, market_data_request.finish_date,
+            market_data_request.tickers, market_data_request.fields,
+            market_data_request.vendor_tickers, market_data_request.vendor_fields]])
+
+    def fetch(self, market_data_request, fetch_func):
+        """Calls fetch_func for a MarketDataRequest, unless an identical request is already in flight, in which case we
+        wait for its result instead
+
+        Parameters
+        ----------
+        market_data_request : MarketDataRequest
+            contains various properties describing time series to fetched, including ticker, start & finish date etc.
+        fetch_func : function
+            function which downloads the time series for the MarketDataRequest
+
+        Returns
+        -------
+        pandas.DataFrame
+        """
+
+        key = self.create_request_key(market_data_request)
+
+        with self._lock:
+            if key in self._in_flight:
+                flight = self._in_flight[key]
+                self._stats['coalesced'] = self._stats['coalesced'] + 1
+
+                is_leader = False
+            else:
+                flight = {'event' : threading.Event(), 'result' : None, 'exception' : None}
+                self._in_flight[key] = flight
+                self._stats['calls'] = self._stats['calls'] + 1
+
+                is_leader = True
+
+        if not(is_leader):
+            self.logger.debug("Waiting for identical request already in flight " + key)
+
+            flight['event'].wait()
+
+            if flight['exception'] is not None:
+                raise flight['exception']
+
+            # give each caller its own copy of DataFrames/Series, in case they modify it (other results eg. a
+            # Resampler are passed through as they are)
+            if isinstance(flight['result'], (pandas.DataFrame, pandas.Series)):
+                return flight['result'].copy()
+
+            return flight['result']
+
+        try:
+            flight['result'] = fetch_func(market_data_request)
+        except Exception as e:
+            flight['exception'] = e
+
+            with self._lock:
+                self._stats['errors'] = self._stats['errors'] + 1
+
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+
+            flight['event'].set()
+
+        return flight['result']
+
+    def get_stats(self):
+        """Gets the number of calls made to data providers and the number of calls saved by coalescing
+
+        Returns
+        -------
+        dict
+        """
+
+        with self._lock:
+            stats = dict(self._stats)
+            stats['in_flight'] = len(self._in_flight)
+
+        return stats
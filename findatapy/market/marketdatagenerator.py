@@ -16,10 +16,13 @@ import copy
 
 import pandas
 
+from findatapy.market.datavendorthrottle import DataVendorThrottle
 from findatapy.market.ioengine import IOEngine
+from findatapy.market.marketdatacache import MarketDataCache
+from findatapy.market.marketdatacoalescer import MarketDataCoalescer
 from findatapy.market.marketdatarequest import MarketDataRequest
 from findatapy.timeseries import Filter, Calculations
-from findatapy.util import DataConstants, LoggerManager, ConfigManager
+from findatapy.util import DataConstants, LoggerManager, ConfigManager, ThreadPoolManager
 
 class MarketDataGenerator(object):
     """Returns market data time series by directly calling market data sources.
@@ -28,7 +31,8 @@ class MarketDataGenerator(object):
     in subclasses of DataVendor class. This provides a common wrapper for all these data sources.
 
     """
-    _time_series_cache = {} # shared across all instances of object!
+    _time_series_cache = MarketDataCache() # shared across all instances of object!
+    _request_coalescer = MarketDataCoalescer() # requests currently being downloaded (also shared)
 
     def __init__(self):
         self.config = ConfigManager().get_instance()
@@ -40,11 +44,42 @@ class MarketDataGenerator(object):
 
         return
 
-    def flush_cache(self):
+    def flush_cache(self, environment = None):
         """Flushs internal cache of time series
+
+        Parameters
+        ----------
+        environment : str (optional)
+            only flush time series for this environment (eg. backtest)
         """
 
-        self._time_series_cache = {}
+        self._time_series_cache.flush(environment = environment)
+
+    def get_cache_stats(self, environment = None):
+        """Gets the hit/miss/eviction counters and memory usage of the internal cache of time series
+
+        Parameters
+        ----------
+        environment : str (optional)
+            environment to return stats for
+
+        Returns
+        -------
+        dict
+        """
+
+        return self._time_series_cache.get_stats(environment = environment)
+
+    def get_coalescer_stats(self):
+        """Gets the number of calls made to data providers and how many were saved by waiting for identical requests
+        which were already in flight
+
+        Returns
+        -------
+        dict
+        """
+
+        return self._request_coalescer.get_stats()
 
     def set_intraday_code(self, code):
         self._intraday_code = code
@@ -112,23 +147,9 @@ class MarketDataGenerator(object):
         pandas.DataFrame
         """
 
-        tickers = market_data_request.tickers
         # data_vendor = self.get_data_vendor(market_data_request.data_source)
 
-        # check if tickers have been specified (if not load all of them for a category)
-        # also handle single tickers/list tickers
-        create_tickers = False
-
-        if tickers is None :
-            create_tickers = True
-        elif isinstance(tickers, str):
-            if tickers == '': create_tickers = True
-        elif isinstance(tickers, list):
-            if tickers == []: create_tickers = True
-
-        if create_tickers:
-            market_data_request.tickers = ConfigManager().get_instance().get_tickers_list_for_category(
-            market_data_request.category, market_data_request.data_source, market_data_request.freq, market_data_request.cut)
+        self.create_tickers(market_data_request)
 
         # intraday or tick: only one ticker per cache file
         if (market_data_request.freq in ['intraday', 'tick', 'second', 'hour', 'minute']):
@@ -167,6 +188,115 @@ class MarketDataGenerator(object):
 
                 return None
 
+    def create_tickers(self, market_data_request):
+        """Checks if tickers have been specified in a MarketDataRequest, if not fills in all the tickers for its category
+        (from the configuration files)
+
+        Parameters
+        ----------
+        market_data_request : MarketDataRequest
+            contains various properties describing time series to fetched, including ticker, start & finish date etc.
+        """
+
+        tickers = market_data_request.tickers
+
+        # also handle single tickers/list tickers
+        create_tickers = False
+
+        if tickers is None :
+            create_tickers = True
+        elif isinstance(tickers, str):
+            if tickers == '': create_tickers = True
+        elif isinstance(tickers, list):
+            if tickers == []: create_tickers = True
+
+        if create_tickers:
+            market_data_request.tickers = ConfigManager().get_instance().get_tickers_list_for_category(
+            market_data_request.category, market_data_request.data_source, market_data_request.freq, market_data_request.cut)
+
+    async def fetch_market_data_async(self, market_data_request):
+        """Loads time series from specified data provider, without blocking the asyncio event loop
+
+        The data providers only have blocking clients, so the download is run in a thread pool for each data source, with
+        at most DataConstants.market_thread_no concurrent requests per data source. Many requests (eg. for different
+        tickers or categories) can be fetched concurrently with asyncio.gather.
+
+        Parameters
+        ----------
+        market_data_request : MarketDataRequest
+            contains various properties describing time series to fetched, including ticker, start & finish date etc.
+
+        Returns
+        -------
+        pandas.DataFrame
+        """
+
+        data_source = market_data_request.data_source
+
+        return await ThreadPoolManager.run_async('async.' + str(data_source), self.fetch_market_data,
+                                                 market_data_request,
+                                                 thread_no = ThreadPoolManager.get_thread_no(data_source))
+
+    def fetch_market_data_chunks(self, market_data_request, chunk_freq = 'day'):
+        """Loads intraday/tick time series from specified data provider in chunks, which can be resampled, filtered or
+        written to disk one at a time (so we never need to hold the whole history in memory). Each ticker is returned
+        in turn, in date order. Chunks are not cached in memory.
+
+        Daily data (or data providers which can't download in pieces) is returned as a single chunk.
+
+        Parameters
+        ----------
+        market_data_request : MarketDataRequest
+            contains various properties describing time series to fetched, including ticker, start & finish date etc.
+        chunk_freq : str
+            'hour' or 'day' (size of each chunk)
+
+        Returns
+        -------
+        generator(pandas.DataFrame)
+        """
+
+        if market_data_request.freq not in ['intraday', 'tick', 'second', 'hour', 'minute']:
+            data_frame = self.fetch_market_data(market_data_request)
+
+            if data_frame is not None:
+                yield data_frame
+
+            return
+
+        data_vendor = self.get_data_vendor(market_data_request.data_source)
+
+        # load all the tickers for the category, if none have been specified (as fetch_market_data does)
+        market_data_request = MarketDataRequest(md_request=market_data_request)
+        self.create_tickers(market_data_request)
+
+        ticker_cycle = 0
+
+        for ticker in market_data_request.tickers:
+            market_data_request_single = MarketDataRequest(md_request=market_data_request)
+            market_data_request_single.tickers = ticker
+
+            if market_data_request.vendor_tickers is not None:
+                market_data_request_single.vendor_tickers = [market_data_request.vendor_tickers[ticker_cycle]]
+                ticker_cycle = ticker_cycle + 1
+
+            for data_frame in data_vendor.load_ticker_chunks(market_data_request_single, chunk_freq = chunk_freq):
+                if data_frame is None or data_frame.empty: continue
+
+                data_frame.index.name = 'Date'
+
+                # we downscale into float32, to avoid memory problems
+                try:
+                    data_frame = data_frame.astype('float32')
+                except: pass
+
+                try:
+                    data_frame = self.filter.filter_time_series(market_data_request_single, data_frame, pad_columns=True)
+                except:
+                    pass
+
+                yield data_frame
+
     def get_market_data_cached(self, market_data_request):
         """Loads time series from cache (if it exists)
 
@@ -187,10 +317,25 @@ class MarketDataGenerator(object):
 
         fname = self.create_time_series_hash_key(market_data_request, ticker)
 
-        if (fname in self._time_series_cache):
-            data_frame = self._time_series_cache[fname]
+        # daily data is cached separately for each ticker/field
+        if ticker is None:
+            data_frame = self.get_daily_columns_cached(market_data_request, fname)
+
+            if data_frame is not None:
+                return self.filter.filter_time_series(market_data_request, data_frame)
 
-            return self.filter.filter_time_series(market_data_request, data_frame)
+            return None
+
+        entry = self._time_series_cache.get_entry(fname, environment = market_data_request.environment)
+
+        if entry is not None:
+            # if we know the date range/tickers which are cached, make sure the cache covers the request
+            if entry['start_date'] is not None and entry['tickers'] is not None:
+                if not(self.is_cache_entry_for_tickers(entry, market_data_request)) or \
+                        self.get_missing_date_ranges(entry, market_data_request) != []:
+                    return None
+
+            return self.filter.filter_time_series(market_data_request, entry['data_frame'])
 
         return None
 
@@ -301,6 +446,25 @@ class MarketDataGenerator(object):
             return self.fetch_group_time_series(market_data_request_list)
 
     def fetch_single_time_series(self, market_data_request):
+        """Downloads time series for a MarketDataRequest from the data provider. If an identical request is already being
+        downloaded (eg. by another thread), waits for that result rather than calling the data provider again.
+
+        Parameters
+        ----------
+        market_data_request : MarketDataRequest
+            contains various properties describing time series to fetched, including ticker, start & finish date etc.
+
+        Returns
+        -------
+        pandas.DataFrame
+        """
+
+        if DataConstants().market_data_coalesce_requests:
+            return self._request_coalescer.fetch(market_data_request, self._fetch_single_time_series)
+
+        return self._fetch_single_time_series(market_data_request)
+
+    def _fetch_single_time_series(self, market_data_request):
 
         market_data_request = MarketDataRequest(md_request=market_data_request)
 
@@ -356,34 +520,7 @@ class MarketDataGenerator(object):
 
         data_frame_agg = None
 
-        # depends on the nature of operation as to whether we should use threading or multiprocessing library
-        if DataConstants().market_thread_technique is "thread":
-            from multiprocessing.dummy import Pool
-        else:
-            # most of the time is spend waiting for Bloomberg to return, so can use threads rather than multiprocessing
-            # must use the multiprocessing_on_dill library otherwise can't pickle objects correctly
-            # note: currently not very stable
-            from multiprocessing_on_dill import Pool
-
-        thread_no = DataConstants().market_thread_no['other']
-
-        if market_data_request_list[0].data_source in DataConstants().market_thread_no:
-            thread_no = DataConstants().market_thread_no[market_data_request_list[0].data_source]
-
-        if thread_no > 0:
-            pool = Pool(thread_no)
-
-            # open the market data downloads in their own threads and return the results
-            result = pool.map_async(self.fetch_single_time_series, market_data_request_list)
-            data_frame_group = result.get()
-
-            pool.close()
-            pool.join()
-        else:
-            data_frame_group = []
-
-            for md_request in market_data_request_list:
-                data_frame_group.append(self.fetch_single_time_series(md_request))
+        data_frame_group = self.fetch_time_series_list(market_data_request_list)
 
         # collect together all the time series
         if data_frame_group is not None:
@@ -394,9 +531,60 @@ class MarketDataGenerator(object):
 
         return data_frame_agg
 
+    def fetch_time_series_list(self, market_data_request_list):
+        """Downloads time series for a list of MarketDataRequests (in parallel if specified in DataConstants)
+
+        Parameters
+        ----------
+        market_data_request_list : list(MarketDataRequest)
+            requests to be downloaded
+
+        Returns
+        -------
+        list(pandas.DataFrame)
+            in the same order as the requests (with None where nothing was downloaded)
+        """
+
+        data_source = market_data_request_list[0].data_source
+        thread_no = ThreadPoolManager.get_thread_no(data_source)
+
+        if thread_no <= 0:
+            return [self.fetch_single_time_series(md_request) for md_request in market_data_request_list]
+
+        # the DataVendorThrottle decides how many calls are actually made at once (starting at market_thread_no), so
+        # give it enough threads to grow into
+        if DataConstants().market_adaptive_concurrency:
+            thread_no = max(thread_no, DataVendorThrottle.get_throttle(data_source).get_max_concurrency())
+
+        # depends on the nature of operation as to whether we should use threading or multiprocessing library
+        if DataConstants().market_thread_technique == "thread":
+            # open the market data downloads in their own threads (reusing a thread pool for each data source)
+            return ThreadPoolManager.map('market_data.' + str(data_source), self.fetch_single_time_series,
+                                         market_data_request_list, thread_no = thread_no)
+
+        # most of the time is spend waiting for Bloomberg to return, so can use threads rather than multiprocessing
+        # must use the multiprocessing_on_dill library otherwise can't pickle objects correctly
+        # note: currently not very stable
+        from multiprocessing_on_dill import Pool
+
+        pool = Pool(thread_no)
+
+        # open the market data downloads in their own processes and return the results
+        result = pool.map_async(self.fetch_single_time_series, market_data_request_list)
+        data_frame_group = result.get()
+
+        pool.close()
+        pool.join()
+
+        return data_frame_group
+
     def download_daily(self, market_data_request):
         """Loads daily time series from specified data provider
 
+        Daily time series are cached in memory for each ticker/field (so overlapping baskets of tickers can share the
+        same cached time series). If we are using a caching algo (cache_algo or cache_algo_return), we only download
+        the tickers and date ranges which are not already in the memory cache.
+
         Parameters
         ----------
         market_data_request : MarketDataRequest
@@ -408,6 +596,340 @@ class MarketDataGenerator(object):
         """
 
         # daily data does not include ticker in the key, as multiple tickers in the same file
+        key = self.create_category_key(market_data_request)
+        fname = self.create_cache_file_name(key)
+
+        if 'cache_algo' in market_data_request.cache_algo:
+            data_frame_agg, data_frame_downloaded = self.download_daily_column_cached(market_data_request, fname)
+
+            return data_frame_agg
+
+        data_frame_agg = self.fetch_daily_time_series(market_data_request)
+
+        # cache in memory (ok for daily data)
+        self.cache_daily_columns(fname, data_frame_agg, market_data_request.environment,
+                                 market_data_request.tickers, market_data_request.fields,
+                                 market_data_request.start_date, market_data_request.finish_date)
+
+        return data_frame_agg
+
+    def download_daily_column_cached(self, market_data_request, fname):
+        """Loads daily time series, using the memory cache for each ticker/field we already have and only downloading
+        the missing tickers and date ranges from the data provider
+
+        Tickers which are missing the same date ranges are downloaded together, so typically we have one call for the
+        tickers which are not cached at all and one call to extend the tickers which are already cached.
+
+        Parameters
+        ----------
+        market_data_request : MarketDataRequest
+            contains various properties describing time series to fetched, including ticker, start & finish date etc.
+        fname : str
+            cache key for the category of the time series
+
+        Returns
+        -------
+        pandas.DataFrame, list(pandas.DataFrame)
+            time series for the request and the time series which were downloaded from the data provider
+        """
+
+        environment = market_data_request.environment
+
+        # group together the tickers which are missing the same date ranges
+        missing_groups = {}
+
+        for ticker in market_data_request.tickers:
+            missing_date_ranges = tuple(self.get_missing_date_ranges_for_ticker(market_data_request, fname, ticker))
+
+            if missing_date_ranges != ():
+                if missing_date_ranges not in missing_groups:
+                    missing_groups[missing_date_ranges] = []
+
+                missing_groups[missing_date_ranges].append(ticker)
+
+        vendor_tickers = None
+
+        if market_data_request.vendor_tickers is not None:
+            vendor_tickers = dict(zip(market_data_request.tickers, market_data_request.vendor_tickers))
+
+        data_frame_downloaded = []
+
+        for missing_date_ranges, tickers in missing_groups.items():
+            for (missing_start, missing_finish) in missing_date_ranges:
+                self.logger.debug("Downloading " + str(tickers) + " for missing date range " + str(missing_start)
+                                  + " - " + str(missing_finish))
+
+                market_data_request_missing = copy.copy(market_data_request)
+                market_data_request_missing.tickers = tickers
+                market_data_request_missing.start_date = missing_start
+                market_data_request_missing.finish_date = missing_finish
+
+                if vendor_tickers is not None:
+                    market_data_request_missing.vendor_tickers = [vendor_tickers[t] for t in tickers]
+
+                data_frame_missing = self.fetch_daily_time_series(market_data_request_missing)
+
+                # only mark date range as covered if the data provider returned something
+                if data_frame_missing is not None:
+                    self.cache_daily_columns(fname, data_frame_missing, environment, tickers,
+                                             market_data_request.fields, missing_start, missing_finish, splice=True)
+
+                    data_frame_downloaded.append(data_frame_missing)
+
+        return self.get_daily_columns_cached(market_data_request, fname, check_date_range = False), data_frame_downloaded
+
+    def create_column_cache_key(self, fname, ticker, field):
+        """Creates a memory cache key for a single ticker/field of daily data
+
+        Parameters
+        ----------
+        fname : str
+            cache key for the category of the time series
+        ticker : str
+            ticker eg. EURUSD
+        field : str
+            field eg. close
+
+        Returns
+        -------
+        str
+        """
+
+        return fname + '.' + ticker + '.' + field
+
+    def cache_daily_columns(self, fname, data_frame, environment, tickers, fields, start_date, finish_date,
+                            splice = False):
+        """Caches each ticker/field of a daily time series in memory separately
+
+        Parameters
+        ----------
+        fname : str
+            cache key for the category of the time series
+        data_frame : DataFrame
+            time series to be cached (with columns of the form ticker.field)
+        environment : str
+            environment of the time series eg. backtest
+        tickers : list(str)
+            tickers in the time series
+        fields : list(str)
+            fields in the time series
+        start_date : DateTime
+            start of the date range the time series covers
+        finish_date : DateTime
+            finish of the date range the time series covers
+        splice : bool
+            True to splice with time series already in the cache (rather than replacing them)
+        """
+
+        if data_frame is None: return
+
+        for ticker in tickers:
+            for field in fields:
+                col = ticker + '.' + field
+
+                if col not in data_frame.columns: continue
+
+                key = self.create_column_cache_key(fname, ticker, field)
+
+                data_frame_col = data_frame[[col]]
+                col_start_date = start_date
+                col_finish_date = finish_date
+
+                if splice:
+                    entry = self._time_series_cache.get_entry(key, environment = environment)
+
+                    if entry is not None:
+                        data_frame_col = self.splice_time_series(entry['data_frame'], data_frame_col)
+
+                        col_start_date = min(pandas.Timestamp(start_date), pandas.Timestamp(entry['start_date']))
+                        col_finish_date = max(pandas.Timestamp(finish_date), pandas.Timestamp(entry['finish_date']))
+
+                self._time_series_cache.put(key, data_frame_col, environment = environment,
+                                            start_date = col_start_date, finish_date = col_finish_date,
+                                            tickers = [ticker], fields = [field])
+
+    def get_daily_columns_cached(self, market_data_request, fname, check_date_range = True):
+        """Assembles a daily time series from the tickers/fields in the memory cache
+
+        Parameters
+        ----------
+        market_data_request : MarketDataRequest
+            contains various properties describing time series to fetched, including ticker, start & finish date etc.
+        fname : str
+            cache key for the category of the time series
+        check_date_range : bool
+            False if we want the cached time series whatever date range they cover (eg. just after downloading)
+
+        Returns
+        -------
+        pandas.DataFrame
+            None if any ticker/field is missing or doesn't cover the date range (when check_date_range is True)
+        """
+
+        data_frame_group = []
+
+        for ticker in market_data_request.tickers:
+            for field in market_data_request.fields:
+                entry = self._time_series_cache.get_entry(self.create_column_cache_key(fname, ticker, field),
+                                                          environment = market_data_request.environment)
+
+                if entry is None:
+                    if check_date_range: return None
+
+                    continue
+
+                if check_date_range and self.get_missing_date_ranges(entry, market_data_request) != []:
+                    return None
+
+                data_frame_group.append(entry['data_frame'])
+
+        return self.calculations.pandas_outer_join(data_frame_group)
+
+    def get_missing_date_ranges_for_ticker(self, market_data_request, fname, ticker):
+        """Finds the date ranges of a MarketDataRequest which are not covered by the memory cache for a ticker (across
+        all the fields)
+
+        Parameters
+        ----------
+        market_data_request : MarketDataRequest
+            contains various properties describing time series to fetched, including ticker, start & finish date etc.
+        fname : str
+            cache key for the category of the time series
+        ticker : str
+            ticker to check
+
+        Returns
+        -------
+        list(tuple)
+            start/finish dates of the missing date ranges
+        """
+
+        cached_start_date = None
+        cached_finish_date = None
+
+        # the date range where every field for this ticker is cached
+        for field in market_data_request.fields:
+            entry = self._time_series_cache.get_entry(self.create_column_cache_key(fname, ticker, field),
+                                                      environment = market_data_request.environment)
+
+            if entry is None:
+                return [(market_data_request.start_date, market_data_request.finish_date)]
+
+            if cached_start_date is None or pandas.Timestamp(entry['start_date']) > cached_start_date:
+                cached_start_date = pandas.Timestamp(entry['start_date'])
+
+            if cached_finish_date is None or pandas.Timestamp(entry['finish_date']) < cached_finish_date:
+                cached_finish_date = pandas.Timestamp(entry['finish_date'])
+
+        if cached_start_date > cached_finish_date:
+            return [(market_data_request.start_date, market_data_request.finish_date)]
+
+        return self.get_missing_date_ranges({'start_date' : cached_start_date, 'finish_date' : cached_finish_date},
+                                            market_data_request)
+
+    def is_cache_entry_for_tickers(self, entry, market_data_request):
+        """Checks whether a cache entry contains all the tickers and fields of a MarketDataRequest
+
+        Parameters
+        ----------
+        entry : dict
+            cache entry from MarketDataCache.get_entry
+        market_data_request : MarketDataRequest
+            contains various properties describing time series to fetched, including ticker, start & finish date etc.
+
+        Returns
+        -------
+        bool
+        """
+
+        if entry is None: return False
+
+        if entry['start_date'] is None or entry['finish_date'] is None: return False
+
+        if entry['tickers'] is None or entry['fields'] is None: return False
+
+        return set(market_data_request.tickers).issubset(set(entry['tickers'])) and \
+               set(market_data_request.fields).issubset(set(entry['fields']))
+
+    def get_missing_date_ranges(self, entry, market_data_request):
+        """Finds the date ranges of a MarketDataRequest which are not covered by a cache entry
+
+        If the cached time series runs up to today (or later), we also redownload from the last cached date, given that
+        the last point may have been updated since it was cached (eg. if it was downloaded intraday). Older cached points
+        are final, so aren't redownloaded.
+
+        Parameters
+        ----------
+        entry : dict
+            cache entry from MarketDataCache.get_entry
+        market_data_request : MarketDataRequest
+            contains various properties describing time series to fetched, including ticker, start & finish date etc.
+
+        Returns
+        -------
+        list(tuple)
+            start/finish dates of the missing date ranges
+        """
+
+        start_date = pandas.Timestamp(market_data_request.start_date)
+        finish_date = pandas.Timestamp(market_data_request.finish_date)
+
+        cached_start_date = pandas.Timestamp(entry['start_date'])
+        cached_finish_date = pandas.Timestamp(entry['finish_date'])
+
+        missing_date_ranges = []
+
+        if start_date < cached_start_date:
+            missing_date_ranges.append((start_date, cached_start_date))
+
+        # the last cached day might not be final yet
+        today = pandas.Timestamp.now(tz='UTC').tz_localize(None).normalize()
+
+        if cached_finish_date.tz is not None:
+            today = today.tz_localize('UTC')
+
+        if finish_date > cached_finish_date:
+            missing_date_ranges.append((cached_finish_date, finish_date))
+        elif finish_date == cached_finish_date and cached_finish_date >= today:
+            missing_date_ranges.append((cached_finish_date.normalize(), finish_date))
+
+        return missing_date_ranges
+
+    def splice_time_series(self, data_frame_cached, data_frame_new):
+        """Splices newly downloaded time series with cached time series (newer points overwrite cached ones)
+
+        Parameters
+        ----------
+        data_frame_cached : DataFrame
+            time series from cache
+        data_frame_new : DataFrame
+            newly downloaded time series
+
+        Returns
+        -------
+        DataFrame
+        """
+
+        if data_frame_cached is None: return data_frame_new
+        if data_frame_new is None: return data_frame_cached
+
+        data_frame = data_frame_new.combine_first(data_frame_cached)
+        data_frame.index.name = data_frame_cached.index.name
+
+        return data_frame
+
+    def fetch_daily_time_series(self, market_data_request):
+        """Downloads daily time series from the data provider, splitting up the tickers among several threads
+
+        Parameters
+        ----------
+        market_data_request : MarketDataRequest
+            contains various properties describing time series to fetched, including ticker, start & finish date etc.
+
+        Returns
+        -------
+        pandas.DataFrame
+        """
 
         if DataConstants().market_thread_no['other'] == 1:
             # data_frame_agg = data_vendor.load_ticker(market_data_request)
@@ -433,10 +955,6 @@ class MarketDataGenerator(object):
 
             data_frame_agg = self.fetch_group_time_series(market_data_request_list)
 
-        key = self.create_category_key(market_data_request)
-        fname = self.create_cache_file_name(key)
-        self._time_series_cache[fname] = data_frame_agg  # cache in memory (ok for daily data)
-
         return data_frame_agg
 
     def refine_expiry_date(self, market_data_request):
@@ -471,6 +989,11 @@ class MarketDataGenerator(object):
 
         if market_data_request.cut is not None: cut = market_data_request.cut
 
+        # bars built from ticks (eg. 5 minute bars) shouldn't share a key (or cache file) with the ticks themselves
+        # (freq_mult = 1 is the default, so leave it out to keep the keys of existing cache files)
+        if market_data_request.gran_freq is not None: freq = freq + '.' + market_data_request.gran_freq
+        if market_data_request.freq_mult not in [None, 1]: freq = freq + '.' + str(market_data_request.freq_mult)
+
         if (ticker is not None): key = environment + "." + category + '.' + source + '.' + freq + '.' + cut + '.' + ticker
         else: key = environment + "." + category + '.' + source + '.' + freq + '.' + cut
 
@@ -24,6 +24,7 @@ from pandas.stats.api import ols
 
 from findatapy.timeseries.filter import Filter
 from findatapy.timeseries.filter import Calendar
+from findatapy.util.threadpoolmanager import ThreadPoolManager
 
 class Calculations(object):
     """Calculations on time series, such as calculating strategy returns and various wrappers on pandas for rolling sums etc.
@@ -706,6 +707,68 @@ class Calculations(object):
 
         return df_list[0].join(df_list[1:], how="outer")
 
+    def merge_outer_join(self, df_list):
+        """Outer joins many time series (eg. tick data) in one pass, by merging all their timestamps into a single sorted
+        index and aligning each time series to it once, rather than repeatedly joining onto a growing DataFrame. No
+        points are dropped: where time series have several points with the same timestamp, the nth point with that
+        timestamp in each time series is aligned with the nth point in the others.
+
+        Parameters
+        ----------
+        df_list : list(DataFrame)
+            time series to be joined (with different columns)
+
+        Returns
+        -------
+        DataFrame
+        """
+        if df_list is None: return None
+
+        df_list = [i for i in df_list if i is not None]
+
+        if len(df_list) == 0: return None
+
+        if len(df_list) == 1: return df_list[0]
+
+        tz = getattr(df_list[0].index, 'tz', None)
+        name = df_list[0].index.name
+
+        if any([df.index.has_duplicates for df in df_list]):
+            # number repeated timestamps (0, 1, 2...), so each point has a unique label to align on
+            keys = [pandas.MultiIndex.from_arrays([df.index, df.groupby(level=0).cumcount().values])
+                    for df in df_list]
+
+            index = keys[0]
+
+            for key in keys[1:]:
+                index = index.union(key)
+
+            index = index.sort_values()
+        else:
+            keys = [df.index for df in df_list]
+
+            # sorted union of all the timestamps (tz aware timestamps are merged in UTC)
+            index = pandas.Index(numpy.unique(numpy.concatenate([df.index.values for df in df_list])), name = name)
+
+            if tz is not None:
+                index = pandas.DatetimeIndex(index).tz_localize('UTC').tz_convert(tz)
+
+        data = {}
+        columns = []
+
+        for df, key in zip(df_list, keys):
+            df = df.set_axis(key, axis = 0).reindex(index)
+
+            for col in df.columns:
+                data[col] = df[col].values
+                columns.append(col)
+
+        if isinstance(index, pandas.MultiIndex):
+            index = index.get_level_values(0)
+            index.name = name
+
+        return pandas.DataFrame(data, index = index, columns = columns)
+
     def functional_outer_join(self, df_list):
         def join_dfs(ldf, rdf):
             return ldf.join(rdf, how='outer')
@@ -715,10 +778,6 @@ class Calculations(object):
     # experimental!
     def iterative_outer_join(self, df_list, pool = None):
 
-        if pool is None:
-            from multiprocessing.dummy import Pool
-            pool = Pool(4)
-
         while(True):
             # split into two
             length = len(df_list)
@@ -727,10 +786,15 @@ class Calculations(object):
 
             job_args = [(item_a, df_list) for i, item_a in enumerate(range(0, length, 2))]
 
-            df_list = pool.map_async(self.join_aux_helper, job_args).get()
+            # by default reuse a shared thread pool, rather than creating a new one every time
+            if pool is None:
+                df_list = ThreadPoolManager.map('calculations', self.join_aux_helper, job_args)
+            else:
+                df_list = pool.map_async(self.join_aux_helper, job_args).get()
 
-        pool.close()
-        pool.join()
+        if pool is not None:
+            pool.close()
+            pool.join()
 
         return df_list[0]
 
@@ -7,5 +7,6 @@ from findatapy.util.dataconstants import DataConstants
 from findatapy.util.fxconv import FXConv
 from findatapy.util.loggermanager import LoggerManager
 from findatapy.util.singleton import Singleton
+from findatapy.util.threadpoolmanager import ThreadPoolManager
 from findatapy.util.tickerfactory import TickerFactory
 from findatapy.util.twitter import Twitter
\ No newline at end of file
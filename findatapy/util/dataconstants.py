@@ -62,10 +62,46 @@ class DataConstants(object):
     ###### FOR CURRENT VERSION
 
     # which marketdatagenerator type to use?
-    # note - marketdatagenerator currently implemented
-    #        cachedmarketdatagenerator is only for proprietary version at present
+    # note - marketdatagenerator only caches in memory
+    #        cachedmarketdatagenerator also caches on disk (in folder_time_series_data)
     default_market_data_generator = "marketdatagenerator"
 
+    # engine used by cachedmarketdatagenerator to cache time series on disk (see IOEngine, eg. hdf5_fixed, arctic)
+    market_data_cache_engine = "hdf5_fixed"
+    market_data_cache_db_server = "127.0.0.1"
+
+    # number of threads (or processes for HDF5) used to read many time series from the disk cache at once
+    market_data_cache_read_thread_no = 8
+
+    # PyTables isn't thread safe, so HDF5 files are read one after another, unless this is set to True, in which case
+    # they are read in a pool of (spawned) processes - scripts then need an if __name__ == '__main__': guard, otherwise
+    # each process re-runs the script when it starts
+    market_data_cache_read_hdf5_processes = False
+
+    # number of rows read at a time when converting large CSV files (see IOEngine.convert_csv_data_frame) and the
+    # number of processes used to convert several files at once (needs an if __name__ == '__main__': guard in scripts)
+    csv_chunksize = 1000000
+    csv_convert_process_no = 4
+
+    # settings for the (pooled) MongoDB clients used by Arctic, and the number of threads for bulk reads/writes
+    arctic_socket_timeout_ms = 30 * 1000
+    arctic_server_selection_timeout_ms = 10 * 1000
+    arctic_max_pool_size = 16
+    arctic_thread_no = 8
+
+    # compression (codec, level) used by each engine of the disk cache, for each category of data (if the category, eg.
+    # 'intraday', is in the cache filename, otherwise 'other'), codecs are eg. 'blosc' (blosc:blosclz), 'blosc:lz4',
+    # 'blosc:zstd', 'zlib', 'lz4', 'zstd', 'snappy' or None (no compression), and are converted to the nearest one the
+    # engine supports (a level of None uses the default) - IOEngine.benchmark_compression compares them on your data
+    market_data_cache_compression = {'hdf5'        : {'other' : ('blosc', 9)},
+                                     'parquet'     : {'other' : ('snappy', None)},
+                                     'parquet_day' : {'other' : ('snappy', None)},
+                                     'arrow'       : {'other' : (None, None)}}
+
+    # number of rows in each row group of Parquet files (smaller row groups mean reads of short date ranges skip more
+    # of the file, but compress less well)
+    parquet_row_group_size = 100000
+
     # in Python threading does not offer true parallisation, but can be useful when downloading data, because
     # a lot of the time is spend waiting on data, multiprocessing library addresses this problem by spawning new Python
     # instances, but this has greater overhead (maybe more advisable when downloading very long time series)
@@ -82,6 +118,43 @@ class DataConstants(object):
                                      'other'       : 4,
                                      'dukascopy'   : 2}
 
+    # if True, the number of concurrent calls to each data source starts at market_thread_no and is adjusted on the
+    # fly (growing whilst latency is good, up to market_thread_no_max, and backing off on errors/throttling)
+    market_adaptive_concurrency = True
+
+    market_thread_no_max = {         'quandl'      : 8,
+                                     'bloomberg'   : 16,
+                                     'yahoo'       : 8,
+                                     'other'       : 8,
+                                     'dukascopy'   : 8}
+
+    # maximum number of calls per second to each data source (None for no limit)
+    market_rate_limit = {            'quandl'      : 5,
+                                     'bloomberg'   : None,
+                                     'yahoo'       : 5,
+                                     'other'       : None,
+                                     'dukascopy'   : 50}
+
+    # failed calls to data sources are retried with exponential backoff (with jitter), base_delay/max_delay are the
+    # smallest/largest waits between attempts and max_elapsed is the total time budget (in seconds)
+    market_retry_max_attempts = 5
+    market_retry_base_delay = 0.5
+    market_retry_max_delay = 30
+    market_retry_max_elapsed = 120
+
+    # identical requests downloaded at the same time (eg. from different threads) wait for a single call to the
+    # data provider
+    market_data_coalesce_requests = True
+
+    # memory budget (in bytes) for time series cached in memory by MarketDataGenerator, for each environment
+    # set to None for an unbounded cache
+    market_data_cache_max_bytes = {  'backtest'    : 2 * 1024 ** 3,
+                                     'prod'        : 1024 ** 3,
+                                     'other'       : 512 * 1024 ** 2}
+
+    # how long (in seconds) time series can stay in the memory cache (None means they never expire)
+    market_data_cache_ttl_seconds = None
+
     # log config file
     logging_conf = root_folder + "conf/logging.conf"
 
@@ -91,7 +164,12 @@ class DataConstants(object):
 
     # Dukascopy settings
     dukascopy_base_url = "http://www.dukascopy.com/datafeed/"
+
+    # keep the raw bi5 files downloaded from Dukascopy in dukascopy_tick_folder, and read them from there next time
+    # (hours without ticks are remembered once they are more than dukascopy_tick_final_days old)
     dukascopy_write_temp_tick_disk = False
+    dukascopy_tick_folder = temp_folder + "/dkticks"
+    dukascopy_tick_final_days = 7
 
     # Quandl settings
     quandl_api_key = "x"
@@ -0,0 +1,235 @@
+__author__ = 'saeedamen' # Saeed Amen
+
+#
+# Copyright 2016 Cuemacro
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#
+# See the License for the specific language governing permissions and limitations under the License.
+#
+
+import asyncio
+import atexit
+import multiprocessing
+import threading
+import weakref
+
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from findatapy.util.dataconstants import DataConstants
+from findatapy.util.singleton import Singleton
+
+class ThreadPoolManager(object):
+    """Keeps process wide thread pools (created lazily when first used), so we don't have the overhead of starting up
+    and tearing down a new pool for every call. Each pool is identified by name (eg. market_data.bloomberg) and by
+    default is sized from DataConstants.market_thread_no for the data source.
+
+    Also keeps process pools (for work which can't be run in threads, eg. reading HDF5 with PyTables), which are
+    started with spawn (forking a process which is already running threads can deadlock).
+
+    Pools are shut down when Python exits (or can be shut down explicitly with ThreadPoolManager.shutdown).
+
+    """
+    __metaclass__ = Singleton
+
+    _executors = {}
+    _process_executors = {}
+    _lock = threading.Lock()
+
+    # asyncio semaphores have to be created for each event loop
+    _async_semaphores = weakref.WeakKeyDictionary()
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    @staticmethod
+    def get_thread_no(data_source = None):
+        """Gets the number of threads to use for a data source (from DataConstants.market_thread_no)
+
+        Parameters
+        ----------
+        data_source : str
+            data source eg. bloomberg
+
+        Returns
+        -------
+        int
+        """
+        market_thread_no = DataConstants().market_thread_no
+
+        if data_source in market_thread_no:
+            return market_thread_no[data_source]
+
+        return market_thread_no['other']
+
+    @staticmethod
+    def get_executor(name, thread_no):
+        """Gets the thread pool with a particular name (creating it if it doesn't exist yet)
+
+        Parameters
+        ----------
+        name : str
+            name of the thread pool eg. market_data.bloomberg
+        thread_no : int
+            number of threads in the pool (only used when the pool is created)
+
+        Returns
+        -------
+        ThreadPoolExecutor
+        """
+        with ThreadPoolManager._lock:
+            if name not in ThreadPoolManager._executors:
+                ThreadPoolManager._executors[name] = ThreadPoolExecutor(max_workers=thread_no,
+                                                                        thread_name_prefix=ThreadPoolManager._get_thread_name_prefix(name))
+
+            return ThreadPoolManager._executors[name]
+
+    @staticmethod
+    def map(name, func, args_list, thread_no = None):
+        """Calls a function on each element of a list using a shared thread pool, returning the results in order
+
+        If we are already running inside a thread of the same pool, the function is called in the current thread
+        (otherwise we could deadlock waiting for ourselves).
+
+        Parameters
+        ----------
+        name : str
+            name of the thread pool eg. market_data.bloomberg
+        func : function
+            function to be called on each element
+        args_list : list
+            elements to be passed to the function
+        thread_no : int (optional)
+            number of threads in the pool (otherwise taken from DataConstants.market_thread_no for 'other')
+
+        Returns
+        -------
+        list
+        """
+        if thread_no is None: thread_no = ThreadPoolManager.get_thread_no()
+
+        if thread_no < 1 or len(args_list) <= 1 or \
+                threading.current_thread().name.startswith(ThreadPoolManager._get_thread_name_prefix(name)):
+            return [func(x) for x in args_list]
+
+        executor = ThreadPoolManager.get_executor(name, thread_no)
+
+        return list(executor.map(func, args_list))
+
+    @staticmethod
+    def get_process_executor(name, process_no):
+        """Gets the process pool with a particular name (creating it if it doesn't exist yet). Processes are started
+        with spawn, so scripts using them need the usual if __name__ == '__main__' guard.
+
+        Parameters
+        ----------
+        name : str
+            name of the process pool eg. io_engine.read_hdf5
+        process_no : int
+            number of processes in the pool (only used when the pool is created)
+
+        Returns
+        -------
+        ProcessPoolExecutor
+        """
+        with ThreadPoolManager._lock:
+            if name not in ThreadPoolManager._process_executors:
+                ThreadPoolManager._process_executors[name] = ProcessPoolExecutor(
+                    max_workers=process_no, mp_context=multiprocessing.get_context('spawn'))
+
+            return ThreadPoolManager._process_executors[name]
+
+    @staticmethod
+    def map_processes(name, func, args_list, process_no):
+        """Calls a (module level) function on each element of a list using a shared process pool, returning the
+        results in order. If there is only one element (or one process), the function is called in this process.
+
+        Parameters
+        ----------
+        name : str
+            name of the process pool eg. io_engine.read_hdf5
+        func : function
+            module level function to be called on each element (has to be picklable)
+        args_list : list
+            elements to be passed to the function (have to be picklable)
+        process_no : int
+            number of processes in the pool
+
+        Returns
+        -------
+        list
+        """
+        if process_no <= 1 or len(args_list) <= 1:
+            return [func(x) for x in args_list]
+
+        executor = ThreadPoolManager.get_process_executor(name, process_no)
+
+        return list(executor.map(func, args_list))
+
+    @staticmethod
+    async def run_async(name, func, arg, thread_no = None):
+        """Calls a (blocking) function in a shared thread pool from asyncio, without blocking the event loop. At most
+        thread_no calls for each pool name can run at the same time (the rest wait their turn).
+
+        Parameters
+        ----------
+        name : str
+            name of the thread pool eg. async.bloomberg
+        func : function
+            blocking function to be called
+        arg : object
+            argument to be passed to the function
+        thread_no : int (optional)
+            maximum number of concurrent calls (otherwise taken from DataConstants.market_thread_no for 'other')
+
+        Returns
+        -------
+        object
+        """
+        if thread_no is None: thread_no = ThreadPoolManager.get_thread_no()
+
+        thread_no = max(thread_no, 1)
+
+        loop = asyncio.get_running_loop()
+
+        with ThreadPoolManager._lock:
+            if loop not in ThreadPoolManager._async_semaphores:
+                ThreadPoolManager._async_semaphores[loop] = {}
+
+            semaphores = ThreadPoolManager._async_semaphores[loop]
+
+            if name not in semaphores:
+                semaphores[name] = asyncio.Semaphore(thread_no)
+
+            semaphore = semaphores[name]
+
+        async with semaphore:
+            return await loop.run_in_executor(ThreadPoolManager.get_executor(name, thread_no), func, arg)
+
+    @staticmethod
+    def shutdown(wait = True):
+        """Shuts down all the thread and process pools (they will be recreated if they are used again)
+
+        Parameters
+        ----------
+        wait : bool
+            wait for running tasks to finish
+        """
+        with ThreadPoolManager._lock:
+            executors = list(ThreadPoolManager._executors.values()) + \
+                        list(ThreadPoolManager._process_executors.values())
+            ThreadPoolManager._executors = {}
+            ThreadPoolManager._process_executors = {}
+
+        for executor in executors:
+            executor.shutdown(wait=wait)
+
+    @staticmethod
+    def _get_thread_name_prefix(name):
+        return 'findatapy.' + name + '.'
+
+atexit.register(ThreadPoolManager.shutdown)
@@ -0,0 +1,105 @@
+__author__ = 'saeedamen' # Saeed Amen
+
+#
+# Copyright 2016 Cuemacro
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#
+# See the License for the specific language governing permissions and limitations under the License.
+#
+
+import numpy
+import pandas
+import pytest
+
+from findatapy.market import CachedMarketDataGenerator, MarketDataGenerator, MarketDataRequest
+from findatapy.util.dataconstants import DataConstants
+
+@pytest.fixture
+def calls(tmp_path, monkeypatch):
+    monkeypatch.setattr(DataConstants, 'folder_time_series_data', str(tmp_path))
+
+    calls = []
+
+    yield calls
+
+    MarketDataGenerator._time_series_cache.flush()
+
+def create_market_data_generator(calls):
+    """Creates a CachedMarketDataGenerator with an empty memory cache (as if in a new process), which records the calls
+    to the data provider instead of making them
+    """
+    MarketDataGenerator._time_series_cache.flush()
+
+    market_data_generator = CachedMarketDataGenerator(engine = 'hdf5_fixed')
+
+    def fetch_daily_time_series(market_data_request):
+        calls.append((market_data_request.start_date, market_data_request.finish_date))
+
+        index = pandas.bdate_range(market_data_request.start_date, market_data_request.finish_date)
+
+        return pandas.DataFrame({x + '.close' : numpy.ones(len(index)) for x in market_data_request.tickers},
+                                index = index)
+
+    def fetch_time_series_list(market_data_request_list):
+        data_frame_list = []
+
+        for market_data_request in market_data_request_list:
+            calls.append((market_data_request.start_date, market_data_request.finish_date))
+
+            index = pandas.date_range(market_data_request.start_date, market_data_request.finish_date, freq = 'h')
+
+            data_frame_list.append(pandas.DataFrame({market_data_request.tickers[0] + '.close' : numpy.ones(len(index))},
+                                                    index = index))
+
+        return data_frame_list
+
+    market_data_generator.fetch_daily_time_series = fetch_daily_time_series
+    market_data_generator.fetch_time_series_list = fetch_time_series_list
+
+    return market_data_generator
+
+def create_market_data_request(start_date, finish_date, freq):
+    return MarketDataRequest(start_date = pandas.Timestamp(start_date).to_pydatetime(),
+                             finish_date = pandas.Timestamp(finish_date).to_pydatetime(), freq = freq,
+                             data_source = 'bloomberg', category = 'fx', tickers = ['EURUSD'], fields = ['close'],
+                             vendor_tickers = ['EURUSD Curncy'], vendor_fields = ['PX_LAST'],
+                             cache_algo = 'cache_algo_return')
+
+def test_daily_disk_cache_with_gap(calls):
+    create_market_data_generator(calls).download_daily(create_market_data_request('2017-03-01', '2017-03-31', 'daily'))
+    create_market_data_generator(calls).download_daily(create_market_data_request('2017-01-02', '2017-01-31', 'daily'))
+
+    del calls[:]
+
+    # February isn't on disk, so has to be downloaded
+    data_frame = create_market_data_generator(calls).download_daily(
+        create_market_data_request('2017-01-02', '2017-03-31', 'daily'))
+
+    assert len(calls) == 1
+    assert list(data_frame.index) == list(pandas.bdate_range('2017-01-02', '2017-03-31'))
+    assert not data_frame.isnull().values.any()
+
+    del calls[:]
+
+    # now everything is on disk
+    create_market_data_generator(calls).download_daily(create_market_data_request('2017-01-02', '2017-03-31', 'daily'))
+
+    assert calls == []
+
+def test_intraday_disk_cache_partial_day(calls):
+    create_market_data_generator(calls).download_intraday_tick(
+        create_market_data_request('2019-03-01', '2019-03-05 01:00', 'intraday'))
+
+    del calls[:]
+
+    data_frame = create_market_data_generator(calls).download_intraday_tick(
+        create_market_data_request('2019-03-05', '2019-03-05 23:00', 'intraday'))
+
+    # only the rest of the day is downloaded
+    assert calls == [(pandas.Timestamp('2019-03-05 01:00'), pandas.Timestamp('2019-03-05 23:00'))]
+    assert data_frame.index[-1] > pandas.Timestamp('2019-03-05 21:00')
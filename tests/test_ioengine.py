@@ -0,0 +1,153 @@
+__author__ = 'saeedamen' # Saeed Amen
+
+#
+# Copyright 2016 Cuemacro
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#
+# See the License for the specific language governing permissions and limitations under the License.
+#
+
+import numpy
+import pandas
+import pytest
+
+from findatapy.market.ioengine import IOEngine
+from findatapy.util.dataconstants import DataConstants
+
+def create_time_series(start_date = '2017-01-02', periods = 1000, freq = 'min'):
+    index = pandas.date_range(start_date, periods = periods, freq = freq, name = 'Date')
+
+    return pandas.DataFrame({'EURUSD.close' : numpy.arange(periods, dtype = numpy.float64),
+                             'EURUSD.open' : numpy.arange(periods, dtype = numpy.float64) + 0.5}, index = index)
+
+@pytest.mark.parametrize('engine', ['hdf5_fixed', 'hdf5_table'])
+def test_write_read_hdf5_compressed(tmp_path, engine):
+    io_engine = IOEngine()
+    fname = str(tmp_path / 'fx_daily')
+
+    data_frame = create_time_series()
+
+    io_engine.write_time_series_cache_to_disk(fname, data_frame, engine = engine, compression = ('blosc:lz4', 5))
+
+    store = pandas.HDFStore(io_engine.get_h5_filename(fname), mode = 'r')
+
+    try:
+        assert store.get_storer('data').is_table == (engine == 'hdf5_table')
+
+        leaves = [x for x in store._handle.walk_nodes('/data', 'Leaf') if x.name.endswith('values') or x.name == 'table']
+
+        assert leaves != []
+
+        for leaf in leaves:
+            assert leaf.filters.complib == 'blosc:lz4' and leaf.filters.complevel == 5
+    finally:
+        store.close()
+
+    pandas.testing.assert_frame_equal(io_engine.read_time_series_cache_from_disk(fname, engine = 'hdf5'), data_frame,
+                                      check_freq = False)
+
+def test_benchmark_compression_hdf5(tmp_path):
+    results = IOEngine().benchmark_compression({'fx_daily' : create_time_series()},
+                                               engine_compression_list = [('hdf5_fixed', ('blosc', 9)),
+                                                                          ('hdf5_table', ('blosc:lz4', 5))],
+                                               folder = str(tmp_path), repeat = 1)
+
+    assert list(results['engine']) == ['hdf5_fixed', 'hdf5_table']
+
+def test_append_hdf5_table(tmp_path):
+    io_engine = IOEngine()
+    fname = str(tmp_path / 'fx_daily')
+
+    data_frame = create_time_series(periods = 1000)
+
+    # the second write overlaps with the end of the first, and the overlapping points should be overwritten
+    data_frame_new = create_time_series(start_date = data_frame.index[900], periods = 200) + 10000.0
+
+    io_engine.write_time_series_cache_to_disk(fname, data_frame, engine = 'hdf5_table')
+    io_engine.write_time_series_cache_to_disk(fname, data_frame_new, engine = 'hdf5_table', append_data = True)
+
+    data_frame_read = io_engine.read_time_series_cache_from_disk(fname, engine = 'hdf5')
+
+    assert not data_frame_read.index.has_duplicates
+    assert len(data_frame_read) == 1100
+    assert data_frame_read.index.is_monotonic_increasing
+
+    pandas.testing.assert_frame_equal(data_frame_read.iloc[:900], data_frame.iloc[:900], check_freq = False)
+    pandas.testing.assert_frame_equal(data_frame_read.iloc[900:], data_frame_new, check_freq = False)
+
+    store = pandas.HDFStore(io_engine.get_h5_filename(fname), mode = 'r')
+
+    try:
+        assert store.get_storer('data').attrs.last_date == data_frame_new.index[-1]
+        assert io_engine.get_hdf5_last_date(store) == data_frame_new.index[-1]
+    finally:
+        store.close()
+
+# data columns have the names of our columns (eg. EURUSD.close), which PyTables warns about
+@pytest.mark.filterwarnings('ignore::tables.NaturalNameWarning')
+@pytest.mark.parametrize('tz', [None, 'UTC'])
+def test_read_hdf5_table_where(tmp_path, tz):
+    io_engine = IOEngine()
+    fname = str(tmp_path / 'fx_intraday')
+
+    data_frame = create_time_series(periods = 2000).astype('float32')
+
+    if tz is not None:
+        data_frame = data_frame.tz_localize(tz)
+
+    io_engine.write_time_series_cache_to_disk(fname, data_frame, engine = 'hdf5_table',
+                                              data_columns = ['EURUSD.close'])
+
+    store = pandas.HDFStore(io_engine.get_h5_filename(fname), mode = 'r')
+
+    try:
+        storer = store.get_storer('data')
+
+        assert storer.is_table
+        assert 'EURUSD.close' in storer.data_columns
+        assert storer.table.cols.index.is_indexed
+    finally:
+        store.close()
+
+    start_date = pandas.Timestamp('2017-01-02 05:00')
+    finish_date = pandas.Timestamp('2017-01-02 10:00')
+
+    data_frame_read = io_engine.read_hdf5_data_frame(fname, start_date = start_date, finish_date = finish_date,
+                                                     columns = ['EURUSD.open'])
+
+    index = data_frame.index if tz is None else data_frame.index.tz_localize(None)
+
+    pandas.testing.assert_frame_equal(data_frame_read,
+                                      data_frame.loc[(index >= start_date) & (index <= finish_date), ['EURUSD.open']],
+                                      check_freq = False)
+
+def test_convert_csv_data_frame_chunks_by_default(tmp_path, monkeypatch):
+    io_engine = IOEngine()
+
+    monkeypatch.setattr(DataConstants, 'folder_time_series_data', str(tmp_path))
+    monkeypatch.setattr(DataConstants, 'csv_chunksize', 100)
+
+    index = pandas.date_range('2017-01-02', periods = 1000, freq = 'min')
+
+    f_name = str(tmp_path / 'EURUSD.csv')
+
+    pandas.DataFrame({'EURUSD' : numpy.arange(1000, dtype = numpy.float64)},
+                     index = index.strftime('%d/%m/%Y %H:%M:%S')).to_csv(f_name)
+
+    # reading the whole file at once shouldn't happen when chunksize isn't set
+    def read_csv_data_frame(*args, **kwargs):
+        raise AssertionError("read the whole CSV file")
+
+    monkeypatch.setattr(io_engine, 'read_csv_data_frame', read_csv_data_frame)
+
+    io_engine.convert_csv_data_frame(f_name, 'fx_intraday', 'intraday')
+
+    data_frame = io_engine.read_time_series_cache_from_disk(str(tmp_path / 'fx_intraday'), engine = 'hdf5')
+
+    assert len(data_frame) == 1000 and not data_frame.index.has_duplicates
+    assert list(data_frame['EURUSD.close']) == list(range(1000))